@@ -0,0 +1,4 @@
+import time
+
+# Start of the import of the application, the worker startup time is measured from here
+import_started_at = time.perf_counter()
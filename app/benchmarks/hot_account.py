@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from app.benchmarks.report import LatencyRecorder, compare, format_summary, read_report, write_report
+from app.config.settings import get_settings
+from app.database.executor import database_executor
+from app.database.models import init_database
+from app.database.posting_queue import balance_posting_queue
+from app.interfaces.enum import StorageBackend, TransactionType
+from app.interfaces.holder import HolderInterface
+from app.interfaces.transaction_history import TransactionHistoryInterface
+from app.repositories.backend import (
+    daily_withdrawal_repository, dock_account_repository, transaction_history_repository
+)
+from app.services.dock_account import DockAccountService
+from app.services.holder import HolderService
+from app.services.transaction_history import TransactionHistoryService
+from app.utils.generator import generate_cpf
+
+logger = logging.getLogger(__name__)
+
+
+class LevelResult:
+    """
+    Outcome of the postings of one concurrency level: the summary of each route and the invariants broken.
+    """
+    def __init__(self, summary: Dict[str, dict], violations: List[str]):
+        self.summary = summary
+        self.violations = violations
+
+
+def draw_postings(rng: random.Random, count: int, withdrawal_share: float, max_amount: int
+                  ) -> List[Tuple[TransactionType, Decimal]]:
+    """
+    :return: `count` (type, amount) postings, withdrawals with `withdrawal_share` probability
+    """
+    return [
+        (TransactionType.withdrawal if rng.random() < withdrawal_share else TransactionType.deposit,
+         Decimal(rng.randint(1, max_amount)))
+        for _ in range(count)
+    ]
+
+
+def check_invariants(
+        history: Sequence[TransactionHistoryInterface],
+        balance: Decimal,
+        daily_withdrawal_amount: Decimal,
+        maximum_daily_limit: Decimal
+) -> List[str]:
+    """
+    Checks the account against its history once the postings are done:
+    - the balance is the sum of the history;
+    - the balance never goes negative, replaying the history in statement order, (created_at, id);
+    - the withdrawals of a day never add up to more than the daily limit;
+    - today's daily withdrawal total is the sum of today's withdrawals.
+
+    The history keeps no commit order, so the replay assumes statement order is commit order. `created_at` is
+    set when a posting is built, before it waits for the account lock, so under contention two postings may
+    commit in the opposite order of their timestamps: a "balance went down" report is then a candidate to be
+    checked against the database logs, not a proof the balance check failed. The other invariants don't
+    depend on the order.
+
+    :param history: every transaction of the account, opening deposit included, in any order
+    :param balance: current balance of the account
+    :param daily_withdrawal_amount: today's daily withdrawal total of the account
+    :return: one message per invariant broken, empty when none is
+    """
+    violations = []
+    running_balance = Decimal(0)
+    lowest_balance = None
+    withdrawn = defaultdict(Decimal)
+    for transaction in sorted(history, key=lambda x: (x.created_at, x.id)):
+        if transaction.type == TransactionType.withdrawal:
+            running_balance -= transaction.amount
+            withdrawn[transaction.created_at.date()] += transaction.amount
+            if lowest_balance is None or running_balance < lowest_balance[0]:
+                lowest_balance = (running_balance, transaction)
+        else:
+            running_balance += transaction.amount
+
+    if balance != running_balance:
+        violations.append(f"balance {balance} differs from the sum of the history {running_balance}")
+    if lowest_balance is not None and lowest_balance[0] < 0:
+        violations.append(f"balance went down to {lowest_balance[0]} in statement order with withdrawal "
+                          f"{lowest_balance[1].id} at {lowest_balance[1].created_at.isoformat()}")
+    for day, amount in sorted(withdrawn.items()):
+        if amount > maximum_daily_limit:
+            violations.append(f"withdrawals of {day} add up to {amount}, over the daily limit {maximum_daily_limit}")
+    if daily_withdrawal_amount != withdrawn[date.today()]:
+        violations.append(f"daily withdrawal total {daily_withdrawal_amount} differs from today's withdrawals "
+                          f"{withdrawn[date.today()]}")
+    return violations
+
+
+async def open_account(rng: random.Random, opening_balance: Decimal) -> str:
+    """
+    Creates a holder with an account of its own, funded with `opening_balance`.
+
+    :return: id of the account
+    """
+    holder_service = HolderService()
+    while True:
+        cpf = generate_cpf(rng.randrange(10 ** 9))
+        try:
+            await holder_service.create(HolderInterface(cpf=cpf, name="Benchmark Holder"))
+            break
+        except HTTPException:
+            # Invalid base or taken by a previous run
+            continue
+    dock_account = await DockAccountService().create(cpf=cpf)
+    if opening_balance:
+        await TransactionHistoryService().create(TransactionHistoryInterface(
+            dock_account=dock_account.id, type=TransactionType.deposit, amount=opening_balance
+        ))
+    return dock_account.id
+
+
+async def run_level(
+        dock_account_id: str,
+        postings: List[Tuple[TransactionType, Decimal]],
+        concurrency: int
+) -> LevelResult:
+    """
+    Posts every posting to the account through `TransactionHistoryService.create`, `concurrency` at a time,
+    then checks the invariants of the account.
+
+    Latencies are recorded for all the postings together and by type and outcome: rejections (insufficient
+    balance, daily limit) are answers like any other, only unexpected exceptions are counted as errors.
+    """
+    service = TransactionHistoryService()
+    recorder = LatencyRecorder()
+    pending = iter(postings)
+
+    async def worker():
+        # The iterator is shared, each worker takes the next posting as soon as its previous one is done
+        for transaction_type, amount in pending:
+            transaction = TransactionHistoryInterface(dock_account=dock_account_id, type=transaction_type,
+                                                      amount=amount)
+            start_time = time.perf_counter()
+            outcome, error = "accepted", False
+            try:
+                await service.create(transaction)
+            except HTTPException:
+                outcome = "rejected"
+            except Exception:
+                logger.exception("Posting failed")
+                outcome, error = "failed", True
+            latency = time.perf_counter() - start_time
+            recorder.record("all", latency, error=error)
+            recorder.record(f"{transaction_type.value} {outcome}", latency, error=error)
+
+    recorder.start()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    recorder.stop()
+    return LevelResult(summary=recorder.summary(), violations=await database_executor.run(
+        _account_invariants, dock_account_id=dock_account_id
+    ))
+
+
+def _account_invariants(dock_account_id: str) -> List[str]:
+    _settings = get_settings()
+    if _settings.write_behind_deposits and _settings.storage_backend == StorageBackend.postgres:
+        # Deposits still waiting in the queue are part of the history but not of the balance yet
+        balance_posting_queue.flush()
+    return check_invariants(
+        history=transaction_history_repository().get(dock_account_id=dock_account_id),
+        balance=dock_account_repository().get_by_id(_id=dock_account_id).balance,
+        daily_withdrawal_amount=daily_withdrawal_repository().get_amount(dock_account_id=dock_account_id),
+        maximum_daily_limit=Decimal(_settings.maximum_daily_limit)
+    )
+
+
+async def run(args: argparse.Namespace) -> Dict[int, LevelResult]:
+    _settings = get_settings()
+    if _settings.storage_backend == StorageBackend.postgres:
+        init_database()
+        await database_executor.warm_up(connections=_settings.database_warm_connections)
+
+    rng = random.Random(args.seed)
+    results = {}
+    for concurrency in args.concurrency:
+        # A new account per level, the daily limit of the previous one is used up
+        dock_account_id = await open_account(rng, opening_balance=args.opening_balance)
+        postings = draw_postings(rng, count=args.postings, withdrawal_share=args.withdrawal_share,
+                                 max_amount=args.max_amount)
+        logger.info(f"Running level - concurrency={concurrency} dock_account={dock_account_id}")
+        results[concurrency] = await run_level(dock_account_id, postings=postings, concurrency=concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Hot-account contention benchmark: concurrent deposits and withdrawals on a single account "
+                    "through the posting path, at several concurrency levels, reporting throughput and p50/p95/p99 "
+                    "latency and checking the balance, history and daily limit invariants of the account"
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64],
+                        help="concurrency levels to run, each one on a new account")
+    parser.add_argument("--postings", type=int, default=2000, help="postings per concurrency level")
+    parser.add_argument("--withdrawal-share", type=float, default=0.5, help="share of the postings that withdraw")
+    parser.add_argument("--max-amount", type=int, default=100, help="postings are of 1 to this amount")
+    parser.add_argument("--opening-balance", type=Decimal, default=Decimal(1000),
+                        help="deposited in each account before its level runs")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the holders and postings")
+    parser.add_argument("--output", help="file to write the results to, as a baseline for --compare")
+    parser.add_argument("--compare", help="baseline file, exits with status 1 when a level regressed")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="regression allowed before failing, 0.2 for 20%% slower or less throughput")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    results = asyncio.run(run(args))
+    report = {f"c={concurrency}": result.summary for concurrency, result in results.items()}
+    print(format_summary(report))
+
+    failed = False
+    for concurrency, result in results.items():
+        for violation in result.violations:
+            logger.error(f"Invariant broken - concurrency={concurrency} {violation}")
+            failed = True
+    if args.output:
+        metadata = {k: str(v) for k, v in vars(args).items() if k not in ("output", "compare", "tolerance")}
+        metadata["storage_backend"] = get_settings().storage_backend
+        write_report(args.output, report, metadata=metadata)
+    if args.compare:
+        for regression in compare(read_report(args.compare), report, tolerance=args.tolerance):
+            logger.error(f"Regression - {regression}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.benchmarks.report import LatencyRecorder, compare, format_summary, read_report, write_report
+from app.config.settings import get_settings
+from app.http_server import create_app
+from app.interfaces.enum import TransactionType
+from app.utils.generator import generate_cpf
+
+logger = logging.getLogger(__name__)
+
+OPENING_BALANCE = Decimal("1000000.00")
+BATCH_SIZE = 1000
+
+
+class TimedClient:
+    """
+    Sends the requests of a scenario and records their latency under the route template, so every account
+    of the dataset adds up in the same route. Transport errors and 5xx responses are counted as errors,
+    4xx responses (insufficient balance, daily limit) are answers of the API like any other.
+    """
+    def __init__(self, client: httpx.AsyncClient, recorder: Optional[LatencyRecorder] = None):
+        self._client = client
+        self._recorder = recorder
+
+    async def request(self, method: str, route: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        start_time = time.perf_counter()
+        try:
+            response = await self._client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        if self._recorder is not None:
+            self._recorder.record(f"{method} {route}", time.perf_counter() - start_time,
+                                  error=response is None or response.status_code >= 500)
+        return response
+
+
+class Dataset:
+    """
+    Holders and accounts created through the API for the run. The first account is the large one, it gets
+    the long history read by the `history` scenario.
+    """
+    def __init__(self):
+        self.accounts: List[Tuple[str, str]] = []
+
+    @property
+    def large_account(self) -> str:
+        return self.accounts[0][1]
+
+
+async def build_dataset(client: httpx.AsyncClient, rng: random.Random, accounts: int, history_size: int) -> Dataset:
+    """
+    Creates `accounts` holders with one funded account each, and `history_size` deposits spread over the
+    last 30 days on the first account. Holders left by a previous run on the same database are reused.
+    """
+    dataset = Dataset()
+    while len(dataset.accounts) < accounts:
+        cpf = generate_cpf(rng.randrange(10 ** 9))
+        response = await client.post("/holder", json={"cpf": cpf, "name": "Benchmark Holder"})
+        if response.status_code == 422 and response.json()["message"] != "Holder already exists":
+            continue
+        response = await client.post("/dock_account", params={"cpf": cpf})
+        response.raise_for_status()
+        dataset.accounts.append((cpf, response.json()["id"]))
+
+    now = datetime.now()
+    transactions = [_deposit(x, OPENING_BALANCE) for _, x in dataset.accounts]
+    transactions += [
+        _deposit(dataset.large_account, Decimal(rng.randint(1, 100)),
+                 created_at=now - timedelta(seconds=rng.uniform(0, 30 * 86400)))
+        for _ in range(history_size)
+    ]
+    for i in range(0, len(transactions), BATCH_SIZE):
+        response = await client.post("/transaction/batch", json=transactions[i:i + BATCH_SIZE])
+        response.raise_for_status()
+    return dataset
+
+
+def _deposit(dock_account_id: str, amount: Decimal, created_at: Optional[datetime] = None) -> dict:
+    return {
+        "dock_account": dock_account_id,
+        "type": TransactionType.deposit.value,
+        "amount": str(amount),
+        "created_at": (created_at or datetime.now()).isoformat(),
+    }
+
+
+async def lookups(client: TimedClient, dataset: Dataset, rng: random.Random):
+    """
+    Read-heavy mix: mostly account lookups, then balances and holders.
+    """
+    cpf, dock_account_id = rng.choice(dataset.accounts)
+    draw = rng.random()
+    if draw < 0.7:
+        await client.request("GET", "/dock_account/{cpf}/{_id}", f"/dock_account/{cpf}/{dock_account_id}")
+    elif draw < 0.9:
+        await client.request("GET", "/dock_account/{cpf}/{_id}/balance",
+                             f"/dock_account/{cpf}/{dock_account_id}/balance")
+    else:
+        await client.request("GET", "/holder/{cpf}", f"/holder/{cpf}")
+
+
+async def postings(client: TimedClient, dataset: Dataset, rng: random.Random):
+    """
+    A burst of 1 to 20 concurrent deposits and withdrawals on the same account.
+    """
+    _, dock_account_id = rng.choice(dataset.accounts)
+    burst = [
+        client.request("POST", "/transaction", "/transaction", json={
+            "dock_account": dock_account_id,
+            "type": rng.choice((TransactionType.deposit.value, TransactionType.withdrawal.value)),
+            "amount": str(rng.randint(1, 50)),
+        })
+        for _ in range(rng.randint(1, 20))
+    ]
+    await asyncio.gather(*burst)
+
+
+async def history(client: TimedClient, dataset: Dataset, rng: random.Random):
+    """
+    Pages through the history of the large account, a third of the time over the last week only.
+    """
+    params = {"limit": 50}
+    if rng.random() < 0.3:
+        params["start_date"] = (datetime.now() - timedelta(days=7)).isoformat()
+    for _ in range(rng.randint(1, 5)):
+        response = await client.request("GET", "/transaction/{dock_account_id}",
+                                        f"/transaction/{dataset.large_account}", params=params)
+        if response is None or "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+
+SCENARIOS: Dict[str, Callable[[TimedClient, Dataset, random.Random], Awaitable[None]]] = {
+    "lookups": lookups,
+    "postings": postings,
+    "history": history,
+}
+
+
+async def run_scenario(
+        client: httpx.AsyncClient,
+        dataset: Dataset,
+        name: str,
+        concurrency: int,
+        duration: float,
+        warmup: float,
+        seed: int
+) -> Dict[str, dict]:
+    """
+    Runs a scenario with `concurrency` workers, each one calling it in a loop: for `warmup` seconds without
+    recording anything, then for `duration` seconds.
+
+    :return: the summary of each route called
+    """
+    scenario = SCENARIOS[name]
+    recorder = LatencyRecorder()
+
+    async def worker(index: int, timed_client: TimedClient, deadline: float):
+        rng = random.Random(f"{seed}-{name}-{index}")
+        while time.perf_counter() < deadline:
+            await scenario(timed_client, dataset, rng)
+
+    deadline = time.perf_counter() + warmup
+    await asyncio.gather(*(worker(i, TimedClient(client), deadline) for i in range(concurrency)))
+    recorder.start()
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(worker(i, TimedClient(client, recorder), deadline) for i in range(concurrency)))
+    recorder.stop()
+    return recorder.summary()
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, dict]]:
+    async def benchmark(client: httpx.AsyncClient):
+        dataset = await build_dataset(client, random.Random(args.seed), accounts=args.accounts,
+                                      history_size=args.history_size)
+        results = {}
+        for name in args.scenarios:
+            logger.info(f"Running scenario - {name}")
+            results[name] = await run_scenario(client, dataset, name=name, concurrency=args.concurrency,
+                                               duration=args.duration, warmup=args.warmup, seed=args.seed)
+        return results
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+            return await benchmark(client)
+
+    # The application runs in this process, on the same event loop as the workers
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+            return await benchmark(client)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="HTTP load benchmark of the API: throughput and p50/p95/p99 latency per route, saved as a "
+                    "baseline or compared to one"
+    )
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help="scenarios to run, all of them by default")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent workers per scenario")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds measured per scenario")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds run before measuring, per scenario")
+    parser.add_argument("--accounts", type=int, default=1000, help="accounts created for the run")
+    parser.add_argument("--history-size", type=int, default=100000,
+                        help="transactions in the history of the large account")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the dataset and of the request mixes")
+    parser.add_argument("--url", help="base URL of a running server, the app is run in this process otherwise")
+    parser.add_argument("--timeout", type=float, default=30.0, help="request timeout in seconds")
+    parser.add_argument("--output", help="file to write the results to, as a baseline for --compare")
+    parser.add_argument("--compare", help="baseline file, exits with status 1 when a route regressed")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="regression allowed before failing, 0.2 for 20%% slower or less throughput")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # One line per request otherwise
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = asyncio.run(run(args))
+    print(format_summary(results))
+
+    if args.output:
+        metadata = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "tolerance")}
+        if not args.url:
+            metadata["storage_backend"] = get_settings().storage_backend
+        write_report(args.output, results, metadata=metadata)
+    if args.compare:
+        regressions = compare(read_report(args.compare), results, tolerance=args.tolerance)
+        for regression in regressions:
+            logger.error(f"Regression - {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import json
+import math
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """
+    Nearest-rank percentile.
+
+    :param samples: values, in any order
+    :param q: percentile, from 0 to 100
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+class LatencyRecorder:
+    """
+    Latencies and errors of the requests of one benchmark run, by route. Only used from the event loop
+    (or a single thread), there is no locking.
+    """
+    def __init__(self):
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._started_at = None
+        self._finished_at = None
+
+    def start(self):
+        self._started_at = time.perf_counter()
+
+    def stop(self):
+        self._finished_at = time.perf_counter()
+
+    def record(self, route: str, latency: float, error: bool = False):
+        self._latencies[route].append(latency)
+        if error:
+            self._errors[route] += 1
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        :return: per route, the number of requests and errors, the throughput (requests per second over the
+            whole run) and the latency percentiles in seconds
+        """
+        elapsed = (self._finished_at or time.perf_counter()) - self._started_at
+        routes = {}
+        for route, latencies in sorted(self._latencies.items()):
+            routes[route] = {
+                "requests": len(latencies),
+                "errors": self._errors[route],
+                "throughput": len(latencies) / elapsed,
+                **{f"p{q}": percentile(latencies, q) for q in PERCENTILES},
+            }
+        return routes
+
+
+def compare(baseline: dict, current: dict, tolerance: float, noise_floor: float = 0.001) -> List[str]:
+    """
+    Compares two reports made of `{scenario: {route: summary}}`.
+
+    A route regresses when one of its latency percentiles or its error rate grows, or its throughput drops,
+    by more than `tolerance` (0.2 for 20%). Latency changes smaller than `noise_floor` seconds are ignored,
+    on routes answering in microseconds they are noise. Routes of the baseline missing from a scenario of the
+    current report regress as well; scenarios that were not run and new routes are ignored.
+
+    :return: one message per regression, empty when there is none
+    """
+    regressions = []
+    for scenario, routes in baseline.items():
+        if scenario not in current:
+            continue
+        for route, expected in routes.items():
+            actual = current[scenario].get(route)
+            if actual is None:
+                regressions.append(f"{scenario} {route}: missing")
+                continue
+            for q in PERCENTILES:
+                key = f"p{q}"
+                if actual[key] > expected[key] * (1 + tolerance) and actual[key] - expected[key] > noise_floor:
+                    regressions.append(f"{scenario} {route}: {key} {expected[key] * 1000:.2f}ms -> "
+                                       f"{actual[key] * 1000:.2f}ms")
+            expected_error_rate = expected["errors"] / expected["requests"]
+            actual_error_rate = actual["errors"] / actual["requests"]
+            if actual_error_rate > expected_error_rate * (1 + tolerance):
+                regressions.append(f"{scenario} {route}: error rate {expected_error_rate:.2%} -> "
+                                   f"{actual_error_rate:.2%}")
+            if actual["throughput"] < expected["throughput"] * (1 - tolerance):
+                regressions.append(f"{scenario} {route}: throughput {expected['throughput']:.1f}/s -> "
+                                   f"{actual['throughput']:.1f}/s")
+    return regressions
+
+
+def format_summary(report: dict) -> str:
+    """
+    :return: a `{scenario: {route: summary}}` report as a text table, latencies in milliseconds
+    """
+    lines = [f"{'scenario':<12}{'route':<40}{'requests':>10}{'errors':>8}{'req/s':>10}"
+             + "".join(f"{f'p{q}':>10}" for q in PERCENTILES)]
+    for scenario, routes in report.items():
+        for route, summary in routes.items():
+            lines.append(f"{scenario:<12}{route:<40}{summary['requests']:>10}{summary['errors']:>8}"
+                         f"{summary['throughput']:>10.1f}"
+                         + "".join(f"{summary[f'p{q}'] * 1000:>10.2f}" for q in PERCENTILES))
+    return "\n".join(lines)
+
+
+def write_report(path: str, results: dict, metadata: Optional[dict] = None):
+    """
+    Writes the results as JSON, with the run parameters under `metadata`, to be used as a baseline.
+    """
+    with open(path, "w") as file:
+        json.dump({"metadata": metadata or {}, "results": results}, file, indent=2, sort_keys=True)
+
+
+def read_report(path: str) -> dict:
+    """
+    :return: the results of a report written by `write_report`
+    """
+    with open(path) as file:
+        return json.load(file)["results"]
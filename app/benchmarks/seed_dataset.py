@@ -0,0 +1,312 @@
+import argparse
+import io
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Iterator, List
+from uuid import UUID
+
+import psycopg2
+
+from app.config.settings import get_settings
+from app.database.models import db, init_database
+from app.database.models.daily_withdrawal import DailyWithdrawal
+from app.database.models.dock_account import DockAccount
+from app.database.models.holder import Holder
+from app.database.models.transaction_history import TransactionHistory
+from app.database.models.transaction_id import TransactionId
+from app.interfaces.enum import AccountStatus, StorageBackend, TransactionType
+from app.repositories.daily_withdrawal_repository import DailyWithdrawalRepository
+from app.repositories.dock_account_repository import ACCOUNT_NUMBER_SEQUENCE, DockAccountRepository
+from app.repositories.transaction_history_partition_repository import TransactionHistoryPartitionRepository
+from app.utils.generator import format_account_number, generate_cpf
+
+logger = logging.getLogger(__name__)
+
+FIRST_NAMES = ("Ana", "Bruno", "Carla", "Diego", "Elisa", "Felipe", "Gabriela", "Heitor", "Isabela", "João",
+               "Karina", "Lucas", "Marina", "Nicolas", "Olivia", "Pedro", "Rafaela", "Samuel", "Tatiana", "Vitor")
+LAST_NAMES = ("Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+              "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa")
+# Share of the transactions of each hour of the day, busier in business hours
+HOURLY_WEIGHTS = (1, 1, 1, 1, 1, 2, 4, 7, 10, 12, 12, 11, 12, 12, 11, 10, 10, 9, 8, 7, 5, 4, 3, 2)
+
+# The nine first digits of the CPFs are spread over the values that are not a single repeated digit
+# (which never make valid CPFs): 9 runs of 111111110 values between the multiples of 111111111
+_CPF_RUN = 111111110
+_CPF_BASES = 9 * _CPF_RUN
+# Coprime with _CPF_BASES, stepping by it visits every base once
+_CPF_STEP = 387420489
+
+
+@lru_cache(maxsize=1 << 16)
+def _account_id(seed: int, index: int) -> UUID:
+    # Derived from the index, any worker finds the id of any account without sharing a list
+    return UUID(bytes=blake2b(f"{seed}:{index}".encode(), digest_size=16).digest(), version=4)
+
+
+class DatasetShape:
+    """
+    Describes a synthetic dataset and generates its rows, chunk by chunk.
+
+    Every chunk is generated from its own random generator, seeded from the dataset seed and the chunk
+    number, so the rows are the same whatever the number of workers or the order the chunks run in.
+
+    The transactions are drawn in pairs: a deposit, then (with `withdrawal_ratio` probability) a withdrawal
+    of at most the same amount on the same account, later in time. The balance of an account is therefore
+    never negative at any point of its history. `hot_share` of the deposits go to the first `hot_accounts`
+    accounts, the others follow a power law over all accounts (`tail_skew` 1 is uniform, higher values
+    concentrate them on fewer accounts). Days get busier towards the end of the period, hours follow
+    `HOURLY_WEIGHTS`. The period ends at midnight, today is left empty for the daily withdrawal limits.
+
+    The withdrawals of an account on a day never add up to more than `maximum_daily_limit`. Chunks are
+    generated apart, so each one gets an equal share of the limit of every account and day, and withdrawals
+    are cut down (or left out) to fit it. Fewer, larger chunks keep the withdrawals of busy accounts closer to
+    the limit.
+    """
+    def __init__(
+            self,
+            holders: int,
+            accounts: int,
+            transactions: int,
+            days: int,
+            hot_accounts: int,
+            hot_share: float,
+            tail_skew: float,
+            withdrawal_ratio: float,
+            maximum_daily_limit: Decimal,
+            chunk_size: int,
+            seed: int,
+            first_number: int = 1,
+            end: datetime = None
+    ):
+        if not 0 < holders <= accounts:
+            raise ValueError("The dataset needs at least one holder and one account per holder")
+        if holders > _CPF_BASES:
+            raise ValueError(f"At most {_CPF_BASES} distinct CPFs can be generated")
+        self.holders = holders
+        self.accounts = accounts
+        self.transactions = transactions
+        self.days = days
+        self.hot_accounts = min(hot_accounts, accounts)
+        self.hot_share = hot_share if self.hot_accounts else 0.0
+        self.tail_skew = tail_skew
+        self.withdrawal_ratio = withdrawal_ratio
+        self.maximum_daily_limit = maximum_daily_limit
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.first_number = first_number
+        self.end = end or datetime.combine(date.today(), datetime.min.time())
+        self.start = self.end - timedelta(days=days)
+        self._cpf_offset = random.Random(f"{seed}-cpf").randrange(_CPF_BASES)
+        # Day d weighs 1 + d / days, the last day of the period has about twice the traffic of the first
+        self._day_weights = [sum(1 + x / days for x in range(d + 1)) for d in range(days)]
+        self._hour_weights = [sum(HOURLY_WEIGHTS[:h + 1]) for h in range(24)]
+
+    def chunks(self, rows: int) -> int:
+        return -(-rows // self.chunk_size)
+
+    def cpf(self, index: int) -> str:
+        run, offset = divmod((self._cpf_offset + index * _CPF_STEP) % _CPF_BASES, _CPF_RUN)
+        return generate_cpf(run * (_CPF_RUN + 1) + 1 + offset)
+
+    def account_id(self, index: int) -> UUID:
+        return _account_id(self.seed, index)
+
+    def holder_rows(self, chunk: int) -> Iterator[tuple]:
+        """
+        :return: (cpf, name, status) rows
+        """
+        rng = random.Random(f"{self.seed}-holders-{chunk}")
+        for i in range(chunk * self.chunk_size, min((chunk + 1) * self.chunk_size, self.holders)):
+            yield self.cpf(i), f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", True
+
+    def account_rows(self, chunk: int) -> Iterator[tuple]:
+        """
+        :return: (id, holder, number, agency, balance, created_at, status) rows. Balances are zero, they are
+            set from the history once it is loaded
+        """
+        rng = random.Random(f"{self.seed}-accounts-{chunk}")
+        for i in range(chunk * self.chunk_size, min((chunk + 1) * self.chunk_size, self.accounts)):
+            created_at = self.start - timedelta(seconds=rng.uniform(0, 365 * 86400))
+            yield (self.account_id(i), self.cpf(i % self.holders), format_account_number(self.first_number + i),
+                   f"{rng.randrange(10000):0>4}", "0.00", created_at, AccountStatus.active.value)
+
+    def transaction_rows(self, chunk: int) -> Iterator[tuple]:
+        """
+        :return: (id, dock_account, type, amount, created_at) rows
+        """
+        rng = random.Random(f"{self.seed}-transactions-{chunk}")
+        remaining = min(self.chunk_size, self.transactions - chunk * self.chunk_size)
+        # Share of the daily limit of this chunk and what it already withdrew, in cents by (account, day)
+        daily_limit = int(Decimal(self.maximum_daily_limit) * 100) // self.chunks(self.transactions)
+        daily_withdrawn = defaultdict(int)
+        while remaining > 0:
+            dock_account_id = self.account_id(self._draw_account(rng))
+            created_at = self._draw_time(rng)
+            amount = round(min(max(rng.lognormvariate(4.0, 1.2), 0.01), 50000.0), 2)
+            yield self._uuid(rng), dock_account_id, TransactionType.deposit.value, f"{amount:.2f}", created_at
+            remaining -= 1
+            if remaining and rng.random() < self.withdrawal_ratio:
+                withdrawn = max(round(amount * rng.uniform(0.05, 1.0) * 100), 1)
+                withdrawn_at = min(created_at + timedelta(seconds=rng.expovariate(1 / 259200)),
+                                   self.end - timedelta(microseconds=1))
+                withdrawal_id = self._uuid(rng)
+                key = (dock_account_id, withdrawn_at.date())
+                withdrawn = min(withdrawn, daily_limit - daily_withdrawn[key])
+                if withdrawn <= 0:
+                    continue
+                daily_withdrawn[key] += withdrawn
+                yield (withdrawal_id, dock_account_id, TransactionType.withdrawal.value, f"{withdrawn / 100:.2f}",
+                       withdrawn_at)
+                remaining -= 1
+
+    def _draw_account(self, rng: random.Random) -> int:
+        if rng.random() < self.hot_share:
+            return rng.randrange(self.hot_accounts)
+        return min(int(self.accounts * rng.random() ** self.tail_skew), self.accounts - 1)
+
+    def _draw_time(self, rng: random.Random) -> datetime:
+        day = rng.choices(range(self.days), cum_weights=self._day_weights)[0]
+        hour = rng.choices(range(24), cum_weights=self._hour_weights)[0]
+        return self.start + timedelta(days=day, hours=hour, seconds=rng.uniform(0, 3600))
+
+    @staticmethod
+    def _uuid(rng: random.Random) -> UUID:
+        return UUID(int=rng.getrandbits(128), version=4)
+
+
+def _copy(table: str, columns: List[str], rows: Iterator[tuple]) -> int:
+    """
+    Loads rows with COPY on a connection of its own, committed when done.
+
+    :return: number of rows loaded
+    """
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write(",".join(map(str, row)))
+        buffer.write("\n")
+        count += 1
+    buffer.seek(0)
+    init_database()
+    connection = psycopg2.connect(database=db.database, **db.connect_params)
+    try:
+        with connection, connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY "{table}" ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        connection.close()
+    return count
+
+
+def load_chunk(shape: DatasetShape, model: str, chunk: int) -> int:
+    """
+    Generates and loads one chunk of rows of `model` (`holder`, `dockaccount` or `transactionhistory`),
+    runs in the worker processes.
+    """
+    if model == Holder._meta.table_name:
+        return _copy(model, ["cpf", "name", "status"], shape.holder_rows(chunk))
+    if model == DockAccount._meta.table_name:
+        return _copy(model, ["id", "holder_id", "number", "agency", "balance", "created_at", "status"],
+                     shape.account_rows(chunk))
+    return _copy(model, ["id", "dock_account_id", "type", "amount", "created_at"], shape.transaction_rows(chunk))
+
+
+def load(shape: DatasetShape, workers: int):
+    """
+    Loads the holders, then the accounts, then the transactions (each table waits for the one its foreign
+    keys point to), with `workers` processes running one chunk each at a time.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for model, rows in ((Holder, shape.holders), (DockAccount, shape.accounts),
+                            (TransactionHistory, shape.transactions)):
+            table = model._meta.table_name
+            start_time = time.perf_counter()
+            chunks = shape.chunks(rows)
+            loaded = sum(executor.map(load_chunk, [shape] * chunks, [table] * chunks, range(chunks)))
+            elapsed = time.perf_counter() - start_time
+            logger.info(f"Loaded {table} - rows={loaded} seconds={elapsed:.1f} rows_per_second={loaded / elapsed:.0f}")
+
+
+def finish(shape: DatasetShape):
+    """
+    Registers the transaction ids and sets the account balances and the daily withdrawal totals from the
+    loaded history.
+    """
+    account = DockAccount._meta.table_name
+    history = TransactionHistory._meta.table_name
+    start_time = time.perf_counter()
+    with db.atomic():
+        db.execute_sql(f'INSERT INTO "{TransactionId._meta.table_name}" (id) SELECT id FROM "{history}" '
+                       f"ON CONFLICT (id) DO NOTHING")
+        db.execute_sql(
+            f'UPDATE "{account}" SET balance = totals.balance FROM ('
+            f"SELECT dock_account_id, SUM(CASE WHEN type = %s THEN amount ELSE -amount END) AS balance "
+            f'FROM "{history}" GROUP BY dock_account_id) AS totals '
+            f'WHERE "{account}".id = totals.dock_account_id',
+            (TransactionType.deposit.value,)
+        )
+    days = DailyWithdrawalRepository().rebuild(since=shape.start.date())
+    for model in (Holder, DockAccount, TransactionHistory, TransactionId, DailyWithdrawal):
+        db.execute_sql(f'ANALYZE "{model._meta.table_name}"')
+    logger.info(f"Balances and daily withdrawals set - daily_withdrawals={days} "
+                f"seconds={time.perf_counter() - start_time:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Seeds the database with a synthetic dataset for benchmarks: valid CPFs, accounts numbered "
+                    "from the account number sequence and a skewed transaction history, loaded with COPY. "
+                    "The dataset is the same for the same seed and sizes, on an empty database"
+    )
+    parser.add_argument("--holders", type=int, default=100000)
+    parser.add_argument("--accounts", type=int, help="accounts, spread evenly over the holders (one each by default)")
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=365, help="days of history, ending yesterday")
+    parser.add_argument("--hot-accounts", type=int, default=10, help="accounts receiving --hot-share of the deposits")
+    parser.add_argument("--hot-share", type=float, default=0.2)
+    parser.add_argument("--tail-skew", type=float, default=3.0,
+                        help="skew of the other deposits over the accounts, 1 for uniform")
+    parser.add_argument("--withdrawal-ratio", type=float, default=0.4,
+                        help="probability of each deposit being followed by a withdrawal")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="rows generated and loaded per COPY")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes generating and loading chunks")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--truncate", action="store_true",
+                        help="empties the tables and restarts the account number sequence first")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if get_settings().storage_backend != StorageBackend.postgres:
+        parser.error("The dataset is loaded into Postgres, set STORAGE_BACKEND=postgres")
+    init_database()
+    if args.truncate:
+        db.execute_sql(f'TRUNCATE "{Holder._meta.table_name}", "{TransactionId._meta.table_name}" CASCADE')
+        db.execute_sql(f'ALTER SEQUENCE "{ACCOUNT_NUMBER_SEQUENCE}" RESTART')
+
+    accounts = args.accounts or args.holders
+    shape = DatasetShape(
+        holders=args.holders, accounts=accounts, transactions=args.transactions, days=args.days,
+        hot_accounts=args.hot_accounts, hot_share=args.hot_share, tail_skew=args.tail_skew,
+        withdrawal_ratio=args.withdrawal_ratio, maximum_daily_limit=get_settings().maximum_daily_limit,
+        chunk_size=args.chunk_size, seed=args.seed,
+        first_number=DockAccountRepository().reserve_number_range(accounts)
+    )
+    partition_repository = TransactionHistoryPartitionRepository()
+    partition_repository.create_default_partition()
+    partition_repository.create_partitions(since=shape.start.date(), until=shape.end.date())
+    # The pool of this process is not shared with the workers, they open their own connections
+    db.close()
+
+    load(shape, workers=args.workers)
+    finish(shape)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,14 +4,44 @@ from functools import lru_cache
 
 from pydantic_settings import BaseSettings
 
+from app.interfaces.enum import StorageBackend
+
 class Settings(BaseSettings):
     environment: str = os.getenv("ENVIRONMENT")
+    storage_backend: StorageBackend = os.getenv("STORAGE_BACKEND", StorageBackend.postgres)
     database_user: str = os.getenv("DATABASE_USER")
     database_password: str = os.getenv("DATABASE_PASSWORD")
     database_host: str = os.getenv("DATABASE_HOST")
     database_port: str = os.getenv("DATABASE_PORT")
     database_name: str = os.getenv("DATABASE_NAME")
+    database_max_workers: int = os.getenv("DATABASE_MAX_WORKERS", 10)
+    database_pooled: bool = os.getenv("DATABASE_POOLED", True)
+    database_max_connections: int = os.getenv("DATABASE_MAX_CONNECTIONS", 20)
+    database_stale_timeout: int = os.getenv("DATABASE_STALE_TIMEOUT", 300)
+    database_pool_timeout: int = os.getenv("DATABASE_POOL_TIMEOUT", 10)
+    database_warm_connections: int = os.getenv("DATABASE_WARM_CONNECTIONS", 2)
+    database_replicas: str = os.getenv("DATABASE_REPLICAS", "")
+    database_replica_wait_timeout: float = os.getenv("DATABASE_REPLICA_WAIT_TIMEOUT", 0.5)
+    holder_cache_enabled: bool = os.getenv("HOLDER_CACHE_ENABLED", True)
+    dock_account_cache_enabled: bool = os.getenv("DOCK_ACCOUNT_CACHE_ENABLED", True)
+    cache_max_size: int = os.getenv("CACHE_MAX_SIZE", 10000)
+    cache_ttl: float = os.getenv("CACHE_TTL", 30)
+    slow_query_threshold: float = os.getenv("SLOW_QUERY_THRESHOLD", 0.5)
+    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    access_log_sample_rate: float = os.getenv("ACCESS_LOG_SAMPLE_RATE", 1.0)
+    access_log_slow_threshold: float = os.getenv("ACCESS_LOG_SLOW_THRESHOLD", 1.0)
+    write_behind_deposits: bool = os.getenv("WRITE_BEHIND_DEPOSITS", False)
+    write_behind_shards: int = os.getenv("WRITE_BEHIND_SHARDS", 8)
+    write_behind_flush_size: int = os.getenv("WRITE_BEHIND_FLUSH_SIZE", 500)
+    write_behind_flush_interval: float = os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 0.05)
     maximum_daily_limit: Decimal = os.getenv("MAXIMUM_DAILY_LIMIT", 2000.0)
+    maximum_batch_size: int = os.getenv("MAXIMUM_BATCH_SIZE", 10000)
+    maximum_import_size: int = os.getenv("MAXIMUM_IMPORT_SIZE", 100000)
+    account_number_block_size: int = os.getenv("ACCOUNT_NUMBER_BLOCK_SIZE", 100)
+    default_page_size: int = os.getenv("DEFAULT_PAGE_SIZE", 100)
+    maximum_page_size: int = os.getenv("MAXIMUM_PAGE_SIZE", 1000)
+    partition_months_ahead: int = os.getenv("PARTITION_MONTHS_AHEAD", 3)
+    partition_retention_months: int = os.getenv("PARTITION_RETENTION_MONTHS", 0)
 
 @lru_cache
 def get_settings():
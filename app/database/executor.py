@@ -0,0 +1,71 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from playhouse.pool import PooledDatabase
+
+from app.config.settings import get_settings
+from app.database.models import db
+from app.database.routing import read_router
+
+
+class DatabaseExecutor:
+    """
+    Runs blocking peewee calls in a dedicated thread pool, so a slow query holds a worker thread
+    instead of the event loop.
+
+    Peewee keeps one connection per thread, a call submitted here runs entirely on one thread and
+    therefore on one connection: anything that must share a transaction (`db.atomic()`, row locks)
+    has to be submitted as a single call. The caller's context variables are copied into the thread.
+
+    With the connection pool enabled the connection is checked out for the duration of the call only,
+    so pool slots are held while queries run and not while requests wait on anything else.
+    """
+    def __init__(self, max_workers: int):
+        self._max_workers = max_workers
+        # Threads are only started on the first calls, so the executor can be created before forking
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="database")
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(context.run, self._call, func, *args, **kwargs)
+        )
+
+    @staticmethod
+    def _call(func: Callable[..., Any], *args, **kwargs) -> Any:
+        if not isinstance(db.obj, PooledDatabase):
+            return func(*args, **kwargs)
+        try:
+            with db.connection_context():
+                return func(*args, **kwargs)
+        finally:
+            read_router.release()
+
+    async def warm_up(self, connections: int):
+        """
+        Opens `connections` database connections at once, one per executor thread, so the first requests
+        don't pay for connecting. With the pool enabled they are left idle in the pool.
+        """
+        connections = min(connections, self._max_workers)
+        if connections <= 0:
+            return
+        # Each thread holds its connection until all of them are open, otherwise a thread done early could
+        # take the next call and reuse its connection
+        barrier = threading.Barrier(connections, timeout=get_settings().database_pool_timeout)
+
+        def connect():
+            db.execute_sql("SELECT 1")
+            barrier.wait()
+
+        await asyncio.gather(*(self.run(connect) for _ in range(connections)))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+database_executor = DatabaseExecutor(max_workers=get_settings().database_max_workers)
@@ -0,0 +1,95 @@
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from app.config.settings import get_settings
+
+slow_query_logger = logging.getLogger("slow_query")
+
+_STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    SQL with literals and parameters replaced by `?` and whitespace collapsed, so the same statement
+    always logs the same text.
+    """
+    sql = _STRING_PATTERN.sub("?", sql)
+    sql = _NUMBER_PATTERN.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    return _WHITESPACE_PATTERN.sub(" ", sql).strip()
+
+
+class QueryStats:
+    """
+    Statements run on behalf of one request. Shared by the executor threads serving the request.
+    """
+    def __init__(self, scope: Optional[dict] = None):
+        self._scope = scope or {}
+        self._lock = threading.Lock()
+        self.count = 0
+        self.time = 0.0
+
+    @property
+    def route(self) -> str:
+        # The matched route is only in the scope once the router has run, before that the raw path is used
+        route = self._scope.get("route")
+        return getattr(route, "path", None) or self._scope.get("path", "-")
+
+    def add(self, duration: float):
+        with self._lock:
+            self.count += 1
+            self.time += duration
+
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries(scope: Optional[dict] = None):
+    """
+    Counts the statements run in this context, executor calls included, and their total time.
+
+    :param scope: ASGI scope of the request, used to name the route in the slow query log
+    """
+    stats = QueryStats(scope)
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+class QueryInstrumentationMixin:
+    """
+    Times every statement going through `execute_sql`, adds it to the current request statistics and
+    logs it when it takes `SLOW_QUERY_THRESHOLD` seconds or more.
+    """
+    def execute_sql(self, sql, *args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            return super().execute_sql(sql, *args, **kwargs)
+        finally:
+            self.record_query(sql, time.perf_counter() - start_time)
+
+    @staticmethod
+    def record_query(sql: str, duration: float):
+        """
+        Adds a statement to the current request statistics and logs it when slow. Called by `execute_sql`,
+        and directly by the statements that run on a cursor of their own (the export streams).
+        """
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.add(duration)
+        if duration >= get_settings().slow_query_threshold and slow_query_logger.isEnabledFor(logging.WARNING):
+            slow_query_logger.warning("Slow query", extra={"fields": {
+                "route": stats.route if stats is not None else "-",
+                "duration": duration,
+                "sql": normalize_sql(sql),
+            }})
@@ -0,0 +1,114 @@
+import itertools
+import threading
+from bisect import insort
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+from uuid import UUID
+
+from app.interfaces.dock_account import DockAccountInterface
+from app.interfaces.holder import HolderInterface
+from app.interfaces.transaction_history import TransactionHistoryInterface
+
+
+class MemoryTransaction:
+    """
+    Transaction of the in-memory store. Holds the store lock until it ends, so units of work run one at a
+    time, and undoes the changes registered with `MemoryDatabase.on_rollback` when an exception leaves it.
+    """
+    def __init__(self, database: "MemoryDatabase"):
+        self._database = database
+        self._undo: List[Callable[[], None]] = []
+
+    def __enter__(self):
+        self._database.lock.acquire()
+        self._database._local.transaction = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is not None:
+                for undo in reversed(self._undo):
+                    undo()
+        finally:
+            self._database._local.transaction = None
+            self._undo = []
+            self._database.lock.release()
+        return False
+
+
+class MemoryDatabase:
+    """
+    Process-local storage of the `memory` backend (`STORAGE_BACKEND=memory`), used by the tests and the
+    benchmarks to run the services without Postgres.
+
+    Rows are the interface models, indexed by their keys. The history of each account is also kept as a
+    sorted list of (created_at, id) keys, the order the Postgres repositories read it in.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """
+        Drops every row, each test starts from an empty store.
+        """
+        with self.lock:
+            self.holders: Dict[str, HolderInterface] = {}
+            self.dock_accounts: Dict[UUID, DockAccountInterface] = {}
+            # (agency, number) pairs taken, unique like the `dockaccount_agency_number` index
+            self.dock_account_numbers: Dict[Tuple[str, str], UUID] = {}
+            self.holder_dock_accounts: Dict[str, List[UUID]] = defaultdict(list)
+            self.transactions: Dict[UUID, TransactionHistoryInterface] = {}
+            self.dock_account_transactions: Dict[UUID, List[Tuple[datetime, UUID]]] = defaultdict(list)
+            self.daily_withdrawals: Dict[Tuple[UUID, date], Decimal] = {}
+            self.account_number_sequence = itertools.count(1)
+
+    def transaction(self) -> MemoryTransaction:
+        return MemoryTransaction(self)
+
+    def on_rollback(self, undo: Callable[[], None]):
+        """
+        Registers how to undo a change made in the current transaction. Changes made outside of a
+        transaction are committed right away and never undone.
+        """
+        transaction = getattr(self._local, "transaction", None)
+        if transaction is not None:
+            transaction._undo.append(undo)
+
+    def put(self, table: dict, key: Hashable, value: Any):
+        """
+        Sets `table[key]`, the previous value (or its absence) is restored on rollback.
+        """
+        missing = key not in table
+        previous = table.get(key)
+        table[key] = value
+
+        def undo():
+            if missing:
+                table.pop(key, None)
+            else:
+                table[key] = previous
+        self.on_rollback(undo)
+
+    def delete(self, table: dict, key: Hashable):
+        """
+        Removes `table[key]`, restored on rollback.
+        """
+        previous = table.pop(key)
+        self.on_rollback(lambda: table.__setitem__(key, previous))
+
+    def add(self, keys: list, key: Any, ordered: bool = False):
+        """
+        Appends `key` to a list, or inserts it in order when `ordered`. Removed on rollback.
+        """
+        if ordered:
+            insort(keys, key)
+        else:
+            keys.append(key)
+        self.on_rollback(lambda: keys.remove(key))
+
+
+memory_db = MemoryDatabase()
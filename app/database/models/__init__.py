@@ -1,9 +1,25 @@
+from typing import List
+
+from peewee import Database, DatabaseProxy
 from playhouse.signals import Model
 from app.database.provider import DatabaseProvider
 
-db = DatabaseProvider().get_database()
+# Bound by `init_database`, which the app calls in its lifespan (after the workers fork) and the jobs and
+# tests call before touching the database. Nothing connects at import.
+db = DatabaseProxy()
+replicas: List[Database] = []
+
+def init_database():
+    """
+    Builds the primary and replica databases from the settings. Connections are only opened when first used.
+    Calling it again does nothing.
+    """
+    if db.obj is not None:
+        return
+    db.initialize(DatabaseProvider.get_database())
+    replicas[:] = DatabaseProvider.get_replicas()
 
 class BaseModel(Model):
     """A base model that will use our Postgresql database"""
     class Meta:
-        database = db
\ No newline at end of file
+        database = db
@@ -0,0 +1,13 @@
+from peewee import ForeignKeyField, DecimalField, DateField, CompositeKey
+
+from app.database.models import BaseModel
+from app.database.models.dock_account import DockAccount
+
+
+class BalanceSnapshot(BaseModel):
+    dock_account = ForeignKeyField(DockAccount, backref="balance_snapshots")
+    day = DateField()
+    balance = DecimalField()
+
+    class Meta:
+        primary_key = CompositeKey("dock_account", "day")
@@ -0,0 +1,13 @@
+from peewee import ForeignKeyField, DecimalField, DateField, CompositeKey
+
+from app.database.models import BaseModel
+from app.database.models.dock_account import DockAccount
+
+
+class DailyWithdrawal(BaseModel):
+    dock_account = ForeignKeyField(DockAccount, backref="daily_withdrawals")
+    day = DateField()
+    amount = DecimalField(default=0)
+
+    class Meta:
+        primary_key = CompositeKey("dock_account", "day")
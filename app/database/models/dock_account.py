@@ -15,3 +15,8 @@ class DockAccount(BaseModel):
     created_at = DateTimeField(default=datetime.now)
     updated_at = DateTimeField(null=True, default=None)
     status = CharField(default="ACTIVE")
+
+    class Meta:
+        indexes = (
+            (("agency", "number"), True),
+        )
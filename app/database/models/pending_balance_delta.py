@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from peewee import UUIDField, ForeignKeyField, DecimalField, DateTimeField
+
+from app.database.models import BaseModel
+from app.database.models.dock_account import DockAccount
+
+
+class PendingBalanceDelta(BaseModel):
+    # Id of the transaction that produced the delta
+    id = UUIDField(primary_key=True)
+    dock_account = ForeignKeyField(DockAccount, backref="pending_balance_deltas")
+    amount = DecimalField()
+    created_at = DateTimeField(default=datetime.now)
@@ -1,22 +1,34 @@
 from datetime import datetime
 
-from peewee import CharField, UUIDField, ForeignKeyField, DecimalField, DateTimeField
-from playhouse.signals import post_save
+from peewee import CharField, UUIDField, ForeignKeyField, DecimalField, DateTimeField, CompositeKey
 
 from app.database.models import BaseModel
 from app.database.models.dock_account import DockAccount
-from app.repositories.dock_account_repository import DockAccountRepository
+
 
 class TransactionHistory(BaseModel):
-    id = UUIDField(unique=True, primary_key=True)
+    id = UUIDField()
     dock_account = ForeignKeyField(DockAccount, backref="transactions")
     type = CharField()
     amount = DecimalField()
     created_at = DateTimeField(default=datetime.now)
 
-@post_save(sender=TransactionHistory)
-def on_save_handler(model_class, instance, created):
-    _repository = DockAccountRepository()
-    _repository.make_transaction(
-        dock_account=instance.dock_account, amount=instance.amount, transaction_type=instance.type
-    )
+    class Meta:
+        # Range partitioned by month on created_at (see TransactionHistoryPartitionRepository),
+        # Postgres requires the partition key to be part of the primary key. The id alone is kept unique by
+        # TransactionId
+        primary_key = CompositeKey("id", "created_at")
+        table_settings = ["PARTITION BY RANGE (created_at)"]
+
+
+# Statement queries filter by account and period and page in (created_at, id) order
+TransactionHistory.add_index(
+    TransactionHistory.index(TransactionHistory.dock_account, TransactionHistory.created_at, TransactionHistory.id,
+                             name="transactionhistory_dock_account_id_created_at_id")
+)
+# Daily withdrawal sums are answered from this index alone (amount is part of the key)
+TransactionHistory.add_index(
+    TransactionHistory.index(TransactionHistory.dock_account, TransactionHistory.created_at, TransactionHistory.amount,
+                             name="transactionhistory_withdrawal_dock_account_id_created_at",
+                             where=(TransactionHistory.type == "WITHDRAWAL"))
+)
@@ -0,0 +1,9 @@
+from peewee import UUIDField
+
+from app.database.models import BaseModel
+
+
+class TransactionId(BaseModel):
+    # `transactionhistory` is partitioned on created_at, its primary key can only keep (id, created_at) unique.
+    # Every transaction id is also written here, in the same transaction, so an id is posted once at most.
+    id = UUIDField(primary_key=True)
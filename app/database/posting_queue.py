@@ -0,0 +1,146 @@
+import atexit
+import logging
+import threading
+from typing import List
+from uuid import UUID
+
+from fastapi import HTTPException
+
+from app.config.settings import get_settings
+from app.database.models import db
+from app.database.unit_of_work import UnitOfWork
+from app.repositories.dock_account_repository import DockAccountRepository
+from app.repositories.pending_balance_delta_repository import PendingBalanceDeltaRepository
+
+logger = logging.getLogger(__name__)
+
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        # Ids of the transactions whose deltas are waiting
+        self.pending: List[UUID] = []
+        self.thread = None
+
+
+class BalancePostingQueue:
+    """
+    Applies write-behind deposits to the account balances in micro-batches.
+
+    Deposits are committed to the history together with a `PendingBalanceDelta` row and then put here.
+    Accounts are spread over shards by id, each shard has a flusher thread that wakes up every
+    `flush_interval` seconds (or as soon as `flush_size` deltas are waiting) and applies the deltas of
+    the shard with one UPDATE per account. An account always falls in the same shard, so its balance row
+    is only ever updated by one flusher instead of by every request posting to it.
+
+    The pending rows make the queue durable: deltas left by a crash are applied by the
+    `apply_pending_balance_deltas` job, and a delta taken by a withdrawal before its flush is skipped. A delta
+    the balance refuses is dropped with an error log instead of holding back the shard.
+    """
+    def __init__(self, shards: int, flush_size: int, flush_interval: float):
+        self._shards = [_Shard() for _ in range(shards)]
+        self._flush_size = flush_size
+        self._flush_interval = flush_interval
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._dock_account_repository = DockAccountRepository()
+        self._pending_repository = PendingBalanceDeltaRepository()
+
+    def put(self, transaction_id: UUID, dock_account_id: UUID):
+        """
+        Queues the pending delta of a committed transaction.
+        """
+        shard = self._shards[hash(str(dock_account_id)) % len(self._shards)]
+        self._start(shard)
+        with shard.lock:
+            shard.pending.append(transaction_id)
+            full = len(shard.pending) >= self._flush_size
+        if full:
+            shard.wake.set()
+
+    def flush(self):
+        """
+        Applies every queued delta now, on the calling thread and its connection.
+        """
+        for shard in self._shards:
+            self._flush(shard)
+
+    def stop(self):
+        self._stopping.set()
+        for shard in self._shards:
+            shard.wake.set()
+            if shard.thread is not None:
+                shard.thread.join()
+        self.flush()
+
+    def _start(self, shard: _Shard):
+        if shard.thread is not None:
+            return
+        with self._start_lock:
+            if shard.thread is None:
+                shard.thread = threading.Thread(target=self._run, args=(shard,), daemon=True, name="balance-posting")
+                shard.thread.start()
+            if not self._started:
+                # Deltas still queued at exit are applied before the process ends
+                atexit.register(self.stop)
+                self._started = True
+
+    def _run(self, shard: _Shard):
+        while not self._stopping.is_set():
+            shard.wake.wait(self._flush_interval)
+            shard.wake.clear()
+            if not shard.pending:
+                continue
+            try:
+                # The connection (a pool slot when pooled) is only held while flushing
+                with db.connection_context():
+                    self._flush(shard)
+            except Exception as ex:
+                logger.exception(f"Failed to apply pending balance deltas - {ex}")
+
+    def _flush(self, shard: _Shard):
+        with shard.lock:
+            batch, shard.pending = shard.pending[:self._flush_size], shard.pending[self._flush_size:]
+        while batch:
+            try:
+                try:
+                    self._apply(batch)
+                except HTTPException:
+                    # A delta refused by the balance would fail the batch on every flush and hold back the
+                    # deltas queued behind it, they are applied one by one instead
+                    self._apply_each(batch)
+            except Exception:
+                # Put back for the next flush, the pending rows are still there
+                with shard.lock:
+                    shard.pending[:0] = batch
+                raise
+            with shard.lock:
+                batch, shard.pending = shard.pending[:self._flush_size], shard.pending[self._flush_size:]
+
+    def _apply(self, transaction_ids: List[UUID]):
+        with UnitOfWork():
+            deltas = self._pending_repository.take(ids=transaction_ids)
+            self._dock_account_repository.apply_balance_deltas(deltas=deltas)
+
+    def _apply_each(self, transaction_ids: List[UUID]):
+        for transaction_id in transaction_ids:
+            try:
+                self._apply([transaction_id])
+            except HTTPException as ex:
+                # Dropped, its pending row would also fail the withdrawals of the account and the recovery job.
+                # The error log is the record left for reconciling the account.
+                with UnitOfWork():
+                    deltas = self._pending_repository.take(ids=[transaction_id])
+                for dock_account_id, amount in deltas.items():
+                    logger.error(f"Pending balance delta dropped - transaction={transaction_id} "
+                                 f"dock_account={dock_account_id} amount={amount} {ex.detail}")
+
+_settings = get_settings()
+
+balance_posting_queue = BalancePostingQueue(
+    shards=_settings.write_behind_shards,
+    flush_size=_settings.write_behind_flush_size,
+    flush_interval=_settings.write_behind_flush_interval
+)
@@ -1,31 +1,152 @@
-from peewee import PostgresqlDatabase
-from testcontainers.postgres import PostgresContainer
+import threading
+import time
+from typing import List
+
+from peewee import Database, PostgresqlDatabase
+from playhouse.db_url import parse
+from playhouse.pool import PooledPostgresqlDatabase, MaxConnectionsExceeded
 
 from app.config.settings import get_settings
+from app.database.instrumentation import QueryInstrumentationMixin
 
 _settings = get_settings()
 
-if _settings.environment == "test":
-    postgres_test = PostgresContainer("postgres:16")
-    postgres_test.start()
+_postgres_test = None
+
+
+def _get_postgres_test():
+    # testcontainers (and Docker) are only needed, and imported, when the tests ask for the database
+    global _postgres_test
+    if _postgres_test is None:
+        from testcontainers.postgres import PostgresContainer
+        _postgres_test = PostgresContainer("postgres:16")
+        _postgres_test.start()
+    return _postgres_test
+
+
+class InstrumentedPostgresqlDatabase(QueryInstrumentationMixin, PostgresqlDatabase):
+    def checkout(self):
+        """
+        A connection not bound to the calling thread, for a stream read from whichever thread consumes it.
+        Not pooled, it is a connection of its own. Must be given back with `checkin`.
+        """
+        return self._connect()
+
+    def checkin(self, connection):
+        self._close(connection)
+
+
+class MonitoredPooledPostgresqlDatabase(QueryInstrumentationMixin, PooledPostgresqlDatabase):
+    """
+    Connection pool that also keeps checkout statistics: how many checkouts were made, how long they
+    took (waiting for a free connection included) and how many timed out.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    def connect(self, reuse_if_open=False):
+        start_time = time.perf_counter()
+        try:
+            connected = super().connect(reuse_if_open)
+        except MaxConnectionsExceeded:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        if connected:
+            self._record_checkout(time.perf_counter() - start_time)
+        return connected
+
+    def checkout(self):
+        """
+        Takes a connection from the pool without binding it to the calling thread, for a stream read from
+        whichever thread consumes it. Waits for a free connection up to the pool timeout, like `connect`.
+        Must be given back with `checkin`.
+        """
+        start_time = time.perf_counter()
+        expires = start_time + (self._wait_timeout or 0)
+        while True:
+            try:
+                connection = self._connect()
+                break
+            except MaxConnectionsExceeded:
+                if time.perf_counter() >= expires:
+                    with self._stats_lock:
+                        self._timeouts += 1
+                    raise
+                time.sleep(0.1)
+        self._record_checkout(time.perf_counter() - start_time)
+        return connection
+
+    def checkin(self, connection):
+        # Back to the pool, or closed when stale or left in a transaction
+        self._close(connection)
+
+    def _record_checkout(self, checkout_time: float):
+        with self._stats_lock:
+            self._checkouts += 1
+            self._checkout_time_total += checkout_time
+            self._checkout_time_max = max(self._checkout_time_max, checkout_time)
+
+    def pool_stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "max_connections": self._max_connections,
+                "in_use": len(self._in_use),
+                "idle": len(self._connections),
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "checkout_time_avg": self._checkout_time_total / self._checkouts if self._checkouts else 0.0,
+                "checkout_time_max": self._checkout_time_max,
+            }
+
 
 class DatabaseProvider:
 
     @staticmethod
     def get_database():
         if _settings.environment == "test":
-            db = PostgresqlDatabase(
-                postgres_test.dbname,
+            postgres_test = _get_postgres_test()
+            database = postgres_test.dbname
+            connect_params = dict(
                 user=postgres_test.username,
                 password=postgres_test.password,
                 host=postgres_test.get_container_host_ip(),
                 port=postgres_test.get_exposed_port(5432)
             )
         else:
-            db = PostgresqlDatabase(
-                _settings.database_name,
+            database = _settings.database_name
+            connect_params = dict(
                 user=_settings.database_user,
                 password=_settings.database_password,
                 host=_settings.database_host
             )
-        return db
+        return DatabaseProvider._build(database, connect_params)
+
+    @staticmethod
+    def get_replicas() -> List[Database]:
+        """
+        Builds one database per URL in `DATABASE_REPLICAS` (comma separated `postgresql://` URLs).
+        """
+        replicas = []
+        for url in filter(None, (x.strip() for x in _settings.database_replicas.split(","))):
+            connect_params = parse(url)
+            database = connect_params.pop("database")
+            replicas.append(DatabaseProvider._build(database, connect_params))
+        return replicas
+
+    @staticmethod
+    def _build(database: str, connect_params: dict) -> Database:
+        if _settings.database_pooled:
+            return MonitoredPooledPostgresqlDatabase(
+                database,
+                max_connections=_settings.database_max_connections,
+                stale_timeout=_settings.database_stale_timeout,
+                timeout=_settings.database_pool_timeout,
+                **connect_params
+            )
+        return InstrumentedPostgresqlDatabase(database, **connect_params)
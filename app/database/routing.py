@@ -0,0 +1,111 @@
+import asyncio
+import itertools
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, List, Optional
+
+from peewee import Database, OperationalError
+
+from app.config.settings import get_settings
+from app.database.models import db, replicas
+
+LSN_PATTERN = re.compile(r"^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$")
+
+_read_database: ContextVar[Optional[Database]] = ContextVar("read_database", default=None)
+
+
+class ReadRouter:
+    """
+    Picks the database the reads of a request run on: replicas in turn, or the primary when there are none.
+
+    A read carrying a consistency token (the primary's WAL position after a write) only goes to a
+    replica that has replayed up to that position. Replicas are polled until `wait_timeout` expires,
+    then the read falls back to the primary.
+    """
+    def __init__(self, primary: Database, replicas: List[Database], wait_timeout: float):
+        self._primary = primary
+        self._replicas = replicas
+        self._wait_timeout = wait_timeout
+        self._next_replica = itertools.count()
+
+    @property
+    def has_replicas(self) -> bool:
+        return bool(self._replicas)
+
+    async def for_read(self, run: Callable[..., Awaitable[Any]], min_lsn: Optional[str] = None) -> Database:
+        """
+        Resolves the read database once, for a whole request.
+
+        :param run: runs a blocking call off the event loop, `database_executor.run`. Only the replay
+        checks are submitted to it, the waits between them are spent on the event loop.
+        """
+        if not self._replicas:
+            return self._primary
+        if min_lsn is None:
+            return self.replayed_replica()
+        expires = time.monotonic() + self._wait_timeout
+        while True:
+            replica = await run(self.replayed_replica, min_lsn)
+            if replica is not None:
+                return replica
+            if time.monotonic() >= expires:
+                return self._primary
+            await asyncio.sleep(0.05)
+
+    def replayed_replica(self, min_lsn: Optional[str] = None) -> Optional[Database]:
+        """
+        :return: the next replica in turn that has replayed `min_lsn`, None when none has yet
+        """
+        start = next(self._next_replica)
+        candidates = [self._replicas[(start + i) % len(self._replicas)] for i in range(len(self._replicas))]
+        if min_lsn is None:
+            return candidates[0]
+        for replica in candidates:
+            if self._has_replayed(replica, min_lsn):
+                return replica
+        return None
+
+    def current_lsn(self) -> Optional[str]:
+        """
+        :return: the primary's current WAL position, None when there are no replicas to wait for
+        """
+        if not self._replicas:
+            return None
+        return self._primary.execute_sql("SELECT pg_current_wal_lsn()::text").fetchone()[0]
+
+    def release(self):
+        # Returns the replica connections opened by the calling thread
+        for replica in self._replicas:
+            if not replica.is_closed():
+                replica.close()
+
+    @staticmethod
+    def _has_replayed(replica: Database, min_lsn: str) -> bool:
+        try:
+            row = replica.execute_sql("SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn", (min_lsn,)).fetchone()
+        except OperationalError:
+            return False
+        return bool(row[0])
+
+
+read_router = ReadRouter(primary=db, replicas=replicas, wait_timeout=get_settings().database_replica_wait_timeout)
+
+
+@contextmanager
+def pinned_read_database(database: Database):
+    """
+    Runs the repository reads in this context on `database`, resolved by `ReadRouter.for_read` for a
+    read-only request. Reads made by writes keep going to the primary.
+    """
+    token = _read_database.set(database)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+def read_database() -> Database:
+    database = _read_database.get()
+    return db if database is None else database
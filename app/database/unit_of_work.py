@@ -0,0 +1,82 @@
+import threading
+from typing import Callable, List, Optional
+
+from peewee import Database
+
+from app.config.settings import get_settings
+from app.database.executor import database_executor
+from app.database.memory import memory_db
+from app.database.models import db
+from app.interfaces.enum import StorageBackend
+
+_local = threading.local()
+
+
+class UnitOfWork:
+    """
+    One database transaction for a block of repository calls, committed once when the block ends and
+    rolled back entirely when an exception (HTTPException included) leaves it.
+
+    Reentrant: a unit of work opened inside another one joins it instead of opening a savepoint, so
+    repositories can use it around their own writes and still be composed by the services.
+    The transaction lives on the connection of the current thread, the whole block must run on one
+    thread (see `run_in_unit_of_work`).
+
+    :param database: database of the transaction, the one of the configured storage backend by default
+    """
+    def __init__(self, database: Optional[Database] = None):
+        if database is None:
+            database = memory_db if get_settings().storage_backend == StorageBackend.memory else db
+        self._database = database
+        self._transaction = None
+        self._outer = None
+        self._after_commit: List[Callable[[], None]] = []
+
+    def __enter__(self):
+        self._outer = getattr(_local, "current", None)
+        if self._outer is None:
+            self._transaction = self._database.transaction()
+            self._transaction.__enter__()
+        _local.current = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.current = self._outer
+        if self._outer is not None:
+            return False
+        try:
+            self._transaction.__exit__(exc_type, exc_val, exc_tb)
+        finally:
+            callbacks, self._after_commit = self._after_commit, []
+        if exc_type is None:
+            for callback in callbacks:
+                callback()
+        return False
+
+    def _root(self) -> "UnitOfWork":
+        unit = self
+        while unit._outer is not None:
+            unit = unit._outer
+        return unit
+
+    @staticmethod
+    def after_commit(callback: Callable[[], None]):
+        """
+        Calls `callback` once the current unit of work commits (never if it rolls back), right away
+        when there is no unit of work open on this thread.
+        """
+        current = getattr(_local, "current", None)
+        if current is None:
+            callback()
+        else:
+            current._root()._after_commit.append(callback)
+
+
+async def run_in_unit_of_work(func: Callable, *args, **kwargs):
+    """
+    Runs `func` in the database executor inside a unit of work: one thread, one connection, one commit.
+    """
+    def call():
+        with UnitOfWork():
+            return func(*args, **kwargs)
+    return await database_executor.run(call)
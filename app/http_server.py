@@ -1,40 +1,158 @@
+import os
 import time
 import logging
+import random
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI, Request
+from playhouse.pool import PooledDatabase
 from starlette.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
-from app.routers import holder, dock_account, transaction_history
+from app import import_started_at
+from app.config.settings import get_settings
+from app.database.executor import database_executor
+from app.database.instrumentation import QueryStats, track_queries
+from app.database.models import db, init_database
+from app.database.routing import LSN_PATTERN, pinned_read_database, read_router
+from app.interfaces.enum import StorageBackend
+from app.routers import holder, dock_account, transaction_history, internal, metrics
+from app.utils.metrics import http_request_duration, http_requests, worker_startup_time
+from app.utils.structured_logging import setup_queue_logging
 
-logger = logging.getLogger("uvicorn.error")
-app = FastAPI()
+access_logger = logging.getLogger("access")
+startup_logger = logging.getLogger("startup")
+_log_listener = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in each worker once it is forked: the log thread, the database and its connections are only
+    # set up here, never at import
+    global _log_listener
+    _settings = get_settings()
+    if _log_listener is None:
+        _log_listener = setup_queue_logging(access_logger.name, "slow_query", startup_logger.name,
+                                            level=_settings.log_level)
+    # The memory storage backend keeps its rows in the process, there is no database to open
+    postgres = _settings.storage_backend == StorageBackend.postgres
+    if postgres:
+        init_database()
+    # Built on the first request to /docs otherwise, it compiles the JSON schema of every interface
+    app.openapi()
+    if postgres:
+        await database_executor.warm_up(connections=_settings.database_warm_connections)
+
+    startup_time = time.perf_counter() - import_started_at
+    worker_startup_time.set(startup_time)
+    startup_logger.info("Worker ready", extra={"fields": {"pid": os.getpid(), "startup_time": startup_time}})
+    yield
+    if isinstance(db.obj, PooledDatabase):
+        db.close_all()
 
-@app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, ex: StarletteHTTPException):
-    logger.error(f"Failed to complete request - {ex}")
+    # Reported by the access log of the request
+    request.state.error = ex.detail
     return JSONResponse(content={"message": ex.detail}, status_code=ex.status_code)
 
-@app.middleware("http")
+def log_request(request: Request, status_code: int, process_time: float, query_stats: QueryStats, exc_info=None):
+    # Errors and slow requests are always logged, successful requests only by sampling
+    _settings = get_settings()
+    if status_code >= 500:
+        level = logging.ERROR
+    elif status_code >= 400 or process_time >= _settings.access_log_slow_threshold:
+        level = logging.WARNING
+    elif random.random() < _settings.access_log_sample_rate:
+        level = logging.INFO
+    else:
+        return
+    if not access_logger.isEnabledFor(level):
+        return
+    route = request.scope.get("route")
+    access_logger.log(level, "Request finished", exc_info=exc_info, extra={"fields": {
+        "method": request.method,
+        "path": request.url.path,
+        "route": route.path if route else None,
+        "status": status_code,
+        "process_time": process_time,
+        "db_queries": query_stats.count,
+        "db_time": query_stats.time,
+        "error": getattr(request.state, "error", None),
+    }})
+
+def record_request_metrics(request: Request, status_code: int, process_time: float):
+    # Labeled by route template (/holder/{cpf}), raw paths would create one series per CPF or account
+    route = request.scope.get("route")
+    route_path = route.path if route else "unmatched"
+    http_requests.inc(method=request.method, route=route_path, status=status_code)
+    http_request_duration.observe(process_time, method=request.method, route=route_path)
+
 async def middleware(request: Request, call_next):
-    logger.info(f"Request started [{request.method} {request.url.path}]")
+    start_time = time.perf_counter()
+    with track_queries(request.scope) as query_stats:
+        try:
+            response = await call_next(request)
+        except Exception as ex:
+            process_time = time.perf_counter() - start_time
+            log_request(request, status_code=500, process_time=process_time, query_stats=query_stats, exc_info=ex)
+            record_request_metrics(request, status_code=500, process_time=process_time)
+            return JSONResponse(content={"message": "Internal server error"}, status_code=500)
+    process_time = time.perf_counter() - start_time
+    response.headers["X-Process-Time"] = str(process_time)
+    response.headers["X-DB-Queries"] = str(query_stats.count)
+    response.headers["X-DB-Time"] = str(query_stats.time)
+    log_request(request, status_code=response.status_code, process_time=process_time, query_stats=query_stats)
+    record_request_metrics(request, status_code=response.status_code, process_time=process_time)
+    return response
+
+async def database_connection_middleware(request: Request, call_next):
+    # Queries run in the database executor, which checks a connection out of the pool for each call.
+    # A connection opened by the request on the event loop thread is returned to the pool here.
     try:
-        start_time = time.perf_counter()
-        response = await call_next(request)
-        process_time = time.perf_counter() - start_time
-        response.headers["X-Process-Time"] = str(process_time)
-        logger.info(f"Request finished [{request.method} {request.url.path}] - process_time={str(process_time)}")
-        return response
-    except Exception as ex:
-        logger.critical(f"Internal server error - {ex}")
-        return JSONResponse(content={"message": "Internal server error"}, status_code=500)
-
-app.include_router(holder.router)
-app.include_router(dock_account.router)
-app.include_router(transaction_history.router)
+        return await call_next(request)
+    finally:
+        if db.obj is not None and not db.is_closed():
+            db.close()
+
+async def read_consistency_middleware(request: Request, call_next):
+    # Read-only requests may be served by replicas, caught up to the X-Consistency-Token when informed. The
+    # database is resolved once and every read of the request runs on it.
+    # Successful writes return the primary's position in the same header so the next read can wait for it.
+    if request.method in ("GET", "HEAD"):
+        min_lsn = request.headers.get("X-Consistency-Token")
+        if min_lsn is not None and not LSN_PATTERN.match(min_lsn):
+            return await http_exception_handler(request, StarletteHTTPException(422, "Invalid consistency token"))
+        database = await read_router.for_read(database_executor.run, min_lsn=min_lsn)
+        with pinned_read_database(database):
+            return await call_next(request)
+
+    response = await call_next(request)
+    if response.status_code < 400 and read_router.has_replicas:
+        response.headers["X-Consistency-Token"] = await database_executor.run(read_router.current_lsn)
+    return response
+
+def create_app() -> FastAPI:
+    """
+    Builds the application. Cheap: the database is only opened by the lifespan, when the worker starts.
+    """
+    app = FastAPI(lifespan=lifespan)
+    app.add_exception_handler(StarletteHTTPException, http_exception_handler)
+    # The last middleware added runs first. The read consistency checks run inside the metrics middleware, so
+    # their time and their rejections are part of the request logs and metrics
+    app.middleware("http")(read_consistency_middleware)
+    app.middleware("http")(middleware)
+    app.middleware("http")(database_connection_middleware)
+
+    app.include_router(holder.router)
+    app.include_router(dock_account.router)
+    app.include_router(transaction_history.router)
+    app.include_router(internal.router)
+    app.include_router(metrics.router)
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
-    config = uvicorn.Config("http_server:app", port=8000, log_level="debug")
+    config = uvicorn.Config("http_server:app", port=8000, log_level="debug", access_log=False)
     server = uvicorn.Server(config)
     server.run()
\ No newline at end of file
@@ -24,7 +24,8 @@ class DockAccountInterface(BaseModel):
     def build(cls, dock_account: DockAccount):
         return cls(
             id=dock_account.id,
-            holder=dock_account.holder.cpf,
+            # The raw foreign key, dock_account.holder would load the holder with one query per account
+            holder=dock_account.holder_id,
             number=dock_account.number,
             agency=dock_account.agency,
             balance=dock_account.balance,
@@ -41,3 +42,8 @@ class UpdateDockAccountRequest(BaseModel):
     @classmethod
     def validate_cpf(cls, v: str) -> str:
         return re.sub("[^0-9]", "", v)
+
+class DockAccountBalance(BaseModel):
+    dock_account: UUID4
+    balance: Decimal
+    at: datetime
@@ -9,3 +9,23 @@ class AccountStatus(StrEnum):
 class TransactionType(StrEnum):
     deposit = "DEPOSIT"
     withdrawal = "WITHDRAWAL"
+
+class ExportFormat(StrEnum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+class ImportFormat(StrEnum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+class StorageBackend(StrEnum):
+    postgres = "postgres"
+    memory = "memory"
+
+class TransactionStatus(StrEnum):
+    accepted = "ACCEPTED"
+    rejected = "REJECTED"
+
+class ImportStatus(StrEnum):
+    accepted = "ACCEPTED"
+    rejected = "REJECTED"
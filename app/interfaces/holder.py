@@ -1,7 +1,17 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
+from app.interfaces.enum import ImportStatus
+
 
 class HolderInterface(BaseModel):
     cpf: str
     name: str
-    status: bool = True
\ No newline at end of file
+    status: bool = True
+
+class HolderImportResult(BaseModel):
+    row: int
+    cpf: Optional[str] = None
+    status: ImportStatus
+    detail: Optional[str] = None
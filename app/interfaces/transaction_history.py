@@ -1,11 +1,13 @@
+import base64
 from datetime import datetime
 from decimal import Decimal
+from typing import List, Optional
 from uuid import uuid4
 
 from pydantic import UUID4, BaseModel, Field
 
 from app.database.models.transaction_history import TransactionHistory
-from app.interfaces.enum import TransactionType
+from app.interfaces.enum import TransactionType, TransactionStatus
 
 
 class TransactionHistoryInterface(BaseModel):
@@ -13,14 +15,38 @@ class TransactionHistoryInterface(BaseModel):
     dock_account: UUID4
     type: TransactionType
     amount: Decimal
-    created_at: datetime = datetime.now()
+    created_at: datetime = Field(default_factory=datetime.now)
 
     @classmethod
     def build(cls, transaction: TransactionHistory):
         return cls(
             id=transaction.id,
-            dock_account=transaction.dock_account.id,
+            # The raw foreign key, transaction.dock_account would load the account with one query per row
+            dock_account=transaction.dock_account_id,
             type=transaction.type,
             amount=transaction.amount,
             created_at=transaction.created_at
         )
+
+class TransactionBatchResult(BaseModel):
+    id: UUID4
+    dock_account: UUID4
+    status: TransactionStatus
+    detail: Optional[str] = None
+
+class TransactionHistoryCursor(BaseModel):
+    """Position of the last transaction of a page, in the (created_at, id) order of the history."""
+    created_at: datetime
+    id: UUID4
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(self.model_dump_json().encode()).decode()
+
+    @classmethod
+    def decode(cls, cursor: str):
+        """Raises ValueError when the cursor was not produced by `encode`."""
+        return cls.model_validate_json(base64.urlsafe_b64decode(cursor.encode()))
+
+class TransactionHistoryPage(BaseModel):
+    items: List[TransactionHistoryInterface]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,32 @@
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from app.database.models import init_database
+from app.database.unit_of_work import UnitOfWork
+from app.repositories.dock_account_repository import DockAccountRepository
+from app.repositories.pending_balance_delta_repository import PendingBalanceDeltaRepository
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Applies the write-behind balance deltas left behind by API processes that stopped before "
+                    "flushing them"
+    )
+    parser.add_argument("--older-than", type=float, default=60.0,
+                        help="only deltas older than this many seconds, younger ones are still queued by a "
+                             "running process")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_database()
+    with UnitOfWork():
+        deltas = PendingBalanceDeltaRepository().take(before=datetime.now() - timedelta(seconds=args.older_than))
+        DockAccountRepository().apply_balance_deltas(deltas=deltas)
+    logger.info(f"Pending balance deltas applied - accounts={len(deltas)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import logging
+from datetime import date, timedelta
+
+from peewee import fn
+
+from app.database.models import init_database
+from app.database.models.transaction_history import TransactionHistory
+from app.repositories.balance_snapshot_repository import BalanceSnapshotRepository
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds the end of day balance snapshots from the transaction history")
+    parser.add_argument("--since", type=date.fromisoformat, default=None,
+                        help="first day to build (YYYY-MM-DD), defaults to the day after the last snapshot")
+    parser.add_argument("--until", type=date.fromisoformat, default=None,
+                        help="last day to build (YYYY-MM-DD), defaults to yesterday")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_database()
+    repository = BalanceSnapshotRepository()
+    since = args.since
+    if since is None:
+        last_day = repository.last_day()
+        if last_day is not None:
+            since = last_day + timedelta(days=1)
+        else:
+            first_transaction = TransactionHistory.select(fn.MIN(TransactionHistory.created_at)).scalar()
+            since = first_transaction.date() if first_transaction else date.today()
+    until = args.until or date.today() - timedelta(days=1)
+
+    if since > until:
+        logger.info(f"Balance snapshots are up to date - last_day={until}")
+        return
+    written = repository.build(since=since, until=until)
+    logger.info(f"Balance snapshots built - since={since} until={until} snapshots={written}")
+
+
+if __name__ == '__main__':
+    main()
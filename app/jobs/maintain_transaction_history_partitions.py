@@ -0,0 +1,48 @@
+import argparse
+import logging
+from datetime import date, timedelta
+
+from app.config.settings import get_settings
+from app.database.models import init_database
+from app.repositories.balance_snapshot_repository import BalanceSnapshotRepository
+from app.repositories.transaction_history_partition_repository import (
+    TransactionHistoryPartitionRepository, month_start
+)
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    _settings = get_settings()
+    parser = argparse.ArgumentParser(description="Creates the upcoming transaction history partitions and "
+                                                 "detaches the ones past the retention period")
+    parser.add_argument("--months-ahead", type=int, default=_settings.partition_months_ahead,
+                        help="number of months to create ahead of the current one")
+    parser.add_argument("--retention-months", type=int, default=_settings.partition_retention_months,
+                        help="number of past months to keep attached, 0 keeps every partition")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_database()
+    repository = TransactionHistoryPartitionRepository()
+    current_month = month_start(date.today())
+    repository.create_default_partition()
+    created = repository.create_partitions(since=current_month,
+                                           until=month_start(current_month, months=args.months_ahead))
+    logger.info(f"Transaction history partitions created - partitions={created}")
+
+    if args.retention_months > 0:
+        # Balances before a detached month can only be answered from the snapshots, so partitions
+        # not yet covered by them are kept
+        last_snapshot_day = BalanceSnapshotRepository().last_day()
+        if last_snapshot_day is None:
+            logger.warning("No balance snapshots, transaction history partitions are kept")
+            return
+        before = min(month_start(current_month, months=-args.retention_months),
+                     last_snapshot_day + timedelta(days=1))
+        detached = repository.detach_partitions(before=before)
+        logger.info(f"Transaction history partitions detached - before={before} partitions={detached}")
+
+
+if __name__ == '__main__':
+    main()
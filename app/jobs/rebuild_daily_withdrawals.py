@@ -0,0 +1,24 @@
+import argparse
+import logging
+from datetime import date
+
+from app.database.models import init_database
+from app.repositories.daily_withdrawal_repository import DailyWithdrawalRepository
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuilds the daily withdrawal totals from the transaction history")
+    parser.add_argument("--since", type=date.fromisoformat, default=None,
+                        help="first day to rebuild (YYYY-MM-DD), rebuilds every day when not informed")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_database()
+    written = DailyWithdrawalRepository().rebuild(since=args.since)
+    logger.info(f"Daily withdrawal totals rebuilt - since={args.since} totals={written}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Repositories of the storage backend chosen by `STORAGE_BACKEND`: `postgres` (default) or `memory`, which
+keeps the rows in the process (see `app.database.memory`) for the tests and the benchmarks.
+Both implementations have the same methods, results and errors. The balance snapshots and the write-behind
+posting are only available with Postgres.
+"""
+
+from typing import Union
+
+from app.config.settings import get_settings
+from app.interfaces.enum import StorageBackend
+from app.repositories.daily_withdrawal_repository import DailyWithdrawalRepository
+from app.repositories.dock_account_repository import DockAccountRepository
+from app.repositories.holder_repository import HolderRepository
+from app.repositories.memory.daily_withdrawal_repository import MemoryDailyWithdrawalRepository
+from app.repositories.memory.dock_account_repository import MemoryDockAccountRepository
+from app.repositories.memory.holder_repository import MemoryHolderRepository
+from app.repositories.memory.transaction_history_repository import MemoryTransactionHistoryRepository
+from app.repositories.transaction_history_repository import TransactionHistoryRepository
+
+
+def _memory() -> bool:
+    return get_settings().storage_backend == StorageBackend.memory
+
+
+def holder_repository() -> Union[HolderRepository, MemoryHolderRepository]:
+    return MemoryHolderRepository() if _memory() else HolderRepository()
+
+
+def dock_account_repository() -> Union[DockAccountRepository, MemoryDockAccountRepository]:
+    return MemoryDockAccountRepository() if _memory() else DockAccountRepository()
+
+
+def transaction_history_repository() -> Union[TransactionHistoryRepository, MemoryTransactionHistoryRepository]:
+    return MemoryTransactionHistoryRepository() if _memory() else TransactionHistoryRepository()
+
+
+def daily_withdrawal_repository() -> Union[DailyWithdrawalRepository, MemoryDailyWithdrawalRepository]:
+    return MemoryDailyWithdrawalRepository() if _memory() else DailyWithdrawalRepository()
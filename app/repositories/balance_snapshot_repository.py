@@ -0,0 +1,105 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from peewee import EXCLUDED, Case, fn
+
+from app.database.models import db
+from app.database.models.balance_snapshot import BalanceSnapshot
+from app.database.models.transaction_history import TransactionHistory
+from app.database.unit_of_work import UnitOfWork
+from app.interfaces.enum import TransactionType
+
+# Advisory lock key serializing the snapshot builds with the postings dated before today
+BUILD_LOCK = 7305
+
+
+class BalanceSnapshotRepository:
+    """
+    End of day balance checkpoints, one row per account and per day with activity.
+
+    Balances are replayed from the transaction history starting at zero, the balance every account
+    is opened with. The builds only move forward, so postings dated on a day already checkpointed are
+    refused (see `closed_until`).
+    """
+    def __init__(self):
+        self._model = BalanceSnapshot
+        self._signed_amount = Case(
+            TransactionHistory.type,
+            [(TransactionType.deposit.value, TransactionHistory.amount)],
+            0 - TransactionHistory.amount
+        )
+
+    def last_day(self) -> Optional[date]:
+        return self._model.select(fn.MAX(self._model.day)).scalar()
+
+    def closed_until(self) -> Optional[date]:
+        """
+        Takes the build lock in shared mode until the end of the transaction, so a build starting meanwhile
+        waits for the posting to commit and folds it in. Must run inside the transaction of the posting.
+
+        :return: the last day checkpointed, postings dated on it or before must be refused
+        """
+        db.execute_sql("SELECT pg_advisory_xact_lock_shared(%s)", (BUILD_LOCK,))
+        return self.last_day()
+
+    def balance_at(self, dock_account_id: str, at: datetime) -> Decimal:
+        """
+        Reads the nearest checkpoint before `at` and replays only the transactions after it.
+        """
+        snapshot = (self._model.select(self._model.day, self._model.balance)
+                               .where(self._model.dock_account == dock_account_id, self._model.day < at.date())
+                               .order_by(self._model.day.desc())
+                               .first())
+        replay = (TransactionHistory.select(fn.SUM(self._signed_amount))
+                                    .where(TransactionHistory.dock_account == dock_account_id,
+                                           TransactionHistory.created_at <= at))
+        balance = Decimal(0)
+        if snapshot:
+            balance = snapshot.balance
+            replay = replay.where(
+                TransactionHistory.created_at >= datetime.combine(snapshot.day + timedelta(days=1), time.min)
+            )
+        return balance + (replay.scalar() or Decimal(0))
+
+    def build(self, since: date, until: date) -> int:
+        """
+        Writes the end of day balance of every account with activity between `since` and `until`
+        (inclusive), carrying over the last checkpoint before `since`. Days already checkpointed in the
+        range are overwritten, so a range can be safely rebuilt.
+
+        :return: number of checkpoints written
+        """
+        with UnitOfWork(db):
+            # Waits for the postings that checked `closed_until` before the new checkpoints existed
+            db.execute_sql("SELECT pg_advisory_xact_lock(%s)", (BUILD_LOCK,))
+            return self._build(since=since, until=until)
+
+    def _build(self, since: date, until: date) -> int:
+        transaction_day = TransactionHistory.created_at.cast("date")
+        daily_net = (TransactionHistory.select(TransactionHistory.dock_account.alias("dock_account_id"),
+                                               transaction_day.alias("day"),
+                                               fn.SUM(self._signed_amount).alias("net"))
+                                       .where(TransactionHistory.created_at >= datetime.combine(since, time.min),
+                                              TransactionHistory.created_at < datetime.combine(
+                                                  until + timedelta(days=1), time.min
+                                              ))
+                                       .group_by(TransactionHistory.dock_account, transaction_day)
+                                       .alias("daily_net"))
+        previous = self._model.alias("previous")
+        opening_balance = (previous.select(previous.balance)
+                                   .where(previous.dock_account == daily_net.c.dock_account_id, previous.day < since)
+                                   .order_by(previous.day.desc())
+                                   .limit(1))
+        snapshots = (daily_net.select_from(
+            daily_net.c.dock_account_id,
+            daily_net.c.day,
+            fn.COALESCE(opening_balance, 0) + fn.SUM(daily_net.c.net).over(
+                partition_by=[daily_net.c.dock_account_id], order_by=[daily_net.c.day]
+            )
+        ))
+        return (self._model.insert_from(snapshots, [self._model.dock_account, self._model.day, self._model.balance])
+                           .on_conflict(conflict_target=[self._model.dock_account, self._model.day],
+                                        update={self._model.balance: EXCLUDED.balance})
+                           .as_rowcount()
+                           .execute())
@@ -0,0 +1,91 @@
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from peewee import EXCLUDED, fn
+
+from app.config.settings import get_settings
+from app.database.models import db
+from app.database.models.daily_withdrawal import DailyWithdrawal
+from app.database.models.transaction_history import TransactionHistory
+from app.interfaces.enum import TransactionType
+
+
+class DailyWithdrawalRepository:
+    """
+    Keeps the total withdrawn per account and per day, so the daily limit check is a keyed read
+    instead of a SUM over the day's history. Each day has its own row, which makes the counter
+    roll over at midnight without any reset job.
+    """
+    def __init__(self):
+        self._model = DailyWithdrawal
+
+    def get_amount(self, dock_account_id: str, day: Optional[date] = None) -> Decimal:
+        amount = (self._model.select(self._model.amount)
+                             .where(self._model.dock_account == dock_account_id,
+                                    self._model.day == (day or date.today())))
+        return amount.scalar() or Decimal(0)
+
+    def get_amounts(self, dock_account_ids: Iterable[str], day: Optional[date] = None) -> Dict[UUID, Decimal]:
+        amounts = (self._model.select(self._model.dock_account, self._model.amount)
+                              .where(self._model.dock_account.in_(list(dock_account_ids)),
+                                     self._model.day == (day or date.today()))
+                              .tuples())
+        return {dock_account_id: amount for dock_account_id, amount in amounts}
+
+    def increment(self, dock_account_id: str, amount: Decimal, day: Optional[date] = None) -> Decimal:
+        """
+        Adds a withdrawal to the day's total with a conditional upsert, the row is only changed while
+        the new total stays within the daily limit. Must run in the same transaction as the withdrawal.
+
+        :return: the day's total after the withdrawal
+        """
+        maximum_daily_limit = get_settings().maximum_daily_limit
+        if amount > maximum_daily_limit:
+            raise HTTPException(status_code=422, detail="Daily withdrawal limit exceeded")
+
+        query = (self._model.insert(dock_account=dock_account_id, day=day or date.today(), amount=amount)
+                            .on_conflict(conflict_target=[self._model.dock_account, self._model.day],
+                                         update={self._model.amount: self._model.amount + EXCLUDED.amount},
+                                         where=(self._model.amount + EXCLUDED.amount <= maximum_daily_limit))
+                            .returning(self._model.amount))
+        row = next(iter(query.tuples().execute()), None)
+        if row is None:
+            raise HTTPException(status_code=422, detail="Daily withdrawal limit exceeded")
+        return row[0]
+
+    def increment_many(self, amounts: Dict[Tuple[UUID, date], Decimal]):
+        """
+        Applies one increment per account and day, used to post the aggregated withdrawals of a batch.
+        """
+        for (dock_account_id, day), amount in amounts.items():
+            self.increment(dock_account_id=dock_account_id, amount=amount, day=day)
+
+    def rebuild(self, since: Optional[date] = None) -> int:
+        """
+        Rebuilds the daily totals from `transactionhistory`, either entirely or from a given day on.
+
+        The table is locked while the totals are recomputed, withdrawals posted meanwhile wait for
+        the rebuild to commit instead of being counted twice or lost.
+
+        :param since: first day to rebuild, all days are rebuilt when not informed
+        :return: number of account/day totals written
+        """
+        transaction_day = TransactionHistory.created_at.cast("date")
+        totals = (TransactionHistory.select(TransactionHistory.dock_account, transaction_day,
+                                            fn.SUM(TransactionHistory.amount))
+                                    .where(TransactionHistory.type == TransactionType.withdrawal.value)
+                                    .group_by(TransactionHistory.dock_account, transaction_day))
+        stale_totals = self._model.delete()
+        if since:
+            totals = totals.where(TransactionHistory.created_at >= since)
+            stale_totals = stale_totals.where(self._model.day >= since)
+
+        with db.atomic():
+            db.execute_sql(f'LOCK TABLE "{self._model._meta.table_name}" IN EXCLUSIVE MODE')
+            stale_totals.execute()
+            return self._model.insert_from(
+                totals, [self._model.dock_account, self._model.day, self._model.amount]
+            ).as_rowcount().execute()
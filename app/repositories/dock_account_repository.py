@@ -1,10 +1,34 @@
 from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
 
 from fastapi import HTTPException
 
+from app.config.settings import get_settings
+from app.database.executor import database_executor
+from app.database.models import db
 from app.database.models.dock_account import DockAccount
+from app.database.routing import read_database
+from app.database.unit_of_work import UnitOfWork
 from app.interfaces.dock_account import DockAccountInterface
 from app.interfaces.enum import TransactionType, AccountStatus
+from app.utils.cache import LRUCache
+from app.utils.metrics import withdrawals_rejected
+
+_settings = get_settings()
+
+# Source of the account numbers, see `AccountNumberAllocator`
+ACCOUNT_NUMBER_SEQUENCE = "dockaccount_number_seq"
+
+dock_account_cache = LRUCache(max_size=_settings.cache_max_size, ttl=_settings.cache_ttl,
+                              enabled=_settings.dock_account_cache_enabled)
+
+
+def _invalidate(*ids):
+    # Dropped now and again once committed, a read between the write and the commit may cache the old row
+    keys = [str(x) for x in ids]
+    dock_account_cache.invalidate(*keys)
+    UnitOfWork.after_commit(lambda: dock_account_cache.invalidate(*keys))
 
 
 class DockAccountRepository:
@@ -13,34 +37,199 @@ class DockAccountRepository:
 
     def insert(self, dock_account: DockAccountInterface) -> DockAccountInterface:
         inserted_dock_account = self._model.create(**dock_account.model_dump())
-        return DockAccountInterface.build(dock_account=inserted_dock_account)
+        inserted_dock_account = DockAccountInterface.build(dock_account=inserted_dock_account)
+        UnitOfWork.after_commit(lambda: dock_account_cache.set(str(inserted_dock_account.id), inserted_dock_account))
+        return inserted_dock_account.model_copy()
 
     def get_by_id(self, _id: str, **filters) -> DockAccountInterface:
-        dock_account = self._model.select().where(self._model.id == _id)
+        """
+        Looks the account up in the cache first, then in the database.
+
+        :param filters: field values the account must have, it is reported as not found otherwise
+        """
+        dock_account = dock_account_cache.get(str(_id)) or self._load(_id)
+        if not dock_account or any(getattr(dock_account, k) != v for k, v in filters.items()):
+            raise HTTPException(status_code=404, detail="DockAccount not found")
+        return dock_account.model_copy()
+
+    def lock_by_ids(self, ids: Iterable[str], **filters) -> Dict[UUID, DockAccountInterface]:
+        """
+        Loads the given accounts with `SELECT ... FOR UPDATE`, in id order so concurrent batches
+        touching the same accounts always lock them in the same sequence. Must run inside a transaction.
+
+        :param ids: ids of the accounts to lock
+        :return: the locked accounts indexed by id, accounts not found (or not matching filters) are left out
+        """
+        dock_accounts = self._model.select().where(self._model.id.in_(list(ids)))
         if filters:
-            dock_account = dock_account.filter(**filters)
-        dock_account = dock_account.first()
+            dock_accounts = dock_accounts.filter(**filters)
+        dock_accounts = dock_accounts.order_by(self._model.id).for_update()
+        return {x.id: DockAccountInterface.build(dock_account=x) for x in dock_accounts}
+
+    def get_for_update(self, _id: str, **filters) -> DockAccountInterface:
+        """
+        Reads the account from the primary with `SELECT ... FOR UPDATE`, bypassing the cache, for changes
+        that depend on its current state. Must run inside a transaction.
+
+        :param filters: field values the account must have, it is reported as not found otherwise
+        """
+        dock_account = next(iter(self.lock_by_ids(ids=[_id], **filters).values()), None)
         if not dock_account:
             raise HTTPException(status_code=404, detail="DockAccount not found")
-        return DockAccountInterface.build(dock_account=dock_account)
+        return dock_account
 
-    def update(self, dock_account: DockAccountInterface):
-        dock_account_to_update = self._model.select().where(self._model.id == dock_account.id).first()
-        if not dock_account_to_update:
+    def update_status(self, _id: str, status: AccountStatus):
+        """
+        Writes the status alone, the balance is only ever changed by the postings.
+        """
+        updated = self._model.update(status=status.value).where(self._model.id == _id).execute()
+        _invalidate(_id)
+        if not updated:
             raise HTTPException(status_code=404, detail="DockAccount not found")
-        dock_account_to_update.update(**dock_account.model_dump()).where(self._model.id == dock_account.id).execute()
-        return dock_account
 
-    def close_holder_accounts(self, cpf: str):
-        self._model.update(status=AccountStatus.closed.value).where(self._model.holder == cpf).execute()
+    def check_active(self, dock_account_id: str):
+        """
+        Reads the account status from the primary, bypassing the cache: an account blocked or closed by
+        another worker may still be active in the cache of this one.
+        """
+        status = self._model.select(self._model.status).where(self._model.id == dock_account_id).scalar()
+        if status is None:
+            raise HTTPException(status_code=404, detail="DockAccount not found")
+        if status != AccountStatus.active.value:
+            raise HTTPException(status_code=422, detail="DockAccount cannot make transactions")
 
-    @staticmethod
-    def make_transaction(dock_account: DockAccount, amount: Decimal, transaction_type: TransactionType):
+    def close_holder_accounts(self, cpf: str) -> int:
+        """
+        :return: number of accounts closed
+        """
+        closed = (self._model.update(status=AccountStatus.closed.value)
+                             .where(self._model.holder == cpf, self._model.status != AccountStatus.closed.value)
+                             .execute())
+        dock_account_cache.invalidate_where(lambda x: x.holder == cpf)
+        UnitOfWork.after_commit(lambda: dock_account_cache.invalidate_where(lambda x: x.holder == cpf))
+        return closed
+
+    def make_transaction(self, dock_account_id: str, amount: Decimal, transaction_type: TransactionType) -> Decimal:
+        """
+        Applies a transaction to the account balance with a single conditional UPDATE.
+
+        The new balance is computed by the database (`balance = balance ± amount`), so concurrent postings
+        on the same account never overwrite each other. Only active accounts match the row, and withdrawals
+        only when the balance covers the amount, which makes the database the final authority on the account
+        status and on insufficient funds.
+
+        :param dock_account_id: id of the account to post to
+        :param amount: transaction amount
+        :param transaction_type: DEPOSIT or WITHDRAWAL
+        :return: the account balance after the transaction
+        """
+        active = (self._model.id == dock_account_id) & (self._model.status == AccountStatus.active.value)
         if transaction_type == TransactionType.deposit:
-            dock_account.balance += amount
-            dock_account.save()
+            query = self._model.update(balance=self._model.balance + amount).where(active)
         elif transaction_type == TransactionType.withdrawal:
-            dock_account.balance -= amount
-            dock_account.save()
+            query = (self._model.update(balance=self._model.balance - amount)
+                                .where(active, self._model.balance >= amount))
         else:
-            raise HTTPException(status_code=422, detail="Invalid transaction")
\ No newline at end of file
+            raise HTTPException(status_code=422, detail="Invalid transaction")
+
+        updated = query.returning(self._model.balance).tuples().execute()
+        _invalidate(dock_account_id)
+        row = next(iter(updated), None)
+        if row is None:
+            # Tells a missing or inactive account from a balance too low
+            self.check_active(dock_account_id)
+            if transaction_type == TransactionType.withdrawal:
+                withdrawals_rejected.inc(reason="balance")
+                raise HTTPException(status_code=422, detail="DockAccount has no sufficient balance")
+            raise HTTPException(status_code=404, detail="DockAccount not found")
+        return row[0]
+
+    def apply_balance_deltas(self, deltas: Dict[UUID, Decimal], active_only: bool = False):
+        """
+        Applies one aggregated balance change per account, rejecting any change that would leave
+        the balance negative. Accounts are updated in id order, the lock order of `lock_by_ids`, so concurrent
+        flushes and withdrawals never wait on each other's rows in a cycle.
+
+        :param deltas: net amount to add to each account balance (negative for net withdrawals)
+        :param active_only: rejects the changes of accounts that are not active. Left off by the posting
+            queue, its deposits were accepted while the account was active and are part of the history
+        """
+        for dock_account_id, delta in sorted(deltas.items()):
+            if not delta:
+                continue
+            query = self._model.update(balance=self._model.balance + delta).where(
+                self._model.id == dock_account_id, self._model.balance + delta >= 0
+            )
+            if active_only:
+                query = query.where(self._model.status == AccountStatus.active.value)
+            updated = query.execute()
+            _invalidate(dock_account_id)
+            if not updated:
+                if active_only:
+                    self.check_active(dock_account_id)
+                raise HTTPException(status_code=422, detail="DockAccount has no sufficient balance")
+
+    def reserve_numbers(self, count: int) -> List[int]:
+        """
+        Takes `count` values of the account number sequence in one round trip. Sequence values are never
+        handed out twice, even when the transaction taking them rolls back.
+        """
+        cursor = db.execute_sql("SELECT nextval(%s) FROM generate_series(1, %s)", (ACCOUNT_NUMBER_SEQUENCE, count))
+        return [x[0] for x in cursor.fetchall()]
+
+    def reserve_number_range(self, count: int) -> int:
+        """
+        Takes `count` consecutive values of the account number sequence in one statement, for bulk loads.
+        Only safe while no account is being created, a concurrent `nextval` could land inside the range.
+
+        :return: the first value of the range
+        """
+        cursor = db.execute_sql("SELECT setval(%s, nextval(%s) + %s - 1)",
+                                (ACCOUNT_NUMBER_SEQUENCE, ACCOUNT_NUMBER_SEQUENCE, count))
+        return cursor.fetchone()[0] - count + 1
+
+    def create_number_sequence(self):
+        db.execute_sql(f'CREATE SEQUENCE IF NOT EXISTS "{ACCOUNT_NUMBER_SEQUENCE}"')
+
+    def _load(self, _id: str) -> Optional[DockAccountInterface]:
+        database = read_database()
+        dock_account = self._model.select().where(self._model.id == _id).bind(database).first()
+        if not dock_account:
+            return None
+        dock_account = DockAccountInterface.build(dock_account=dock_account)
+        # Replicas may lag behind the last write, only rows read from the primary are cached, and once
+        # the unit of work reading them commits
+        if database is db:
+            UnitOfWork.after_commit(lambda: dock_account_cache.set(str(dock_account.id), dock_account))
+        return dock_account
+
+
+class AsyncDockAccountRepository:
+    """
+    Awaitable counterpart of `DockAccountRepository`, each call runs in the database executor.
+    `lock_by_ids` and `apply_balance_deltas` are left out, they only make sense inside a transaction
+    that is submitted to the executor as a whole.
+    """
+    def __init__(self, repository: Optional[DockAccountRepository] = None):
+        """
+        :param repository: repository the calls are run on, see `app.repositories.backend`
+        """
+        self._repository = repository or DockAccountRepository()
+
+    async def insert(self, dock_account: DockAccountInterface) -> DockAccountInterface:
+        return await database_executor.run(self._repository.insert, dock_account=dock_account)
+
+    async def get_by_id(self, _id: str, **filters) -> DockAccountInterface:
+        return await database_executor.run(self._repository.get_by_id, _id=_id, **filters)
+
+    async def update_status(self, _id: str, status: AccountStatus):
+        return await database_executor.run(self._repository.update_status, _id=_id, status=status)
+
+    async def close_holder_accounts(self, cpf: str) -> int:
+        return await database_executor.run(self._repository.close_holder_accounts, cpf=cpf)
+
+    async def make_transaction(
+            self, dock_account_id: str, amount: Decimal, transaction_type: TransactionType
+    ) -> Decimal:
+        return await database_executor.run(self._repository.make_transaction, dock_account_id=dock_account_id,
+                                           amount=amount, transaction_type=transaction_type)
@@ -1,11 +1,25 @@
-from typing import List
+import csv
+import io
+from typing import List, Optional
 
 from fastapi import HTTPException
 from playhouse.shortcuts import model_to_dict
 
+from app.config.settings import get_settings
+from app.database.executor import database_executor
+from app.database.models import db
+from app.database.models.dock_account import DockAccount
 from app.database.models.holder import Holder
+from app.database.routing import read_database
+from app.database.unit_of_work import UnitOfWork
 from app.interfaces.dock_account import DockAccountInterface
 from app.interfaces.holder import HolderInterface
+from app.utils.cache import LRUCache
+
+_settings = get_settings()
+
+holder_cache = LRUCache(max_size=_settings.cache_max_size, ttl=_settings.cache_ttl,
+                        enabled=_settings.holder_cache_enabled)
 
 
 class HolderRepository:
@@ -15,24 +29,89 @@ class HolderRepository:
     def insert(self, holder: HolderInterface) -> HolderInterface:
         if self._model.select().where(self._model.cpf == holder.cpf).first():
             raise HTTPException(status_code=422, detail="Holder already exists")
-        inserted_holder = self._model.create(**holder.model_dump())
-        return HolderInterface(**model_to_dict(inserted_holder))
+        inserted_holder = HolderInterface(**model_to_dict(self._model.create(**holder.model_dump())))
+        UnitOfWork.after_commit(lambda: holder_cache.set(inserted_holder.cpf, inserted_holder))
+        return inserted_holder.model_copy()
+
+    def bulk_insert(self, holders: List[HolderInterface]) -> List[str]:
+        """
+        Loads the holders with COPY into a staging table, then moves them to the holder table in one
+        INSERT that skips the CPFs already there.
+
+        :param holders: holders with valid and distinct CPFs
+        :return: CPFs of the holders inserted
+        """
+        if not holders:
+            return []
+        table = self._model._meta.table_name
+        rows = io.StringIO()
+        csv.writer(rows).writerows((x.cpf, x.name, x.status) for x in holders)
+        rows.seek(0)
+        staging = f"{table}_import"
+        with UnitOfWork():
+            # The staging table only lives until the unit of work commits
+            db.execute_sql(f'CREATE TEMPORARY TABLE "{staging}" (LIKE "{table}" INCLUDING DEFAULTS) ON COMMIT DROP')
+            db.cursor().copy_expert(f'COPY "{staging}" (cpf, name, status) FROM STDIN WITH (FORMAT csv)', rows)
+            cursor = db.execute_sql(
+                f'INSERT INTO "{table}" (cpf, name, status) SELECT cpf, name, status FROM "{staging}" '
+                f'ON CONFLICT (cpf) DO NOTHING RETURNING cpf'
+            )
+            return [x[0] for x in cursor.fetchall()]
 
     def get_by_id(self, cpf: str, **filters) -> HolderInterface:
-        holder = self._model.select().where(self._model.cpf == cpf)
-        if filters:
-            holder = holder.filter(**filters)
-        holder = holder.first()
-        if not holder:
+        """
+        Looks the holder up in the cache first, then in the database.
+
+        :param filters: field values the holder must have, it is reported as not found otherwise
+        """
+        holder = holder_cache.get(cpf) or self._load(cpf)
+        if not holder or any(getattr(holder, k) != v for k, v in filters.items()):
             raise HTTPException(status_code=404, detail="Holder not found")
-        return HolderInterface(**model_to_dict(holder))
+        return holder.model_copy()
 
     def get_holder_accounts(self, cpf: str) -> List[DockAccountInterface]:
-        holder = self._model.select().where(self._model.cpf == cpf).first()
-        return [DockAccountInterface.build(dock_account=x) for x in holder.accounts]
+        accounts = DockAccount.select().where(DockAccount.holder == cpf).bind(read_database())
+        return [DockAccountInterface.build(dock_account=x) for x in accounts]
 
     def deactivate(self, cpf: str):
         holder_to_update = self._model.select().where(self._model.cpf == cpf).first()
         if not holder_to_update:
             raise HTTPException(status_code=404, detail="Holder not found")
         holder_to_update.update(status=False).where(self._model.cpf == cpf).execute()
+        holder_cache.invalidate(cpf)
+        UnitOfWork.after_commit(lambda: holder_cache.invalidate(cpf))
+
+    def _load(self, cpf: str) -> Optional[HolderInterface]:
+        database = read_database()
+        holder = self._model.select().where(self._model.cpf == cpf).bind(database).first()
+        if not holder:
+            return None
+        holder = HolderInterface(**model_to_dict(holder))
+        # Replicas may lag behind the last write, only rows read from the primary are cached, and once
+        # the unit of work reading them commits
+        if database is db:
+            UnitOfWork.after_commit(lambda: holder_cache.set(cpf, holder))
+        return holder
+
+
+class AsyncHolderRepository:
+    """
+    Awaitable counterpart of `HolderRepository`, each call runs in the database executor.
+    """
+    def __init__(self, repository: Optional[HolderRepository] = None):
+        """
+        :param repository: repository the calls are run on, see `app.repositories.backend`
+        """
+        self._repository = repository or HolderRepository()
+
+    async def insert(self, holder: HolderInterface) -> HolderInterface:
+        return await database_executor.run(self._repository.insert, holder=holder)
+
+    async def get_by_id(self, cpf: str, **filters) -> HolderInterface:
+        return await database_executor.run(self._repository.get_by_id, cpf=cpf, **filters)
+
+    async def get_holder_accounts(self, cpf: str) -> List[DockAccountInterface]:
+        return await database_executor.run(self._repository.get_holder_accounts, cpf=cpf)
+
+    async def deactivate(self, cpf: str):
+        return await database_executor.run(self._repository.deactivate, cpf=cpf)
@@ -0,0 +1,67 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+
+from app.config.settings import get_settings
+from app.database.memory import memory_db
+from app.interfaces.enum import TransactionType
+from app.repositories.memory.dock_account_repository import to_uuid
+
+
+class MemoryDailyWithdrawalRepository:
+    """
+    `DailyWithdrawalRepository` over the in-memory store, the totals are keyed by account and day.
+    """
+    def __init__(self):
+        self._db = memory_db
+
+    def get_amount(self, dock_account_id: str, day: Optional[date] = None) -> Decimal:
+        return self._db.daily_withdrawals.get((to_uuid(dock_account_id), day or date.today()), Decimal(0))
+
+    def get_amounts(self, dock_account_ids: Iterable[str], day: Optional[date] = None) -> Dict[UUID, Decimal]:
+        day = day or date.today()
+        amounts = {}
+        for dock_account_id in map(to_uuid, dock_account_ids):
+            if (dock_account_id, day) in self._db.daily_withdrawals:
+                amounts[dock_account_id] = self._db.daily_withdrawals[(dock_account_id, day)]
+        return amounts
+
+    def increment(self, dock_account_id: str, amount: Decimal, day: Optional[date] = None) -> Decimal:
+        """
+        Adds a withdrawal to the day's total, only while the new total stays within the daily limit.
+
+        :return: the day's total after the withdrawal
+        """
+        key = (to_uuid(dock_account_id), day or date.today())
+        with self._db.lock:
+            total = self._db.daily_withdrawals.get(key, Decimal(0)) + amount
+            if total > get_settings().maximum_daily_limit:
+                raise HTTPException(status_code=422, detail="Daily withdrawal limit exceeded")
+            self._db.put(self._db.daily_withdrawals, key, total)
+        return total
+
+    def increment_many(self, amounts: Dict[Tuple[UUID, date], Decimal]):
+        for (dock_account_id, day), amount in amounts.items():
+            self.increment(dock_account_id=dock_account_id, amount=amount, day=day)
+
+    def rebuild(self, since: Optional[date] = None) -> int:
+        """
+        Rebuilds the daily totals from the history, either entirely or from a given day on.
+
+        :return: number of account/day totals written
+        """
+        totals = defaultdict(Decimal)
+        with self._db.lock:
+            for transaction in self._db.transactions.values():
+                day = transaction.created_at.date()
+                if transaction.type == TransactionType.withdrawal and (not since or day >= since):
+                    totals[(transaction.dock_account, day)] += transaction.amount
+            for key in [x for x in self._db.daily_withdrawals if not since or x[1] >= since]:
+                self._db.delete(self._db.daily_withdrawals, key)
+            for key, amount in totals.items():
+                self._db.put(self._db.daily_withdrawals, key, amount)
+        return len(totals)
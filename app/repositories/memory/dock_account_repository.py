@@ -0,0 +1,160 @@
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from peewee import IntegrityError
+
+from app.database.memory import memory_db
+from app.interfaces.dock_account import DockAccountInterface
+from app.interfaces.enum import TransactionType, AccountStatus
+from app.utils.metrics import withdrawals_rejected
+
+
+def to_uuid(value) -> Optional[UUID]:
+    """
+    :return: `value` as a UUID, None when it is not one (the row is then reported as not found)
+    """
+    try:
+        return value if isinstance(value, UUID) else UUID(str(value))
+    except ValueError:
+        return None
+
+
+class MemoryDockAccountRepository:
+    """
+    `DockAccountRepository` over the in-memory store, with the same results and errors.
+    """
+    def __init__(self):
+        self._db = memory_db
+
+    def insert(self, dock_account: DockAccountInterface) -> DockAccountInterface:
+        with self._db.lock:
+            # The constraints of the dockaccount table
+            if dock_account.holder not in self._db.holders:
+                raise IntegrityError("DockAccount holder does not exist")
+            if dock_account.id in self._db.dock_accounts or (
+                    (dock_account.agency, dock_account.number) in self._db.dock_account_numbers):
+                raise IntegrityError("DockAccount already exists")
+            self._db.put(self._db.dock_accounts, dock_account.id, dock_account.model_copy())
+            self._db.put(self._db.dock_account_numbers, (dock_account.agency, dock_account.number), dock_account.id)
+            self._db.add(self._db.holder_dock_accounts[dock_account.holder], dock_account.id)
+        return dock_account.model_copy()
+
+    def get_by_id(self, _id: str, **filters) -> DockAccountInterface:
+        """
+        :param filters: field values the account must have, it is reported as not found otherwise
+        """
+        dock_account = self._db.dock_accounts.get(to_uuid(_id))
+        if not dock_account or any(getattr(dock_account, k) != v for k, v in filters.items()):
+            raise HTTPException(status_code=404, detail="DockAccount not found")
+        return dock_account.model_copy()
+
+    def lock_by_ids(self, ids: Iterable[str], **filters) -> Dict[UUID, DockAccountInterface]:
+        """
+        The accounts are locked by the transaction holding the store, this only loads them.
+
+        :return: the accounts indexed by id, accounts not found (or not matching filters) are left out
+        """
+        dock_accounts = {}
+        for _id in sorted(filter(None, map(to_uuid, ids))):
+            dock_account = self._db.dock_accounts.get(_id)
+            if dock_account and all(getattr(dock_account, k) == v for k, v in filters.items()):
+                dock_accounts[_id] = dock_account.model_copy()
+        return dock_accounts
+
+    def get_for_update(self, _id: str, **filters) -> DockAccountInterface:
+        """
+        The account is locked by the transaction holding the store, this only loads it.
+        """
+        return self.get_by_id(_id=_id, **filters)
+
+    def update_status(self, _id: str, status: AccountStatus):
+        with self._db.lock:
+            dock_account = self._db.dock_accounts.get(to_uuid(_id))
+            if not dock_account:
+                raise HTTPException(status_code=404, detail="DockAccount not found")
+            self._db.put(self._db.dock_accounts, dock_account.id, dock_account.model_copy(update={"status": status}))
+
+    def check_active(self, dock_account_id: str):
+        dock_account = self._db.dock_accounts.get(to_uuid(dock_account_id))
+        if not dock_account:
+            raise HTTPException(status_code=404, detail="DockAccount not found")
+        if dock_account.status != AccountStatus.active:
+            raise HTTPException(status_code=422, detail="DockAccount cannot make transactions")
+
+    def close_holder_accounts(self, cpf: str) -> int:
+        """
+        :return: number of accounts closed
+        """
+        closed = 0
+        with self._db.lock:
+            for _id in self._db.holder_dock_accounts.get(cpf, []):
+                dock_account = self._db.dock_accounts[_id]
+                if dock_account.status != AccountStatus.closed:
+                    self._db.put(self._db.dock_accounts, _id,
+                                 dock_account.model_copy(update={"status": AccountStatus.closed}))
+                    closed += 1
+        return closed
+
+    def make_transaction(self, dock_account_id: str, amount: Decimal, transaction_type: TransactionType) -> Decimal:
+        """
+        Applies a transaction to the balance of an active account, withdrawals are only applied when the
+        balance covers the amount.
+
+        :return: the account balance after the transaction
+        """
+        if transaction_type == TransactionType.deposit:
+            delta = amount
+        elif transaction_type == TransactionType.withdrawal:
+            delta = -amount
+        else:
+            raise HTTPException(status_code=422, detail="Invalid transaction")
+
+        with self._db.lock:
+            self.check_active(dock_account_id)
+            dock_account = self._db.dock_accounts[to_uuid(dock_account_id)]
+            if dock_account.balance + delta < 0:
+                if transaction_type == TransactionType.deposit:
+                    raise IntegrityError("DockAccount balance cannot be negative")
+                withdrawals_rejected.inc(reason="balance")
+                raise HTTPException(status_code=422, detail="DockAccount has no sufficient balance")
+            balance = dock_account.balance + delta
+            self._db.put(self._db.dock_accounts, dock_account.id, dock_account.model_copy(update={"balance": balance}))
+        return balance
+
+    def apply_balance_deltas(self, deltas: Dict[UUID, Decimal], active_only: bool = False):
+        """
+        Applies one aggregated balance change per account, rejecting any change that would leave
+        the balance negative.
+
+        :param deltas: net amount to add to each account balance (negative for net withdrawals)
+        :param active_only: rejects the changes of accounts that are not active
+        """
+        with self._db.lock:
+            for dock_account_id, delta in sorted(deltas.items()):
+                if not delta:
+                    continue
+                if active_only:
+                    self.check_active(dock_account_id)
+                dock_account = self._db.dock_accounts.get(to_uuid(dock_account_id))
+                if not dock_account or dock_account.balance + delta < 0:
+                    raise HTTPException(status_code=422, detail="DockAccount has no sufficient balance")
+                self._db.put(self._db.dock_accounts, dock_account.id,
+                             dock_account.model_copy(update={"balance": dock_account.balance + delta}))
+
+    def reserve_numbers(self, count: int) -> List[int]:
+        """
+        Takes `count` values of the store sequence, never handed out twice (rollbacks included).
+        """
+        with self._db.lock:
+            return [next(self._db.account_number_sequence) for _ in range(count)]
+
+    def reserve_number_range(self, count: int) -> int:
+        """
+        :return: the first of `count` consecutive values taken from the store sequence
+        """
+        return self.reserve_numbers(count)[0]
+
+    def create_number_sequence(self):
+        pass
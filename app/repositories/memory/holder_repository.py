@@ -0,0 +1,55 @@
+from typing import List
+
+from fastapi import HTTPException
+
+from app.database.memory import memory_db
+from app.interfaces.dock_account import DockAccountInterface
+from app.interfaces.holder import HolderInterface
+
+
+class MemoryHolderRepository:
+    """
+    `HolderRepository` over the in-memory store, with the same results and errors.
+    """
+    def __init__(self):
+        self._db = memory_db
+
+    def insert(self, holder: HolderInterface) -> HolderInterface:
+        with self._db.lock:
+            if holder.cpf in self._db.holders:
+                raise HTTPException(status_code=422, detail="Holder already exists")
+            self._db.put(self._db.holders, holder.cpf, holder.model_copy())
+        return holder.model_copy()
+
+    def bulk_insert(self, holders: List[HolderInterface]) -> List[str]:
+        """
+        :param holders: holders with valid and distinct CPFs
+        :return: CPFs of the holders inserted, the ones already there are skipped
+        """
+        inserted = []
+        with self._db.lock:
+            for holder in holders:
+                if holder.cpf not in self._db.holders:
+                    self._db.put(self._db.holders, holder.cpf, holder.model_copy())
+                    inserted.append(holder.cpf)
+        return inserted
+
+    def get_by_id(self, cpf: str, **filters) -> HolderInterface:
+        """
+        :param filters: field values the holder must have, it is reported as not found otherwise
+        """
+        holder = self._db.holders.get(cpf)
+        if not holder or any(getattr(holder, k) != v for k, v in filters.items()):
+            raise HTTPException(status_code=404, detail="Holder not found")
+        return holder.model_copy()
+
+    def get_holder_accounts(self, cpf: str) -> List[DockAccountInterface]:
+        with self._db.lock:
+            return [self._db.dock_accounts[x].model_copy() for x in self._db.holder_dock_accounts.get(cpf, [])]
+
+    def deactivate(self, cpf: str):
+        with self._db.lock:
+            holder = self._db.holders.get(cpf)
+            if not holder:
+                raise HTTPException(status_code=404, detail="Holder not found")
+            self._db.put(self._db.holders, cpf, holder.model_copy(update={"status": False}))
@@ -0,0 +1,150 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Optional, Set
+from uuid import UUID
+
+from fastapi import HTTPException
+from peewee import IntegrityError
+
+from app.database.memory import memory_db
+from app.database.unit_of_work import UnitOfWork
+from app.interfaces import BetweenDateFilter
+from app.interfaces.enum import TransactionType
+from app.interfaces.transaction_history import TransactionHistoryInterface, TransactionHistoryCursor
+from app.repositories.memory.daily_withdrawal_repository import MemoryDailyWithdrawalRepository
+from app.repositories.memory.dock_account_repository import MemoryDockAccountRepository, to_uuid
+from app.repositories.transaction_history_repository import EXPORT_COLUMNS
+
+_FIRST_ID = UUID(int=0)
+_LAST_ID = UUID(int=2 ** 128 - 1)
+
+
+class MemoryTransactionHistoryRepository:
+    """
+    `TransactionHistoryRepository` over the in-memory store. The history of an account is read through
+    its sorted list of (created_at, id) keys, periods and cursors are bisected instead of scanned.
+    """
+    def __init__(self):
+        self._db = memory_db
+        self._dock_account_repository = MemoryDockAccountRepository()
+        self._daily_withdrawal_repository = MemoryDailyWithdrawalRepository()
+
+    def insert(
+            self, transaction_history: TransactionHistoryInterface, defer_balance: bool = False
+    ) -> TransactionHistoryInterface:
+        """
+        :param defer_balance: ignored, write-behind posting needs the Postgres backend and the balance is
+            always updated right away here
+        """
+        with UnitOfWork(self._db):
+            if transaction_history.id in self._db.transactions:
+                raise HTTPException(status_code=422, detail="TransactionHistory already exists")
+            self._dock_account_repository.make_transaction(
+                dock_account_id=transaction_history.dock_account,
+                amount=transaction_history.amount,
+                transaction_type=transaction_history.type
+            )
+            if transaction_history.type == TransactionType.withdrawal:
+                self._daily_withdrawal_repository.increment(
+                    dock_account_id=transaction_history.dock_account,
+                    amount=transaction_history.amount,
+                    day=transaction_history.created_at.date()
+                )
+            self._add(transaction_history)
+        return transaction_history.model_copy()
+
+    def insert_many(self, transactions: List[TransactionHistoryInterface], batch_size: int = 1000):
+        """
+        Inserts history rows without touching account balances, the caller is responsible
+        for posting the aggregated balance changes in the same transaction.
+        """
+        with UnitOfWork(self._db):
+            for transaction in transactions:
+                self._add(transaction)
+
+    def get_existing_ids(self, ids: Iterable[UUID]) -> Set[UUID]:
+        """
+        :return: the given transaction ids that are already stored
+        """
+        with self._db.lock:
+            return {x for x in ids if x in self._db.transactions}
+
+    def get_by_id(self, _id: str, **filters) -> TransactionHistoryInterface:
+        transaction_history = self._db.transactions.get(to_uuid(_id))
+        if not transaction_history or any(getattr(transaction_history, k) != v for k, v in filters.items()):
+            raise HTTPException(status_code=404, detail="TransactionHistory not found")
+        return transaction_history.model_copy()
+
+    def get(
+            self,
+            dock_account_id: str,
+            between_filter: Optional[BetweenDateFilter] = None,
+            limit: Optional[int] = None,
+            after: Optional[TransactionHistoryCursor] = None,
+            **filters
+    ) -> List[TransactionHistoryInterface]:
+        """
+        Lists the account history in (created_at, id) order.
+
+        :param limit: maximum number of transactions to return
+        :param after: keyset cursor, only transactions after this position are returned
+        """
+        transaction_history = []
+        # Without filters only the first `limit` keys of the range are read
+        for transaction in self._statement(dock_account_id=dock_account_id, between_filter=between_filter,
+                                           after=after, limit=None if filters else limit):
+            if any(getattr(transaction, k) != v for k, v in filters.items()):
+                continue
+            transaction_history.append(transaction.model_copy())
+            if len(transaction_history) == limit:
+                break
+        if not transaction_history and not after:
+            raise HTTPException(status_code=404, detail="TransactionHistory not found")
+        return transaction_history
+
+    def export(
+            self, dock_account_id: str, between_filter: Optional[BetweenDateFilter] = None, batch_size: int = 2000
+    ) -> Iterator[tuple]:
+        """
+        Streams the account history as `EXPORT_COLUMNS` tuples.
+        """
+        for transaction in self._statement(dock_account_id=dock_account_id, between_filter=between_filter):
+            yield tuple(getattr(transaction, x) for x in EXPORT_COLUMNS)
+
+    def daily_withdrawal_amount(self, dock_account_id: str) -> Decimal:
+        """
+        Sums today's withdrawals straight from the history.
+        """
+        today = BetweenDateFilter(start_date=datetime.now().replace(hour=00, minute=00), end_date=datetime.now())
+        return sum((x.amount for x in self._statement(dock_account_id=dock_account_id, between_filter=today)
+                    if x.type == TransactionType.withdrawal), Decimal(0))
+
+    def _add(self, transaction: TransactionHistoryInterface):
+        with self._db.lock:
+            if transaction.id in self._db.transactions:
+                raise IntegrityError("TransactionHistory already exists")
+            if transaction.dock_account not in self._db.dock_accounts:
+                raise IntegrityError("TransactionHistory dock_account does not exist")
+            self._db.put(self._db.transactions, transaction.id, transaction.model_copy())
+            self._db.add(self._db.dock_account_transactions[transaction.dock_account],
+                         (transaction.created_at, transaction.id), ordered=True)
+
+    def _statement(
+            self,
+            dock_account_id: str,
+            between_filter: Optional[BetweenDateFilter] = None,
+            after: Optional[TransactionHistoryCursor] = None,
+            limit: Optional[int] = None
+    ) -> List[TransactionHistoryInterface]:
+        with self._db.lock:
+            keys = self._db.dock_account_transactions.get(to_uuid(dock_account_id), [])
+            start, end = 0, len(keys)
+            if between_filter:
+                start = bisect_left(keys, (between_filter.start_date, _FIRST_ID))
+                end = bisect_right(keys, (between_filter.end_date, _LAST_ID))
+            if after:
+                start = max(start, bisect_right(keys, (after.created_at, after.id)))
+            if limit:
+                end = min(end, start + limit)
+            return [self._db.transactions[x] for _, x in keys[start:end]]
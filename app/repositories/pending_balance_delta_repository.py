@@ -0,0 +1,47 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from app.database.models.pending_balance_delta import PendingBalanceDelta
+
+
+class PendingBalanceDeltaRepository:
+    """
+    Balance changes of transactions already in the history but not yet applied to the account balance
+    (write-behind posting). Each row is applied once: it is deleted by the same transaction that adds it
+    to the balance, whoever gets to it first (the posting queue, a withdrawal or the recovery job).
+    """
+    def __init__(self):
+        self._model = PendingBalanceDelta
+
+    def insert(self, transaction_id: UUID, dock_account_id: UUID, amount: Decimal):
+        self._model.insert(id=transaction_id, dock_account=dock_account_id, amount=amount).execute()
+
+    def take(
+            self,
+            ids: Optional[Iterable[UUID]] = None,
+            dock_account_ids: Optional[Iterable[UUID]] = None,
+            before: Optional[datetime] = None
+    ) -> Dict[UUID, Decimal]:
+        """
+        Deletes the matching deltas and returns their total per account, to be added to the balances in
+        the same transaction.
+
+        :param ids: ids of the deltas to take
+        :param dock_account_ids: take every delta of these accounts
+        :param before: take every delta created before this moment
+        """
+        query = self._model.delete()
+        if ids is not None:
+            query = query.where(self._model.id.in_(list(ids)))
+        if dock_account_ids is not None:
+            query = query.where(self._model.dock_account.in_(list(dock_account_ids)))
+        if before is not None:
+            query = query.where(self._model.created_at < before)
+
+        totals = defaultdict(Decimal)
+        for dock_account_id, amount in query.returning(self._model.dock_account, self._model.amount).tuples().execute():
+            totals[dock_account_id] += amount
+        return dict(totals)
@@ -0,0 +1,99 @@
+import re
+from datetime import date
+from typing import List
+
+from app.database.models import db
+from app.database.models.transaction_history import TransactionHistory
+
+
+def month_start(day: date, months: int = 0) -> date:
+    """
+    First day of the month of `day`, shifted by `months` (negative values go back in time).
+    """
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+class TransactionHistoryPartitionRepository:
+    """
+    Manages the monthly range partitions of `transactionhistory`.
+
+    Each partition is named `transactionhistory_YYYY_MM` and holds [first day of the month, first day
+    of the next month). Rows out of every monthly partition land in `transactionhistory_default`,
+    they are moved to their own partition when it is created.
+    """
+    def __init__(self):
+        self._table = TransactionHistory._meta.table_name
+        self._default_partition = f"{self._table}_default"
+        self._partition_pattern = re.compile(rf"^{self._table}_(\d{{4}})_(\d{{2}})$")
+
+    def get_partitions(self) -> List[date]:
+        """
+        :return: the month (first day) of every attached monthly partition, in order
+        """
+        cursor = db.execute_sql(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass",
+            (self._table,)
+        )
+        months = []
+        for (name,) in cursor.fetchall():
+            match = self._partition_pattern.match(name)
+            if match:
+                months.append(date(int(match.group(1)), int(match.group(2)), 1))
+        return sorted(months)
+
+    def create_default_partition(self):
+        db.execute_sql(f'CREATE TABLE IF NOT EXISTS "{self._default_partition}" PARTITION OF "{self._table}" DEFAULT')
+
+    def create_partitions(self, since: date, until: date) -> List[str]:
+        """
+        Creates the missing monthly partitions from the month of `since` to the month of `until`.
+
+        :return: names of the partitions created
+        """
+        existing = set(self.get_partitions())
+        created = []
+        month = month_start(since)
+        while month <= until:
+            if month not in existing:
+                self._create_partition(month)
+                created.append(self._partition_name(month))
+            month = month_start(month, months=1)
+        return created
+
+    def detach_partitions(self, before: date) -> List[str]:
+        """
+        Detaches the monthly partitions that end on or before `before`. Detached partitions are kept as
+        standalone tables, to be archived or dropped, and are no longer read by any query.
+
+        :return: names of the partitions detached
+        """
+        detached = []
+        for month in self.get_partitions():
+            if month_start(month, months=1) > before:
+                break
+            name = self._partition_name(month)
+            db.execute_sql(f'ALTER TABLE "{self._table}" DETACH PARTITION "{name}"')
+            detached.append(name)
+        return detached
+
+    def _create_partition(self, month: date):
+        # The partition is filled with any row of its month left in the default partition before being
+        # attached, a plain CREATE ... PARTITION OF fails when the default partition has such rows
+        name = self._partition_name(month)
+        start, end = month, month_start(month, months=1)
+        with db.atomic():
+            db.execute_sql(f'CREATE TABLE "{name}" (LIKE "{self._table}" INCLUDING DEFAULTS)')
+            db.execute_sql(
+                f'WITH moved AS (DELETE FROM "{self._default_partition}" '
+                f'WHERE created_at >= %s AND created_at < %s RETURNING *) '
+                f'INSERT INTO "{name}" SELECT * FROM moved',
+                (start, end)
+            )
+            db.execute_sql(f'ALTER TABLE "{self._table}" ATTACH PARTITION "{name}" '
+                           f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')")
+
+    def _partition_name(self, month: date) -> str:
+        return f"{self._table}_{month:%Y_%m}"
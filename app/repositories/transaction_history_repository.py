@@ -1,51 +1,211 @@
+import time
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional, Set
+from uuid import UUID
 
 from fastapi import HTTPException
-from peewee import fn
+from peewee import Database, fn, chunked, Tuple
 
+from app.database.executor import database_executor
 from app.database.models.transaction_history import TransactionHistory
+from app.database.models.transaction_id import TransactionId
+from app.database.routing import read_database
 from app.interfaces import BetweenDateFilter
 from app.interfaces.enum import TransactionType
-from app.interfaces.transaction_history import TransactionHistoryInterface
+from app.interfaces.transaction_history import TransactionHistoryInterface, TransactionHistoryCursor
+from app.repositories.daily_withdrawal_repository import DailyWithdrawalRepository
+from app.database.unit_of_work import UnitOfWork
+from app.repositories.dock_account_repository import DockAccountRepository
+from app.repositories.pending_balance_delta_repository import PendingBalanceDeltaRepository
+
+
+EXPORT_COLUMNS = ("id", "dock_account", "type", "amount", "created_at")
 
 
 class TransactionHistoryRepository:
     def __init__(self):
         self._model = TransactionHistory
+        self._dock_account_repository = DockAccountRepository()
+        self._daily_withdrawal_repository = DailyWithdrawalRepository()
+        self._pending_balance_delta_repository = PendingBalanceDeltaRepository()
 
-    def insert(self, transaction_history: TransactionHistoryInterface) -> TransactionHistoryInterface:
-        inserted_transaction_history = self._model.create(**transaction_history.model_dump())
+    def insert(
+            self, transaction_history: TransactionHistoryInterface, defer_balance: bool = False
+    ) -> TransactionHistoryInterface:
+        """
+        :param defer_balance: for deposits, records the balance change as pending instead of updating the
+            account row, it is applied later by the posting queue (write-behind posting)
+        """
+        # The balance update and the history row are committed together, or not at all
+        with UnitOfWork():
+            # A concurrent insert of the same id holds its row until it commits or rolls back
+            if not TransactionId.insert(id=transaction_history.id).on_conflict_ignore().as_rowcount().execute():
+                raise HTTPException(status_code=422, detail="TransactionHistory already exists")
+            if defer_balance and transaction_history.type == TransactionType.deposit:
+                # The account row is not updated, so its status is checked apart
+                self._dock_account_repository.check_active(dock_account_id=transaction_history.dock_account)
+                self._pending_balance_delta_repository.insert(
+                    transaction_id=transaction_history.id,
+                    dock_account_id=transaction_history.dock_account,
+                    amount=transaction_history.amount
+                )
+            else:
+                self._dock_account_repository.make_transaction(
+                    dock_account_id=transaction_history.dock_account,
+                    amount=transaction_history.amount,
+                    transaction_type=transaction_history.type
+                )
+            if transaction_history.type == TransactionType.withdrawal:
+                self._daily_withdrawal_repository.increment(
+                    dock_account_id=transaction_history.dock_account,
+                    amount=transaction_history.amount,
+                    day=transaction_history.created_at.date()
+                )
+            inserted_transaction_history = self._model.create(**transaction_history.model_dump())
         return TransactionHistoryInterface.build(inserted_transaction_history)
 
+    def insert_many(self, transactions: List[TransactionHistoryInterface], batch_size: int = 1000):
+        """
+        Bulk inserts history rows without touching account balances, the caller is responsible
+        for posting the aggregated balance changes in the same transaction. Ids already stored raise an
+        IntegrityError, the caller is expected to leave them out.
+        """
+        with UnitOfWork():
+            for batch in chunked([x.model_dump() for x in transactions], batch_size):
+                TransactionId.insert_many([{"id": x["id"]} for x in batch]).execute()
+                self._model.insert_many(batch).execute()
+
+    def get_existing_ids(self, ids: Iterable[UUID]) -> Set[UUID]:
+        """
+        :return: the given transaction ids that are already stored, read from the primary with one query
+        """
+        return set(TransactionId.select(TransactionId.id).where(TransactionId.id.in_(list(ids))).scalars())
+
     def get_by_id(self, _id: str, **filters) -> TransactionHistoryInterface:
         transaction_history = self._model.select().where(self._model.id == _id)
         if filters:
             transaction_history = transaction_history.filter(**filters)
-        transaction_history = transaction_history.first()
+        transaction_history = transaction_history.bind(read_database()).first()
         if not transaction_history:
             raise HTTPException(status_code=404, detail="TransactionHistory not found")
         return TransactionHistoryInterface.build(transaction_history)
 
     def get(
-            self, dock_account_id: str, between_filter: Optional[BetweenDateFilter] = None, **filters
+            self,
+            dock_account_id: str,
+            between_filter: Optional[BetweenDateFilter] = None,
+            limit: Optional[int] = None,
+            after: Optional[TransactionHistoryCursor] = None,
+            **filters
     ) -> List[TransactionHistoryInterface]:
-        transaction_history = self._model.select().where(self._model.dock_account == dock_account_id)
-        if between_filter:
+        """
+        Lists the account history in (created_at, id) order.
+
+        :param limit: maximum number of transactions to return
+        :param after: keyset cursor, only transactions after this position are returned
+        """
+        transaction_history = self._statement_query(
+            self._model.select(), dock_account_id=dock_account_id, between_filter=between_filter
+        )
+        if after:
+            # The plain created_at bound lets the planner start the index range at the cursor
             transaction_history = transaction_history.where(
-                self._model.created_at.between(between_filter.start_date, between_filter.end_date)
+                self._model.created_at >= after.created_at,
+                Tuple(self._model.created_at, self._model.id) > Tuple(
+                    self._model.created_at.to_value(after.created_at), self._model.id.to_value(after.id)
+                )
             )
         if filters:
             transaction_history = transaction_history.filter(**filters)
-        if not transaction_history:
+        if limit:
+            transaction_history = transaction_history.limit(limit)
+        transaction_history = transaction_history.bind(read_database())
+        if not transaction_history and not after:
             raise HTTPException(status_code=404, detail="TransactionHistory not found")
         return [TransactionHistoryInterface.build(x) for x in transaction_history]
 
+    def export(
+            self, dock_account_id: str, between_filter: Optional[BetweenDateFilter] = None, batch_size: int = 2000
+    ) -> Iterator[tuple]:
+        """
+        Streams the account history as `EXPORT_COLUMNS` tuples through a server-side (named) cursor,
+        so only `batch_size` rows are held in memory at a time whatever the size of the history.
+
+        The rows are pulled from whichever thread is consuming the stream, so the cursor runs on a connection
+        checked out of the pool of the read database for the stream alone, not on the thread-local one. The
+        read database is picked when the export is called and the connection is given back when the iterator
+        is exhausted or discarded.
+        """
+        query = self._statement_query(
+            self._model.select(*[getattr(self._model, x) for x in EXPORT_COLUMNS]),
+            dock_account_id=dock_account_id,
+            between_filter=between_filter
+        )
+        return self._stream(read_database(), *query.sql(), batch_size=batch_size)
+
+    @staticmethod
+    def _stream(database: Database, sql: str, params: tuple, batch_size: int) -> Iterator[tuple]:
+        connection = database.checkout()
+        try:
+            with connection:
+                with connection.cursor(name="transaction_history_export") as cursor:
+                    cursor.itersize = batch_size
+                    start_time = time.perf_counter()
+                    cursor.execute(sql, params)
+                    database.record_query(sql, time.perf_counter() - start_time)
+                    yield from cursor
+        finally:
+            database.checkin(connection)
+
+    def _statement_query(self, query, dock_account_id: str, between_filter: Optional[BetweenDateFilter] = None):
+        query = query.where(self._model.dock_account == dock_account_id)
+        # Plain bounds on created_at let the planner skip the monthly partitions out of the period
+        if between_filter:
+            query = query.where(self._model.created_at.between(between_filter.start_date, between_filter.end_date))
+        return query.order_by(self._model.created_at, self._model.id)
+
     def daily_withdrawal_amount(self, dock_account_id: str) -> Decimal:
+        """
+        Sums today's withdrawals straight from the history. The daily limit check reads the totals kept by
+        `DailyWithdrawalRepository`, this scan is the source of truth used to reconcile them.
+        """
         amount = (self._model.select(fn.SUM(self._model.amount))
                                .where(self._model.dock_account == dock_account_id)
                                .where(self._model.created_at.between(datetime.now().replace(hour=00, minute=00),
                                                                      datetime.now()))
                                .filter(type=TransactionType.withdrawal.value))
         return amount.scalar() or 0
+
+
+class AsyncTransactionHistoryRepository:
+    """
+    Awaitable counterpart of `TransactionHistoryRepository`, each call runs in the database executor.
+    `insert_many` is left out as it relies on the caller's transaction, and `export` already streams
+    from its own connection.
+    """
+    def __init__(self, repository: Optional[TransactionHistoryRepository] = None):
+        """
+        :param repository: repository the calls are run on, see `app.repositories.backend`
+        """
+        self._repository = repository or TransactionHistoryRepository()
+
+    async def insert(self, transaction_history: TransactionHistoryInterface) -> TransactionHistoryInterface:
+        return await database_executor.run(self._repository.insert, transaction_history=transaction_history)
+
+    async def get_by_id(self, _id: str, **filters) -> TransactionHistoryInterface:
+        return await database_executor.run(self._repository.get_by_id, _id=_id, **filters)
+
+    async def get(
+            self,
+            dock_account_id: str,
+            between_filter: Optional[BetweenDateFilter] = None,
+            limit: Optional[int] = None,
+            after: Optional[TransactionHistoryCursor] = None,
+            **filters
+    ) -> List[TransactionHistoryInterface]:
+        return await database_executor.run(self._repository.get, dock_account_id=dock_account_id,
+                                           between_filter=between_filter, limit=limit, after=after, **filters)
+
+    async def daily_withdrawal_amount(self, dock_account_id: str) -> Decimal:
+        return await database_executor.run(self._repository.daily_withdrawal_amount, dock_account_id=dock_account_id)
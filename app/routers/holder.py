@@ -1,7 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, UploadFile
 from fastapi.encoders import jsonable_encoder
 from starlette.responses import JSONResponse
 
+from app.interfaces.enum import ImportFormat
 from app.interfaces.holder import HolderInterface
 from app.services.holder import HolderService
 
@@ -15,15 +16,20 @@ _service = HolderService()
 
 @router.get("/{cpf}")
 async def get_holder(cpf: str):
-    holder = _service.get_holder(cpf=cpf)
+    holder = await _service.get_holder(cpf=cpf)
     return JSONResponse(content=jsonable_encoder(holder), status_code=200)
 
 @router.post("")
 async def create_holder(holder: HolderInterface):
-    created_holder = _service.create(holder=holder)
+    created_holder = await _service.create(holder=holder)
     return JSONResponse(content=jsonable_encoder(created_holder), status_code=201)
 
+@router.post("/import")
+async def import_holders(file: UploadFile, format: ImportFormat = ImportFormat.ndjson):
+    results = await _service.import_holders(file=file.file, import_format=format)
+    return JSONResponse(content=jsonable_encoder(results), status_code=200)
+
 @router.put("/deactivate")
 async def deactivate_holder(cpf: str):
-    _service.deactivate(cpf=cpf)
+    await _service.deactivate(cpf=cpf)
     return JSONResponse(content={"message": "Holder deactivated"}, status_code=200)
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from starlette.responses import JSONResponse
+
+from app.services.cache import CacheService
+from app.services.database import DatabaseService
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    responses={404: {"description": "Not found"}},
+)
+
+_service = DatabaseService()
+_cache_service = CacheService()
+
+@router.get("/database/pool")
+async def get_database_pool_stats():
+    pool_stats = _service.get_pool_stats()
+    return JSONResponse(content=pool_stats, status_code=200)
+
+@router.get("/cache")
+async def get_cache_stats():
+    cache_stats = _cache_service.get_cache_stats()
+    return JSONResponse(content=cache_stats, status_code=200)
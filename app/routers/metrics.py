@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from starlette.responses import PlainTextResponse
+
+from app.utils.metrics import registry
+
+router = APIRouter(
+    tags=["metrics"],
+)
+
+@router.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(content=registry.render(), media_type="text/plain; version=0.0.4")
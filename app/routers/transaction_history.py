@@ -1,9 +1,11 @@
 from datetime import datetime
+from typing import List, Optional
 
 from fastapi import APIRouter
 from fastapi.encoders import jsonable_encoder
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
+from app.interfaces.enum import ExportFormat
 from app.interfaces.transaction_history import TransactionHistoryInterface
 from app.services.transaction_history import TransactionHistoryService
 
@@ -15,14 +17,47 @@ router = APIRouter(
 
 _service = TransactionHistoryService()
 
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
 @router.get("/{dock_account_id}")
-async def get_transaction_history(dock_account_id: str, start_date: datetime = None, end_date: datetime = None):
-    transaction_history = _service.get_transaction_history(
-        dock_account_id=dock_account_id, start_date=start_date, end_date=end_date
+async def get_transaction_history(
+        dock_account_id: str,
+        start_date: datetime = None,
+        end_date: datetime = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+):
+    transaction_history = await _service.get_transaction_history(
+        dock_account_id=dock_account_id, start_date=start_date, end_date=end_date, limit=limit, cursor=cursor
+    )
+    headers = {"X-Next-Cursor": transaction_history.next_cursor} if transaction_history.next_cursor else None
+    return JSONResponse(content=jsonable_encoder(transaction_history.items), status_code=200, headers=headers)
+
+@router.get("/{dock_account_id}/export")
+async def export_transaction_history(
+        dock_account_id: str,
+        format: ExportFormat = ExportFormat.ndjson,
+        start_date: datetime = None,
+        end_date: datetime = None
+):
+    content = await _service.export_transaction_history(
+        dock_account_id=dock_account_id, export_format=format, start_date=start_date, end_date=end_date
+    )
+    return StreamingResponse(
+        content,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{dock_account_id}.{format}"'}
     )
-    return JSONResponse(content=jsonable_encoder(transaction_history), status_code=200)
 
 @router.post("")
 async def create_transaction(transaction_history: TransactionHistoryInterface):
-    created_transaction_history = _service.create(transaction_history=transaction_history)
+    created_transaction_history = await _service.create(transaction_history=transaction_history)
     return JSONResponse(content=jsonable_encoder(created_transaction_history), status_code=201)
+
+@router.post("/batch")
+async def create_transaction_batch(transactions: List[TransactionHistoryInterface]):
+    results = await _service.create_batch(transactions=transactions)
+    return JSONResponse(content=jsonable_encoder(results), status_code=200)
@@ -0,0 +1,10 @@
+from app.repositories.dock_account_repository import dock_account_cache
+from app.repositories.holder_repository import holder_cache
+
+
+class CacheService:
+    def get_cache_stats(self) -> dict:
+        return {
+            "holder": holder_cache.stats(),
+            "dock_account": dock_account_cache.stats(),
+        }
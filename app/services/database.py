@@ -0,0 +1,11 @@
+from fastapi import HTTPException
+
+from app.database.models import db
+from app.database.provider import MonitoredPooledPostgresqlDatabase
+
+
+class DatabaseService:
+    def get_pool_stats(self) -> dict:
+        if not isinstance(db.obj, MonitoredPooledPostgresqlDatabase):
+            raise HTTPException(status_code=404, detail="Connection pool is disabled")
+        return db.pool_stats()
@@ -1,63 +1,102 @@
 import re
+from datetime import datetime
+from typing import Optional
 
 from fastapi import HTTPException
 
-from app.interfaces.dock_account import DockAccountInterface, UpdateDockAccountRequest
+from app.database.executor import database_executor
+from app.database.unit_of_work import run_in_unit_of_work
+from app.interfaces.dock_account import DockAccountBalance, DockAccountInterface, UpdateDockAccountRequest
 from app.interfaces.enum import AccountStatus
-from app.repositories.dock_account_repository import DockAccountRepository
-from app.repositories.holder_repository import HolderRepository
-from app.utils.generator import generate_random_account_number, generate_random_agency_number
+from app.repositories.balance_snapshot_repository import BalanceSnapshotRepository
+from app.repositories.backend import dock_account_repository, holder_repository
+from app.repositories.dock_account_repository import AsyncDockAccountRepository
+from app.repositories.holder_repository import AsyncHolderRepository
+from app.utils.generator import account_number_allocator, generate_random_agency_number
+from app.utils.metrics import dock_account_status_changes
 
 class DockAccountService:
     def __init__(self):
-        self._repository = DockAccountRepository()
-        self._holder_repository = HolderRepository()
+        # Used by the writes, each one runs as a single unit of work in the database executor
+        self._sync_repository = dock_account_repository()
+        self._sync_holder_repository = holder_repository()
+        self._repository = AsyncDockAccountRepository(self._sync_repository)
+        self._holder_repository = AsyncHolderRepository(self._sync_holder_repository)
+        self._balance_snapshot_repository = BalanceSnapshotRepository()
 
-    def get_dock_account(self, cpf: str):
+    async def get_dock_account(self, cpf: str):
         cpf = re.sub("[^0-9]", "", cpf)
-        accounts = self._holder_repository.get_holder_accounts(cpf=cpf)
+        accounts = await self._holder_repository.get_holder_accounts(cpf=cpf)
         return accounts
 
-    def get_dock_account_by_id(self, cpf: str, _id: str):
+    async def get_dock_account_by_id(self, cpf: str, _id: str):
         cpf = re.sub("[^0-9]", "", cpf)
-        account = self._repository.get_by_id(_id=_id, holder=cpf)
+        account = await self._repository.get_by_id(_id=_id, holder=cpf)
         return account
 
-    def create(self, cpf: str):
+    async def get_balance(self, cpf: str, _id: str, at: Optional[datetime] = None) -> DockAccountBalance:
         cpf = re.sub("[^0-9]", "", cpf)
-        holder = self._holder_repository.get_by_id(cpf=cpf, status=True)
+        account = await self._repository.get_by_id(_id=_id, holder=cpf)
+        if at is None:
+            return DockAccountBalance(dock_account=account.id, balance=account.balance, at=datetime.now())
+        if at.tzinfo is not None:
+            at = at.astimezone().replace(tzinfo=None)
+        balance = await database_executor.run(self._balance_snapshot_repository.balance_at,
+                                              dock_account_id=account.id, at=at)
+        return DockAccountBalance(dock_account=account.id, balance=balance, at=at)
+
+    async def create(self, cpf: str):
+        cpf = re.sub("[^0-9]", "", cpf)
+        new_dock_account = await run_in_unit_of_work(self._create, cpf=cpf)
+        return new_dock_account
+
+    def _create(self, cpf: str) -> DockAccountInterface:
+        holder = self._sync_holder_repository.get_by_id(cpf=cpf, status=True)
         dock_account = DockAccountInterface(
             holder=holder.cpf,
-            number=generate_random_account_number(),
+            number=account_number_allocator.allocate(),
             agency=generate_random_agency_number()
         )
-        new_dock_account = self._repository.insert(dock_account=dock_account)
-        return new_dock_account
+        return self._sync_repository.insert(dock_account=dock_account)
 
-    def close(self, request: UpdateDockAccountRequest):
-        dock_account = self._repository.get_by_id(_id=request.id, holder=request.cpf)
+    async def close(self, request: UpdateDockAccountRequest):
+        updated_dock_account = await run_in_unit_of_work(self._close, request=request)
+        dock_account_status_changes.inc(status=AccountStatus.closed.value)
+        return updated_dock_account
+
+    def _close(self, request: UpdateDockAccountRequest) -> DockAccountInterface:
+        dock_account = self._sync_repository.get_for_update(_id=request.id, holder=request.cpf)
         if dock_account.status == AccountStatus.closed:
             raise HTTPException(status_code=422, detail="DockAccount is already closed")
+        self._sync_repository.update_status(_id=dock_account.id, status=AccountStatus.closed)
         dock_account.status = AccountStatus.closed
-        updated_dock_account = self._repository.update(dock_account=dock_account)
+        return dock_account
+
+    async def block(self, request: UpdateDockAccountRequest):
+        updated_dock_account = await run_in_unit_of_work(self._block, request=request)
+        dock_account_status_changes.inc(status=AccountStatus.blocked.value)
         return updated_dock_account
 
-    def block(self, request: UpdateDockAccountRequest):
-        dock_account = self._repository.get_by_id(_id=request.id, holder=request.cpf)
+    def _block(self, request: UpdateDockAccountRequest) -> DockAccountInterface:
+        dock_account = self._sync_repository.get_for_update(_id=request.id, holder=request.cpf)
         if dock_account.status == AccountStatus.blocked:
             raise HTTPException(status_code=422, detail="DockAccount is already blocked")
         elif dock_account.status == AccountStatus.closed:
             raise HTTPException(status_code=422, detail="DockAccount is closed")
+        self._sync_repository.update_status(_id=dock_account.id, status=AccountStatus.blocked)
         dock_account.status = AccountStatus.blocked
-        updated_dock_account = self._repository.update(dock_account=dock_account)
+        return dock_account
+
+    async def unblock(self, request: UpdateDockAccountRequest):
+        updated_dock_account = await run_in_unit_of_work(self._unblock, request=request)
         return updated_dock_account
 
-    def unblock(self, request: UpdateDockAccountRequest):
-        dock_account = self._repository.get_by_id(_id=request.id, holder=request.cpf)
+    def _unblock(self, request: UpdateDockAccountRequest) -> DockAccountInterface:
+        dock_account = self._sync_repository.get_for_update(_id=request.id, holder=request.cpf)
         if dock_account.status == AccountStatus.active:
             raise HTTPException(status_code=422, detail="DockAccount is already unblocked")
         elif dock_account.status == AccountStatus.closed:
             raise HTTPException(status_code=422, detail="DockAccount is closed")
+        self._sync_repository.update_status(_id=dock_account.id, status=AccountStatus.active)
         dock_account.status = AccountStatus.active
-        updated_dock_account = self._repository.update(dock_account=dock_account)
-        return updated_dock_account
+        return dock_account
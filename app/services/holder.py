@@ -1,28 +1,119 @@
+import codecs
+import csv
+import json
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
 from fastapi import HTTPException
+from pydantic import ValidationError
 
-from app.interfaces.holder import HolderInterface
-from app.repositories.dock_account_repository import DockAccountRepository
-from app.repositories.holder_repository import HolderRepository
-from app.utils.validator import validate_cpf
+from app.config.settings import get_settings
+from app.database.unit_of_work import run_in_unit_of_work
+from app.interfaces.enum import AccountStatus, ImportFormat, ImportStatus
+from app.interfaces.holder import HolderImportResult, HolderInterface
+from app.repositories.backend import dock_account_repository, holder_repository
+from app.repositories.holder_repository import AsyncHolderRepository
+from app.utils.metrics import dock_account_status_changes
+from app.utils.validator import validate_cpf, validate_cpfs
 
 
 class HolderService:
     def __init__(self):
-        self._repository = HolderRepository()
-        self._dock_account_repository = DockAccountRepository()
+        # Used by the writes, each one runs as a single unit of work in the database executor
+        self._sync_repository = holder_repository()
+        self._sync_dock_account_repository = dock_account_repository()
+        self._repository = AsyncHolderRepository(self._sync_repository)
 
-    def get_holder(self, cpf: str):
-        holder = self._repository.get_by_id(cpf=cpf)
+    async def get_holder(self, cpf: str):
+        holder = await self._repository.get_by_id(cpf=cpf)
         return holder
 
-    def create(self, holder: HolderInterface):
+    async def create(self, holder: HolderInterface):
         cpf = validate_cpf(holder.cpf)
         if not cpf:
             raise HTTPException(status_code=422, detail="Invalid CPF")
         holder.cpf = cpf
-        new_holder = self._repository.insert(holder=holder)
+        new_holder = await run_in_unit_of_work(self._sync_repository.insert, holder=holder)
         return new_holder
 
-    def deactivate(self, cpf: str):
-        self._repository.deactivate(cpf=cpf)
-        self._dock_account_repository.close_holder_accounts(cpf=cpf)
+    async def import_holders(self, file: BinaryIO, import_format: ImportFormat) -> List[HolderImportResult]:
+        """
+        Creates the holders of a CSV (with a `cpf,name[,status]` header) or NDJSON upload.
+
+        Every CPF is validated in one pass, repeated CPFs are dropped in memory and the valid holders are
+        loaded with COPY, skipping the ones that already exist. Rejected rows are reported without failing
+        the import.
+
+        :param file: uploaded file, UTF-8 encoded
+        :param import_format: format of the file
+        :return: one result per row of the file, in order, numbered from 1
+        """
+        return await run_in_unit_of_work(self._import_holders, file=file, import_format=import_format)
+
+    def _import_holders(self, file: BinaryIO, import_format: ImportFormat) -> List[HolderImportResult]:
+        rows = []
+        maximum_import_size = get_settings().maximum_import_size
+        for row in _read_import_rows(file=file, import_format=import_format):
+            if len(rows) == maximum_import_size:
+                raise HTTPException(status_code=422, detail="Import size exceeded")
+            rows.append(row)
+
+        results: List[Optional[HolderImportResult]] = [None] * len(rows)
+        holders: List[Tuple[int, HolderInterface]] = []
+        for i, row in enumerate(rows):
+            try:
+                holders.append((i, HolderInterface(**row)))
+            except (TypeError, ValidationError):
+                results[i] = _rejected(i, cpf=row.get("cpf") if isinstance(row, dict) else None,
+                                       detail="Invalid row")
+
+        accepted: Dict[str, Tuple[int, HolderInterface]] = {}
+        for (i, holder), cpf in zip(holders, validate_cpfs([x.cpf for _, x in holders])):
+            if not cpf:
+                results[i] = _rejected(i, cpf=holder.cpf, detail="Invalid CPF")
+            elif cpf in accepted:
+                results[i] = _rejected(i, cpf=cpf, detail="Duplicate CPF")
+            else:
+                holder.cpf = cpf
+                accepted[cpf] = (i, holder)
+
+        inserted = set(self._sync_repository.bulk_insert(holders=[x for _, x in accepted.values()]))
+        for cpf, (i, _) in accepted.items():
+            if cpf in inserted:
+                results[i] = HolderImportResult(row=i + 1, cpf=cpf, status=ImportStatus.accepted)
+            else:
+                results[i] = _rejected(i, cpf=cpf, detail="Holder already exists")
+        return results
+
+    async def deactivate(self, cpf: str):
+        # The holder and its accounts change together, or not at all
+        closed = await run_in_unit_of_work(self._deactivate, cpf=cpf)
+        if closed:
+            dock_account_status_changes.inc(closed, status=AccountStatus.closed.value)
+
+    def _deactivate(self, cpf: str) -> int:
+        self._sync_repository.deactivate(cpf=cpf)
+        return self._sync_dock_account_repository.close_holder_accounts(cpf=cpf)
+
+
+def _rejected(index: int, cpf: Optional[str], detail: str) -> HolderImportResult:
+    return HolderImportResult(row=index + 1, cpf=cpf, status=ImportStatus.rejected, detail=detail)
+
+
+def _read_import_rows(file: BinaryIO, import_format: ImportFormat) -> Iterator[dict]:
+    lines = codecs.iterdecode(file, "utf-8-sig")
+    try:
+        if import_format == ImportFormat.csv:
+            for row in csv.DictReader(lines):
+                # Empty cells take the default of the field
+                yield {k: v for k, v in row.items() if k and v}
+            return
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Reported as an invalid row
+                yield {}
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=422, detail="Import file must be UTF-8 encoded")
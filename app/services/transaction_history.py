@@ -1,41 +1,242 @@
-from datetime import datetime
-from typing import Optional
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+from uuid import UUID
 
 from fastapi import HTTPException
 
+from app.config.settings import get_settings
+from app.database.executor import database_executor
+from app.database.posting_queue import balance_posting_queue
+from app.database.unit_of_work import UnitOfWork, run_in_unit_of_work
 from app.interfaces import BetweenDateFilter
-from app.interfaces.enum import AccountStatus, TransactionType
-from app.interfaces.transaction_history import TransactionHistoryInterface
-from app.repositories.dock_account_repository import DockAccountRepository
-from app.repositories.transaction_history_repository import TransactionHistoryRepository
+from app.interfaces.enum import AccountStatus, TransactionType, TransactionStatus, ExportFormat, StorageBackend
+from app.interfaces.dock_account import DockAccountInterface
+from app.interfaces.transaction_history import (
+    TransactionHistoryInterface, TransactionBatchResult, TransactionHistoryCursor, TransactionHistoryPage
+)
+from app.repositories.balance_snapshot_repository import BalanceSnapshotRepository
+from app.repositories.backend import (
+    daily_withdrawal_repository, dock_account_repository, transaction_history_repository
+)
+from app.repositories.dock_account_repository import AsyncDockAccountRepository
+from app.repositories.pending_balance_delta_repository import PendingBalanceDeltaRepository
+from app.repositories.transaction_history_repository import AsyncTransactionHistoryRepository, EXPORT_COLUMNS
+from app.utils.exporter import to_csv, to_ndjson
+from app.utils.metrics import transactions_posted
 from app.utils.validator import withdrawal_validation
 
 
+def _write_behind() -> bool:
+    # The pending deltas are Postgres rows, the memory backend always posts the balance right away
+    _settings = get_settings()
+    return _settings.write_behind_deposits and _settings.storage_backend == StorageBackend.postgres
+
+
 class TransactionHistoryService:
     def __init__(self):
-        self._repository = TransactionHistoryRepository()
-        self._dock_account_repository = DockAccountRepository()
+        # Used by the parts that run as a single call in the database executor (transactions, streams)
+        self._sync_repository = transaction_history_repository()
+        self._sync_dock_account_repository = dock_account_repository()
+        self._daily_withdrawal_repository = daily_withdrawal_repository()
+        self._repository = AsyncTransactionHistoryRepository(self._sync_repository)
+        self._dock_account_repository = AsyncDockAccountRepository(self._sync_dock_account_repository)
+        self._pending_balance_delta_repository = PendingBalanceDeltaRepository()
+        self._balance_snapshot_repository = BalanceSnapshotRepository()
+
+    async def get_transaction_history(
+            self,
+            dock_account_id: str,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            limit: Optional[int] = None,
+            cursor: Optional[str] = None
+    ) -> TransactionHistoryPage:
+        _settings = get_settings()
+        limit = min(limit or _settings.default_page_size, _settings.maximum_page_size)
+        if limit < 1:
+            raise HTTPException(status_code=422, detail="Invalid limit")
+
+        after = None
+        if cursor:
+            try:
+                after = TransactionHistoryCursor.decode(cursor)
+            except ValueError:
+                raise HTTPException(status_code=422, detail="Invalid cursor")
 
-    def get_transaction_history(
-            self, dock_account_id: str, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None
-    ):
         between_filter = None
         if start_date:
             between_filter = BetweenDateFilter(
                 start_date=start_date,
                 end_date=end_date if end_date else datetime.now()
             )
-        transaction_history = self._repository.get(dock_account_id=dock_account_id, between_filter=between_filter)
-        return transaction_history
+        # One extra row tells if there is a next page without a COUNT
+        transaction_history = await self._repository.get(
+            dock_account_id=dock_account_id, between_filter=between_filter, limit=limit + 1, after=after
+        )
 
-    def create(self, transaction_history: TransactionHistoryInterface):
-        dock_account = self._dock_account_repository.get_by_id(_id=transaction_history.dock_account,
-                                                               status=AccountStatus.active.value)
+        next_cursor = None
+        if len(transaction_history) > limit:
+            transaction_history = transaction_history[:limit]
+            last = transaction_history[-1]
+            next_cursor = TransactionHistoryCursor(created_at=last.created_at, id=last.id).encode()
+        return TransactionHistoryPage(items=transaction_history, next_cursor=next_cursor)
+
+    async def export_transaction_history(
+            self,
+            dock_account_id: str,
+            export_format: ExportFormat,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None
+    ) -> Iterator[str]:
+        """
+        Checks the account and returns a lazy iterator over the serialized history, rows are only
+        read from the database as the iterator is consumed.
+        """
+        await self._dock_account_repository.get_by_id(_id=dock_account_id)
+        between_filter = None
+        if start_date:
+            between_filter = BetweenDateFilter(
+                start_date=start_date,
+                end_date=end_date if end_date else datetime.now()
+            )
+        rows = self._sync_repository.export(dock_account_id=dock_account_id, between_filter=between_filter)
+        if export_format == ExportFormat.csv:
+            return to_csv(rows, columns=EXPORT_COLUMNS)
+        return to_ndjson(rows, columns=EXPORT_COLUMNS)
+
+    async def create(self, transaction_history: TransactionHistoryInterface):
+        # The checks and the posting run in one unit of work, with a single commit
+        new_transaction_history = await run_in_unit_of_work(self._create, transaction_history=transaction_history)
+        transactions_posted.inc(type=transaction_history.type.value)
+        return new_transaction_history
+
+    def _create(self, transaction_history: TransactionHistoryInterface) -> TransactionHistoryInterface:
+        dock_account = self._sync_dock_account_repository.get_by_id(_id=transaction_history.dock_account,
+                                                                    status=AccountStatus.active.value)
         if not dock_account:
             raise HTTPException(status_code=422, detail="DockAccount cannot make transactions")
 
+        closed_until = self._closed_until(transactions=[transaction_history])
+        if closed_until and transaction_history.created_at.date() <= closed_until:
+            raise HTTPException(status_code=422, detail="Transaction date is already closed")
+
+        write_behind = _write_behind()
         if transaction_history.type == TransactionType.withdrawal:
-            withdrawal_validation(dock_account=dock_account, amount=transaction_history.amount)
+            if write_behind:
+                self._apply_pending_deltas(dock_accounts={dock_account.id: dock_account})
+            withdrawal_validation(dock_account=dock_account, amount=transaction_history.amount,
+                                  day=transaction_history.created_at.date())
+            return self._sync_repository.insert(transaction_history=transaction_history)
 
-        new_transaction_history = self._repository.insert(transaction_history=transaction_history)
+        if transaction_history.amount <= 0:
+            raise HTTPException(status_code=422, detail="Invalid deposit amount")
+        new_transaction_history = self._sync_repository.insert(transaction_history=transaction_history,
+                                                               defer_balance=write_behind)
+        if write_behind:
+            UnitOfWork.after_commit(lambda: balance_posting_queue.put(
+                transaction_id=transaction_history.id, dock_account_id=transaction_history.dock_account
+            ))
         return new_transaction_history
+
+    def _closed_until(self, transactions: List[TransactionHistoryInterface]) -> Optional[date]:
+        # Only postings dated before today can fall on a checkpointed day, the others skip the lookup. The
+        # balance snapshots only exist on Postgres.
+        if get_settings().storage_backend != StorageBackend.postgres:
+            return None
+        if all(x.created_at.date() >= date.today() for x in transactions):
+            return None
+        return self._balance_snapshot_repository.closed_until()
+
+    def _apply_pending_deltas(self, dock_accounts: Dict[UUID, DockAccountInterface]):
+        # Write-behind deposits not applied yet are added to the balances first, so withdrawals are checked
+        # against the whole balance. Must run in the unit of work of the withdrawals.
+        deltas = self._pending_balance_delta_repository.take(dock_account_ids=dock_accounts.keys())
+        self._sync_dock_account_repository.apply_balance_deltas(deltas=deltas, active_only=True)
+        for dock_account_id, delta in deltas.items():
+            dock_accounts[dock_account_id].balance += delta
+
+    async def create_batch(self, transactions: List[TransactionHistoryInterface]) -> List[TransactionBatchResult]:
+        """
+        Posts a batch of transactions in a single database transaction.
+
+        The affected accounts are locked once, every item is validated in order against the running
+        balance and daily withdrawal amount, the accepted items are bulk inserted and each account
+        receives one aggregated balance update. Rejected items are reported without failing the batch.
+        """
+        if len(transactions) > get_settings().maximum_batch_size:
+            raise HTTPException(status_code=422, detail="Batch size exceeded")
+        # The whole transaction runs on one executor thread, and so on one connection
+        return await database_executor.run(self._post_batch, transactions=transactions)
+
+    def _post_batch(self, transactions: List[TransactionHistoryInterface]) -> List[TransactionBatchResult]:
+
+        results = []
+        accepted = []
+        seen_ids = set()
+        balance_deltas = defaultdict(Decimal)
+        withdrawal_totals = defaultdict(Decimal)
+        with UnitOfWork():
+            dock_accounts = self._sync_dock_account_repository.lock_by_ids(
+                ids={x.dock_account for x in transactions}, status=AccountStatus.active.value
+            )
+            # Totals by account and day, each withdrawal is checked against the day it is posted on
+            daily_withdrawals = defaultdict(Decimal)
+            for day in {x.created_at.date() for x in transactions if x.type == TransactionType.withdrawal}:
+                amounts = self._daily_withdrawal_repository.get_amounts(dock_account_ids=dock_accounts.keys(), day=day)
+                daily_withdrawals.update({(dock_account_id, day): x for dock_account_id, x in amounts.items()})
+            closed_until = self._closed_until(transactions=transactions)
+            # Posted by an earlier request, a retry of the same transaction
+            stored_ids = self._sync_repository.get_existing_ids(ids={x.id for x in transactions})
+            if _write_behind():
+                self._apply_pending_deltas(dock_accounts=dock_accounts)
+
+            for transaction in transactions:
+                dock_account = dock_accounts.get(transaction.dock_account)
+                try:
+                    if transaction.id in seen_ids:
+                        raise HTTPException(status_code=422, detail="Duplicated transaction")
+                    if transaction.id in stored_ids:
+                        raise HTTPException(status_code=422, detail="TransactionHistory already exists")
+                    if not dock_account:
+                        raise HTTPException(status_code=404, detail="DockAccount not found")
+                    if closed_until and transaction.created_at.date() <= closed_until:
+                        raise HTTPException(status_code=422, detail="Transaction date is already closed")
+                    if transaction.type == TransactionType.withdrawal:
+                        day_key = (dock_account.id, transaction.created_at.date())
+                        withdrawal_validation(
+                            dock_account=dock_account,
+                            amount=transaction.amount,
+                            daily_withdrawal_amount=daily_withdrawals[day_key]
+                        )
+                        daily_withdrawals[day_key] += transaction.amount
+                        dock_account.balance -= transaction.amount
+                        balance_deltas[dock_account.id] -= transaction.amount
+                        withdrawal_totals[day_key] += transaction.amount
+                    elif transaction.amount <= 0:
+                        raise HTTPException(status_code=422, detail="Invalid deposit amount")
+                    else:
+                        dock_account.balance += transaction.amount
+                        balance_deltas[dock_account.id] += transaction.amount
+                except HTTPException as ex:
+                    results.append(TransactionBatchResult(
+                        id=transaction.id,
+                        dock_account=transaction.dock_account,
+                        status=TransactionStatus.rejected,
+                        detail=ex.detail
+                    ))
+                    continue
+
+                seen_ids.add(transaction.id)
+                accepted.append(transaction)
+                results.append(TransactionBatchResult(
+                    id=transaction.id, dock_account=transaction.dock_account, status=TransactionStatus.accepted
+                ))
+
+            self._sync_repository.insert_many(transactions=accepted)
+            self._sync_dock_account_repository.apply_balance_deltas(deltas=balance_deltas, active_only=True)
+            self._daily_withdrawal_repository.increment_many(amounts=withdrawal_totals)
+        for transaction in accepted:
+            transactions_posted.inc(type=transaction.type.value)
+        return results
@@ -0,0 +1,55 @@
+import asyncio
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+from app.benchmarks.hot_account import check_invariants, draw_postings, open_account, run_level
+from app.interfaces.enum import TransactionType
+from app.interfaces.transaction_history import TransactionHistoryInterface
+
+
+def _transaction(dock_account_id, transaction_type, amount, created_at):
+    return TransactionHistoryInterface(dock_account=dock_account_id, type=transaction_type, amount=Decimal(amount),
+                                       created_at=created_at)
+
+def test_check_invariants():
+    dock_account_id = uuid4()
+    noon = datetime.combine(date.today(), time(12))
+    history = [
+        _transaction(dock_account_id, TransactionType.deposit, 100, noon - timedelta(days=1, minutes=1)),
+        _transaction(dock_account_id, TransactionType.withdrawal, 100, noon - timedelta(days=1)),
+        _transaction(dock_account_id, TransactionType.deposit, 80, noon - timedelta(minutes=2)),
+        _transaction(dock_account_id, TransactionType.withdrawal, 50, noon - timedelta(minutes=1)),
+    ]
+
+    # Validate a consistent account breaks no invariant
+    assert check_invariants(history, balance=Decimal(30), daily_withdrawal_amount=Decimal(50),
+                            maximum_daily_limit=Decimal(100)) == []
+
+    # Call the check with the withdrawal of today before the deposit, a wrong balance and daily total, and
+    # a limit below yesterday's withdrawals
+    history[3].created_at = noon - timedelta(minutes=3)
+    violations = check_invariants(history, balance=Decimal(40), daily_withdrawal_amount=Decimal(0),
+                                  maximum_daily_limit=Decimal(60))
+
+    # Validate each broken invariant is reported, the withdrawal made before the deposit included
+    assert len(violations) == 4
+    assert violations[0].startswith("balance 40 differs")
+    assert violations[1].startswith("balance went down to -50")
+    assert "over the daily limit" in violations[2]
+    assert violations[3].startswith("daily withdrawal total 0")
+
+def test_run_level():
+    # Open an account and draw more withdrawals than the daily limit allows
+    rng = random.Random(1)
+    dock_account_id = asyncio.run(open_account(rng, opening_balance=Decimal(500)))
+    postings = draw_postings(rng, count=200, withdrawal_share=0.6, max_amount=100)
+
+    # Call the postings with 8 concurrent workers
+    result = asyncio.run(run_level(dock_account_id, postings=postings, concurrency=8))
+
+    # Validate every posting was answered and the account is consistent
+    assert result.summary["all"]["requests"] == 200
+    assert result.summary["all"]["errors"] == 0
+    assert result.violations == []
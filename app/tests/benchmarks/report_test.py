@@ -0,0 +1,52 @@
+from app.benchmarks.report import LatencyRecorder, compare, percentile
+
+
+def _summary(p50=0.01, p95=0.02, p99=0.03, throughput=100.0, requests=1000, errors=0):
+    return {"p50": p50, "p95": p95, "p99": p99, "throughput": throughput, "requests": requests, "errors": errors}
+
+def test_percentile():
+    samples = list(range(100, 0, -1))
+
+    # Validate the nearest-rank percentiles of 1..100
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile(samples, 100) == 100
+    assert percentile([], 50) == 0.0
+
+def test_recorder_summary():
+    # Record requests of two routes, one failed
+    recorder = LatencyRecorder()
+    recorder.start()
+    for latency in (0.01, 0.02, 0.03):
+        recorder.record("GET /holder/{cpf}", latency)
+    recorder.record("POST /transaction", 0.05, error=True)
+    recorder.stop()
+    summary = recorder.summary()
+
+    # Validate each route has its own counts and percentiles
+    assert summary["GET /holder/{cpf}"]["requests"] == 3
+    assert summary["GET /holder/{cpf}"]["p50"] == 0.02
+    assert summary["POST /transaction"]["errors"] == 1
+
+def test_compare():
+    baseline = {
+        "lookups": {"GET /holder/{cpf}": _summary(), "GET /dock_account/{cpf}/{_id}": _summary()},
+        "history": {"GET /transaction/{dock_account_id}": _summary()},
+    }
+    current = {
+        "lookups": {
+            # Slower p99, within the noise floor for p50
+            "GET /holder/{cpf}": _summary(p50=0.0105, p99=0.05),
+            "GET /dock_account/{cpf}/{_id}": _summary(throughput=70.0, errors=10),
+        },
+    }
+
+    # Call the compare method with a 20% tolerance
+    regressions = compare(baseline, current, tolerance=0.2)
+
+    # Validate the regressions found, the scenario that was not run is ignored
+    assert len(regressions) == 3
+    assert regressions[0].startswith("lookups GET /holder/{cpf}: p99")
+    assert "error rate" in regressions[1]
+    assert "throughput" in regressions[2]
+    assert compare(baseline, baseline, tolerance=0.2) == []
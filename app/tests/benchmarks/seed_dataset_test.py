@@ -0,0 +1,57 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from app.benchmarks.seed_dataset import DatasetShape
+from app.interfaces.enum import TransactionType
+from app.utils.validator import validate_cpfs
+
+
+def _shape(**kwargs):
+    params = dict(holders=500, accounts=1000, transactions=5000, days=30, hot_accounts=5, hot_share=0.3,
+                  tail_skew=3.0, withdrawal_ratio=0.5, maximum_daily_limit=Decimal(1000), chunk_size=700, seed=7,
+                  end=datetime(2024, 6, 1))
+    return DatasetShape(**{**params, **kwargs})
+
+def test_holders_and_accounts():
+    shape = _shape()
+
+    # Call the generation of every chunk
+    holders = [x for chunk in range(shape.chunks(shape.holders)) for x in shape.holder_rows(chunk)]
+    accounts = [x for chunk in range(shape.chunks(shape.accounts)) for x in shape.account_rows(chunk)]
+
+    # Validate the CPFs are valid and unique, and every account belongs to one of them
+    cpfs = [x[0] for x in holders]
+    assert len(set(cpfs)) == shape.holders
+    assert all(validate_cpfs(cpfs))
+    assert {x[1] for x in accounts} == set(cpfs)
+    assert len({x[0] for x in accounts}) == len({x[2] for x in accounts}) == shape.accounts
+
+def test_transactions():
+    shape = _shape()
+
+    # Call the generation of every chunk, twice
+    transactions = [x for chunk in range(shape.chunks(shape.transactions)) for x in shape.transaction_rows(chunk)]
+    again = [x for chunk in reversed(range(shape.chunks(shape.transactions))) for x in shape.transaction_rows(chunk)]
+
+    # Validate the rows do not depend on the order the chunks are generated in
+    assert len(transactions) == shape.transactions
+    assert sorted(transactions, key=lambda x: x[0]) == sorted(again, key=lambda x: x[0])
+
+    # Validate the period and that no balance goes negative when the history is replayed in order
+    balances = defaultdict(Decimal)
+    for _, dock_account_id, type, amount, created_at in sorted(transactions, key=lambda x: x[4]):
+        assert shape.start <= created_at < shape.end
+        balances[dock_account_id] += Decimal(amount) if type == TransactionType.deposit else -Decimal(amount)
+        assert balances[dock_account_id] >= 0
+
+    # Validate no account withdraws more than the daily limit on any day
+    daily_withdrawals = defaultdict(Decimal)
+    for _, dock_account_id, type, amount, created_at in transactions:
+        if type == TransactionType.withdrawal:
+            daily_withdrawals[dock_account_id, created_at.date()] += Decimal(amount)
+    assert max(daily_withdrawals.values()) <= shape.maximum_daily_limit
+
+    # Validate the hot accounts get the largest share of the transactions
+    hot_accounts = {shape.account_id(x) for x in range(shape.hot_accounts)}
+    assert sum(x[1] in hot_accounts for x in transactions) > 0.25 * shape.transactions
@@ -1,15 +1,64 @@
 import os
+from datetime import date
 
 import pytest
 
+from app.config.settings import get_settings
+from app.database.models import db, init_database
+from app.database.models.balance_snapshot import BalanceSnapshot
+from app.database.models.daily_withdrawal import DailyWithdrawal
 from app.database.models.dock_account import DockAccount
 from app.database.models.holder import Holder
+from app.database.models.pending_balance_delta import PendingBalanceDelta
 from app.database.models.transaction_history import TransactionHistory
-from app.database.provider import DatabaseProvider
+from app.database.models.transaction_id import TransactionId
+from app.interfaces.enum import StorageBackend
+from app.repositories.dock_account_repository import DockAccountRepository, dock_account_cache
+from app.repositories.holder_repository import holder_cache
+from app.repositories.transaction_history_partition_repository import (
+    TransactionHistoryPartitionRepository, month_start
+)
+
+# Modules that write through the models at import, they can't even be collected without a database
+POSTGRES_MODULES = [
+    "repositories/balance_snapshot_repository_test.py",
+    "repositories/daily_withdrawal_repository_test.py",
+    "repositories/dock_account_repository_test.py",
+    "repositories/transaction_history_partition_repository_test.py",
+    "repositories/transaction_history_repository_test.py",
+    "routers/query_count_test.py",
+]
+collect_ignore = POSTGRES_MODULES if get_settings().storage_backend == StorageBackend.memory else []
 
 
 def pytest_configure(config):
     if os.getenv("ENVIRONMENT") != "test":
         pytest.exit("Tests running in the wrong environment, please look at your configurations")
-    db = DatabaseProvider.get_database()
-    db.create_tables([Holder, DockAccount, TransactionHistory])
\ No newline at end of file
+    config.addinivalue_line("markers", "postgres: needs the postgres storage backend")
+    if get_settings().storage_backend == StorageBackend.memory:
+        # Nothing to set up, the store of the memory backend lives in the test process
+        return
+    init_database()
+    db.create_tables([Holder, DockAccount, TransactionHistory, DailyWithdrawal, BalanceSnapshot, PendingBalanceDelta,
+                      TransactionId])
+    DockAccountRepository().create_number_sequence()
+    # Monthly partitions around the current month, older or later rows go to the default partition
+    partition_repository = TransactionHistoryPartitionRepository()
+    partition_repository.create_default_partition()
+    partition_repository.create_partitions(since=month_start(date.today(), months=-1),
+                                           until=month_start(date.today(), months=1))
+
+
+def pytest_collection_modifyitems(config, items):
+    if get_settings().storage_backend != StorageBackend.memory:
+        return
+    for item in items:
+        if "postgres" in item.keywords:
+            item.add_marker(pytest.mark.skip(reason="Needs the postgres storage backend"))
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # Tests write rows straight through the models, which the repository caches don't see
+    holder_cache.clear()
+    dock_account_cache.clear()
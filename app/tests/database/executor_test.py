@@ -0,0 +1,41 @@
+import asyncio
+import contextvars
+import time
+
+import pytest
+
+from app.database.executor import database_executor
+from app.database.models import db
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+@pytest.mark.postgres
+def test_run_does_not_block_the_event_loop():
+    async def run():
+        start = time.perf_counter()
+        await asyncio.gather(*[database_executor.run(db.execute_sql, "SELECT pg_sleep(0.5)") for _ in range(4)])
+        return time.perf_counter() - start
+
+    # Call four slow queries at once
+    elapsed = asyncio.run(run())
+
+    # Validate they ran side by side instead of one after the other
+    assert elapsed < 1.5
+
+def test_run_copies_context():
+    async def run():
+        _request_id.set("abc")
+        return await database_executor.run(_request_id.get)
+
+    # Validate the context variables are visible in the executor thread
+    assert asyncio.run(run()) == "abc"
+
+@pytest.mark.postgres
+def test_run_returns_the_connection_to_the_pool():
+    in_use = db.pool_stats()["in_use"]
+
+    # Call a query in the executor
+    asyncio.run(database_executor.run(db.execute_sql, "SELECT 1"))
+
+    # Validate the executor thread gave its connection back
+    assert db.pool_stats()["in_use"] == in_use
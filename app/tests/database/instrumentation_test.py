@@ -0,0 +1,45 @@
+import asyncio
+import logging
+
+import pytest
+
+from app.config.settings import get_settings
+from app.database.executor import database_executor
+from app.database.instrumentation import normalize_sql, track_queries
+from app.database.models import db
+
+
+def test_normalize_sql():
+    # Validate literals and parameters are replaced and whitespace collapsed
+    sql = "SELECT *  FROM \"t1\"\n WHERE id = %s AND name = 'a''b' LIMIT 10"
+    assert normalize_sql(sql) == "SELECT * FROM \"t1\" WHERE id = ? AND name = ? LIMIT ?"
+
+@pytest.mark.postgres
+def test_track_queries():
+    async def run():
+        with track_queries() as stats:
+            db.execute_sql("SELECT 1")
+            await database_executor.run(db.execute_sql, "SELECT 2")
+        return stats
+
+    # Call queries on this thread and in the executor
+    stats = asyncio.run(run())
+
+    # Validate both were counted
+    assert stats.count == 2
+    assert stats.time > 0
+
+@pytest.mark.postgres
+def test_slow_query_log(monkeypatch, caplog):
+    monkeypatch.setattr(get_settings(), "slow_query_threshold", 0.1)
+
+    # Call a query slower than the threshold and a fast one
+    with caplog.at_level(logging.WARNING, logger="slow_query"):
+        with track_queries({"path": "/holder/123"}):
+            db.execute_sql("SELECT pg_sleep(0.2)")
+            db.execute_sql("SELECT 1")
+
+    # Validate only the slow query was logged, normalized and with its route
+    assert len(caplog.records) == 1
+    assert caplog.records[0].fields["route"] == "/holder/123"
+    assert caplog.records[0].fields["sql"] == "SELECT pg_sleep(?)"
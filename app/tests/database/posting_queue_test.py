@@ -0,0 +1,76 @@
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+
+from app.database.models.dock_account import DockAccount
+from app.database.models.holder import Holder
+from app.database.models.pending_balance_delta import PendingBalanceDelta
+from app.database.posting_queue import BalancePostingQueue
+from app.interfaces.dock_account import DockAccountInterface
+from app.interfaces.enum import AccountStatus
+
+pytestmark = pytest.mark.postgres
+
+_cpf = "51748246031"
+
+@pytest.fixture
+def dock_account():
+    # Create a holder with an empty account, removed with its pending deltas after the test
+    Holder.create(cpf=_cpf, name="Test Holder")
+    dock_account = DockAccount.create(**DockAccountInterface(holder=_cpf, agency="0001", number="654321",
+                                                             status=AccountStatus.active).model_dump())
+
+    yield dock_account  # Allow the test to run
+
+    PendingBalanceDelta.delete().where(PendingBalanceDelta.dock_account == dock_account.id).execute()
+    DockAccount.delete().where(DockAccount.id == dock_account.id).execute()
+    Holder.delete().where(Holder.cpf == _cpf).execute()
+
+@pytest.fixture
+def posting_queue():
+    # A flush interval long enough for the tests to flush by hand
+    posting_queue = BalancePostingQueue(shards=2, flush_size=10, flush_interval=3600)
+    yield posting_queue
+    posting_queue.stop()
+
+def test_flush_applies_pending_deltas(posting_queue, dock_account):
+    # Record pending deposits and queue them
+    transaction_ids = [uuid4() for _ in range(3)]
+    for transaction_id in transaction_ids:
+        PendingBalanceDelta.create(id=transaction_id, dock_account=dock_account.id, amount=Decimal(25))
+        posting_queue.put(transaction_id=transaction_id, dock_account_id=dock_account.id)
+
+    # Call flush
+    posting_queue.flush()
+
+    # Validate the balance was updated once with every delta and the pending rows are gone
+    assert DockAccount.get_by_id(dock_account.id).balance == Decimal(75)
+    assert not PendingBalanceDelta.select().where(PendingBalanceDelta.dock_account == dock_account.id).exists()
+
+def test_flush_skips_deltas_already_taken(posting_queue, dock_account):
+    # Queue a pending deposit whose row was already applied and deleted by someone else
+    transaction_id = uuid4()
+    posting_queue.put(transaction_id=transaction_id, dock_account_id=dock_account.id)
+
+    # Call flush
+    posting_queue.flush()
+
+    # Validate the balance was not changed twice
+    assert DockAccount.get_by_id(dock_account.id).balance == Decimal(0)
+
+def test_flush_drops_refused_deltas(posting_queue, dock_account, caplog):
+    # Record a pending delta that would leave the balance negative, and a deposit behind it
+    refused_id, transaction_id = uuid4(), uuid4()
+    PendingBalanceDelta.create(id=refused_id, dock_account=dock_account.id, amount=Decimal(-50))
+    PendingBalanceDelta.create(id=transaction_id, dock_account=dock_account.id, amount=Decimal(25))
+    posting_queue.put(transaction_id=refused_id, dock_account_id=dock_account.id)
+    posting_queue.put(transaction_id=transaction_id, dock_account_id=dock_account.id)
+
+    # Call flush
+    posting_queue.flush()
+
+    # Validate the deposit was applied, the refused delta dropped and logged, and nothing is left queued
+    assert DockAccount.get_by_id(dock_account.id).balance == Decimal(25)
+    assert not PendingBalanceDelta.select().where(PendingBalanceDelta.dock_account == dock_account.id).exists()
+    assert any(str(refused_id) in x.getMessage() for x in caplog.records if x.levelname == "ERROR")
@@ -0,0 +1,67 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from peewee import PostgresqlDatabase
+
+from app.database.executor import database_executor
+from app.database.models import db
+from app.database.routing import ReadRouter, pinned_read_database, read_database
+
+pytestmark = pytest.mark.postgres
+
+
+@pytest.fixture
+def replica():
+    # A second database handle on the test instance. It is not a standby, so it never reports a replay position
+    replica = PostgresqlDatabase(db.database, **db.connect_params)
+    yield replica
+    replica.close()
+
+@pytest.fixture
+def router(replica):
+    return ReadRouter(primary=db, replicas=[replica], wait_timeout=0.2)
+
+def for_read(router, min_lsn=None):
+    return asyncio.run(router.for_read(database_executor.run, min_lsn=min_lsn))
+
+def test_for_read_without_replicas():
+    # Validate reads stay on the primary when there are no replicas
+    router = ReadRouter(primary=db, replicas=[], wait_timeout=0.2)
+    assert not router.has_replicas
+    with patch.object(ReadRouter, "replayed_replica") as replayed_replica:
+        assert for_read(router, min_lsn="0/0") is db
+    assert router.current_lsn() is None
+
+    # Validate no replica was polled
+    replayed_replica.assert_not_called()
+
+def test_for_read_without_token(router, replica):
+    # Validate reads without a consistency token go to the replica
+    assert for_read(router) is replica
+
+def test_for_read_falls_back_to_primary(router):
+    lsn = router.current_lsn()
+
+    # Call the for_read method with a position the replica never reaches
+    database = for_read(router, min_lsn=lsn)
+
+    # Validate the read went to the primary after the wait
+    assert database is db
+
+def test_for_read_replica_caught_up(router, replica):
+    # Validate the replica is used once it has replayed the token position
+    with patch.object(ReadRouter, "_has_replayed", return_value=True):
+        assert for_read(router, min_lsn=router.current_lsn()) is replica
+
+def test_replayed_replica_not_caught_up(router):
+    # Validate a single pass reports no replica instead of waiting for one
+    assert router.replayed_replica(min_lsn=router.current_lsn()) is None
+
+def test_read_database_pinned(replica):
+    # Validate reads made outside read-only requests go to the primary
+    assert read_database() is db
+    # Validate reads made inside read-only requests go to the database resolved for the request
+    with pinned_read_database(replica):
+        assert read_database() is replica
+    assert read_database() is db
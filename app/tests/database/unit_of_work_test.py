@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.database.models import db
+from app.database.models.holder import Holder
+from app.database.unit_of_work import UnitOfWork, run_in_unit_of_work
+
+pytestmark = pytest.mark.postgres
+
+_cpf = "23574586095"
+
+@pytest.fixture
+def setup_database():
+    # Delete the holder written by the tests before and after each test
+    Holder.delete().where(Holder.cpf == _cpf).execute()
+
+    yield  # Allow the test to run
+
+    Holder.delete().where(Holder.cpf == _cpf).execute()
+
+def test_rolls_back_on_http_exception(setup_database):
+    committed = []
+
+    # Write inside a unit of work that fails part-way
+    with pytest.raises(HTTPException):
+        with UnitOfWork():
+            UnitOfWork.after_commit(lambda: committed.append(True))
+            Holder.create(cpf=_cpf, name="Test Holder")
+            raise HTTPException(status_code=422, detail="Invalid")
+
+    # Validate nothing was written and the after commit callback was not called
+    assert not Holder.select().where(Holder.cpf == _cpf).exists()
+    assert committed == []
+
+def test_nested_units_share_one_transaction(setup_database):
+    committed = []
+
+    # Open a unit of work inside another one
+    with UnitOfWork():
+        with UnitOfWork():
+            UnitOfWork.after_commit(lambda: committed.append(True))
+            Holder.create(cpf=_cpf, name="Test Holder")
+            # Validate the inner unit joined the outer transaction instead of opening a savepoint
+            assert db.transaction_depth() == 1
+        # Validate the inner unit did not commit
+        assert committed == []
+
+    # Validate the outer unit committed and called the callback
+    assert committed == [True]
+    assert Holder.select().where(Holder.cpf == _cpf).exists()
+
+def test_run_in_unit_of_work(setup_database):
+    def create_and_fail():
+        Holder.create(cpf=_cpf, name="Test Holder")
+        raise HTTPException(status_code=422, detail="Invalid")
+
+    # Call a failing function in the executor
+    with pytest.raises(HTTPException):
+        asyncio.run(run_in_unit_of_work(create_and_fail))
+
+    # Validate its write was rolled back
+    assert not Holder.select().where(Holder.cpf == _cpf).exists()
@@ -0,0 +1,50 @@
+import threading
+from contextlib import contextmanager
+from typing import List
+
+from peewee import Database, DatabaseProxy
+
+from app.database.models import db
+
+
+class QueryCounter:
+    """
+    Records the statements run through `Database.execute_sql` while active, from any thread (the routes
+    run their queries in the database executor). Transaction control (BEGIN, SAVEPOINT...) is not counted.
+    """
+    _transaction_control = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+    def __init__(self, database: Database = db):
+        # The proxy only forwards reads, the patch goes on the database it is bound to
+        self._database = database.obj if isinstance(database, DatabaseProxy) else database
+        self._lock = threading.Lock()
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __enter__(self):
+        execute_sql = self._database.execute_sql
+
+        def counted_execute_sql(sql, params=None, *args, **kwargs):
+            if not sql.lstrip().upper().startswith(self._transaction_control):
+                with self._lock:
+                    self.statements.append(sql)
+            return execute_sql(sql, params, *args, **kwargs)
+
+        self._database.execute_sql = counted_execute_sql
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        del self._database.execute_sql
+
+
+@contextmanager
+def assert_query_count(expected: int, database: Database = db):
+    """
+    Fails when the block runs a number of statements other than `expected`, listing the statements run.
+    """
+    with QueryCounter(database) as counter:
+        yield counter
+    assert counter.count == expected, f"{counter.count} queries, {expected} expected:\n" + "\n".join(counter.statements)
@@ -0,0 +1,73 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.database.models.balance_snapshot import BalanceSnapshot
+from app.database.models.dock_account import DockAccount
+from app.database.models.holder import Holder
+from app.database.models.transaction_history import TransactionHistory
+from app.interfaces.dock_account import DockAccountInterface
+from app.interfaces.enum import TransactionType
+from app.interfaces.holder import HolderInterface
+from app.interfaces.transaction_history import TransactionHistoryInterface
+from app.repositories.balance_snapshot_repository import BalanceSnapshotRepository
+from app.utils.generator import account_number_allocator
+
+_holder_interface = HolderInterface(cpf="71460285344", name="Test Holder")
+_holder = Holder.create(**_holder_interface.model_dump())
+_dock_account_interface = DockAccountInterface(
+    holder=_holder.cpf,
+    number=account_number_allocator.allocate(),
+    agency="001"
+)
+_dock_account = DockAccount.create(**_dock_account_interface.model_dump())
+_first_day = date(2024, 1, 1)
+
+@pytest.fixture
+def repository():
+    return BalanceSnapshotRepository()
+
+@pytest.fixture
+def setup_database():
+    # Insert three days of history straight into the table, leaving the snapshots empty
+    BalanceSnapshot.delete().where(BalanceSnapshot.dock_account == _dock_account.id).execute()
+    TransactionHistory.delete().where(TransactionHistory.dock_account == _dock_account.id).execute()
+    for days, transaction_type, amount in [(0, TransactionType.deposit, Decimal("100.0")),
+                                           (0, TransactionType.withdrawal, Decimal("30.0")),
+                                           (1, TransactionType.deposit, Decimal("12.0")),
+                                           (2, TransactionType.withdrawal, Decimal("2.0"))]:
+        TransactionHistory.create(**TransactionHistoryInterface(
+            dock_account=_dock_account.id, type=transaction_type, amount=amount,
+            created_at=datetime(2024, 1, 1, 10) + timedelta(days=days)
+        ).model_dump())
+
+    yield  # Allow the test to run
+
+    BalanceSnapshot.delete().where(BalanceSnapshot.dock_account == _dock_account.id).execute()
+    TransactionHistory.delete().where(TransactionHistory.dock_account == _dock_account.id).execute()
+
+def test_build_success(setup_database, repository):
+    # Call the build method for the first two days, then for the third one
+    repository.build(since=_first_day, until=_first_day + timedelta(days=1))
+    repository.build(since=_first_day + timedelta(days=2), until=_first_day + timedelta(days=2))
+
+    # Validate the end of day balances carried over between the runs
+    snapshots = (BalanceSnapshot.select(BalanceSnapshot.day, BalanceSnapshot.balance)
+                                .where(BalanceSnapshot.dock_account == _dock_account.id)
+                                .order_by(BalanceSnapshot.day)
+                                .tuples())
+    assert list(snapshots) == [(_first_day, Decimal("70.0")),
+                               (_first_day + timedelta(days=1), Decimal("82.0")),
+                               (_first_day + timedelta(days=2), Decimal("80.0"))]
+    assert repository.last_day() >= _first_day + timedelta(days=2)
+
+def test_balance_at_success(setup_database, repository):
+    # Build the first day only, the later days are replayed from the history
+    repository.build(since=_first_day, until=_first_day)
+
+    # Validate the balance at several points in time
+    assert repository.balance_at(dock_account_id=_dock_account.id, at=datetime(2024, 1, 1, 9)) == Decimal(0)
+    assert repository.balance_at(dock_account_id=_dock_account.id, at=datetime(2024, 1, 1, 23)) == Decimal("70.0")
+    assert repository.balance_at(dock_account_id=_dock_account.id, at=datetime(2024, 1, 2, 23)) == Decimal("82.0")
+    assert repository.balance_at(dock_account_id=_dock_account.id, at=datetime(2024, 1, 5)) == Decimal("80.0")
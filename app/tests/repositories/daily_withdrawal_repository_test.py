@@ -0,0 +1,91 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from app.config.settings import get_settings
+from app.database.models.daily_withdrawal import DailyWithdrawal
+from app.database.models.dock_account import DockAccount
+from app.database.models.holder import Holder
+from app.database.models.transaction_history import TransactionHistory
+from app.interfaces.dock_account import DockAccountInterface
+from app.interfaces.enum import TransactionType
+from app.interfaces.holder import HolderInterface
+from app.interfaces.transaction_history import TransactionHistoryInterface
+from app.repositories.daily_withdrawal_repository import DailyWithdrawalRepository
+from app.utils.generator import account_number_allocator
+
+_holder_interface = HolderInterface(cpf="23488386046", name="Test Holder")
+_holder = Holder.create(**_holder_interface.model_dump())
+_dock_account_interface = DockAccountInterface(
+    holder=_holder.cpf,
+    number=account_number_allocator.allocate(),
+    agency="001",
+    balance=Decimal("10000.0")
+)
+_dock_account = DockAccount.create(**_dock_account_interface.model_dump())
+
+@pytest.fixture
+def repository():
+    return DailyWithdrawalRepository()
+
+@pytest.fixture
+def setup_database():
+    # Delete the account totals and history before and after each test
+    DailyWithdrawal.delete().where(DailyWithdrawal.dock_account == _dock_account.id).execute()
+    TransactionHistory.delete().where(TransactionHistory.dock_account == _dock_account.id).execute()
+
+    yield  # Allow the test to run
+
+    DailyWithdrawal.delete().where(DailyWithdrawal.dock_account == _dock_account.id).execute()
+    TransactionHistory.delete().where(TransactionHistory.dock_account == _dock_account.id).execute()
+
+def test_increment_success(setup_database, repository):
+    # Call the increment method twice on the same day
+    repository.increment(dock_account_id=_dock_account.id, amount=Decimal("100.0"))
+    result = repository.increment(dock_account_id=_dock_account.id, amount=Decimal("50.0"))
+
+    # Validate the total was accumulated
+    assert result == Decimal("150.0")
+    assert repository.get_amount(dock_account_id=_dock_account.id) == Decimal("150.0")
+
+def test_increment_exceeds_limit(setup_database, repository):
+    # Withdraw the whole daily limit
+    maximum_daily_limit = get_settings().maximum_daily_limit
+    repository.increment(dock_account_id=_dock_account.id, amount=maximum_daily_limit)
+
+    # Call the increment method and expect an HTTPException
+    with pytest.raises(HTTPException) as ex:
+        repository.increment(dock_account_id=_dock_account.id, amount=Decimal("0.01"))
+
+    # Validate the exception and that the total was not changed
+    assert ex.value.status_code == 422
+    assert ex.value.detail == "Daily withdrawal limit exceeded"
+    assert repository.get_amount(dock_account_id=_dock_account.id) == maximum_daily_limit
+
+def test_get_amount_rolls_over(setup_database, repository):
+    # Withdraw on the previous day
+    yesterday = date.today() - timedelta(days=1)
+    repository.increment(dock_account_id=_dock_account.id, amount=Decimal("100.0"), day=yesterday)
+
+    # Validate today's total starts from zero
+    assert repository.get_amount(dock_account_id=_dock_account.id) == Decimal(0)
+    assert repository.get_amount(dock_account_id=_dock_account.id, day=yesterday) == Decimal("100.0")
+
+def test_rebuild_success(setup_database, repository):
+    # Insert withdrawals straight into the history, bypassing the totals
+    for amount, created_at in [(Decimal("10.0"), datetime.now()), (Decimal("20.0"), datetime.now()),
+                               (Decimal("30.0"), datetime.now() - timedelta(days=1))]:
+        TransactionHistory.create(**TransactionHistoryInterface(
+            dock_account=_dock_account.id, type=TransactionType.withdrawal, amount=amount, created_at=created_at
+        ).model_dump())
+
+    # Call the rebuild method
+    repository.rebuild()
+
+    # Validate the totals of each day were rebuilt
+    assert repository.get_amount(dock_account_id=_dock_account.id) == Decimal("30.0")
+    assert repository.get_amount(
+        dock_account_id=_dock_account.id, day=date.today() - timedelta(days=1)
+    ) == Decimal("30.0")
@@ -3,11 +3,12 @@ from fastapi import HTTPException
 
 from app.database.models.holder import Holder
 from app.interfaces.holder import HolderInterface
-from app.repositories.dock_account_repository import DockAccountRepository
+from app.repositories.dock_account_repository import DockAccountRepository, dock_account_cache
 from app.database.models.dock_account import DockAccount
 from app.interfaces.dock_account import DockAccountInterface
 from decimal import Decimal
-from app.interfaces.enum import AccountStatus
+from app.interfaces.enum import AccountStatus, TransactionType
+from app.utils.generator import account_number_allocator
 
 _holder_interface = HolderInterface(cpf="70312641036", name="Test Holder")
 _holder = Holder.create(**_holder_interface.model_dump())
@@ -16,7 +17,7 @@ _holder = Holder.create(**_holder_interface.model_dump())
 def mock_dock_account():
     return DockAccountInterface(
         holder=_holder.cpf,
-        number="123456789",
+        number=account_number_allocator.allocate(),
         agency="001",
         balance=Decimal("100.0")
     )
@@ -65,3 +66,102 @@ def test_get_by_id_not_found(setup_database, repository):
     # Validate the exception
     assert ex.value.status_code == 404
     assert ex.value.detail == "DockAccount not found"
+
+def test_make_transaction_deposit(setup_database, repository, mock_dock_account):
+    # Insert the DockAccount to simulate an existing entry
+    DockAccount.create(**mock_dock_account.model_dump())
+
+    # Call the make_transaction method
+    balance = repository.make_transaction(
+        dock_account_id=mock_dock_account.id, amount=Decimal("50.0"), transaction_type=TransactionType.deposit
+    )
+
+    # Validate the balance was updated in the database
+    assert balance == Decimal("150.0")
+    assert DockAccount.get_by_id(mock_dock_account.id).balance == Decimal("150.0")
+
+def test_make_transaction_withdrawal_insufficient_balance(setup_database, repository, mock_dock_account):
+    # Insert the DockAccount to simulate an existing entry
+    DockAccount.create(**mock_dock_account.model_dump())
+
+    # Call the make_transaction method and expect an HTTPException
+    with pytest.raises(HTTPException) as ex:
+        repository.make_transaction(
+            dock_account_id=mock_dock_account.id, amount=Decimal("100.01"), transaction_type=TransactionType.withdrawal
+        )
+
+    # Validate the exception and that the balance was not changed
+    assert ex.value.status_code == 422
+    assert ex.value.detail == "DockAccount has no sufficient balance"
+    assert DockAccount.get_by_id(mock_dock_account.id).balance == mock_dock_account.balance
+
+def test_get_by_id_cached(setup_database, repository, mock_dock_account):
+    # Insert the DockAccount and read it once to fill the cache
+    DockAccount.create(**mock_dock_account.model_dump())
+    repository.get_by_id(_id=mock_dock_account.id)
+    hits = dock_account_cache.stats()["hits"]
+
+    # Call the get_by_id method again, with filters matching and not matching the cached account
+    result = repository.get_by_id(_id=mock_dock_account.id, status=AccountStatus.active.value)
+    with pytest.raises(HTTPException) as ex:
+        repository.get_by_id(_id=mock_dock_account.id, status=AccountStatus.closed.value)
+
+    # Validate both lookups were served by the cache and the filters were applied
+    assert result.id == mock_dock_account.id
+    assert ex.value.status_code == 404
+    assert dock_account_cache.stats()["hits"] == hits + 2
+
+def test_make_transaction_invalidates_cache(setup_database, repository, mock_dock_account):
+    # Insert the DockAccount and read it once to fill the cache
+    DockAccount.create(**mock_dock_account.model_dump())
+    repository.get_by_id(_id=mock_dock_account.id)
+
+    # Call the make_transaction method
+    repository.make_transaction(
+        dock_account_id=mock_dock_account.id, amount=Decimal("50.0"), transaction_type=TransactionType.deposit
+    )
+
+    # Validate the next read sees the new balance
+    assert repository.get_by_id(_id=mock_dock_account.id).balance == Decimal("150.0")
+
+def test_close_holder_accounts_invalidates_cache(setup_database, repository, mock_dock_account):
+    # Insert the DockAccount and read it once to fill the cache
+    DockAccount.create(**mock_dock_account.model_dump())
+    repository.get_by_id(_id=mock_dock_account.id)
+
+    # Call the close_holder_accounts method
+    repository.close_holder_accounts(cpf=mock_dock_account.holder)
+
+    # Validate the next read sees the account closed
+    assert repository.get_by_id(_id=mock_dock_account.id).status == AccountStatus.closed
+
+def test_make_transaction_inactive_account(setup_database, repository, mock_dock_account):
+    # Insert the DockAccount, cache it as active and block it behind the cache (as another worker would)
+    DockAccount.create(**mock_dock_account.model_dump())
+    repository.get_by_id(_id=mock_dock_account.id)
+    DockAccount.update(status=AccountStatus.blocked.value).where(DockAccount.id == mock_dock_account.id).execute()
+
+    # Call the make_transaction method and expect an HTTPException
+    with pytest.raises(HTTPException) as ex:
+        repository.make_transaction(
+            dock_account_id=mock_dock_account.id, amount=Decimal("50.0"), transaction_type=TransactionType.deposit
+        )
+
+    # Validate the exception and that the balance was not changed
+    assert ex.value.status_code == 422
+    assert ex.value.detail == "DockAccount cannot make transactions"
+    assert DockAccount.get_by_id(mock_dock_account.id).balance == mock_dock_account.balance
+
+def test_update_status_keeps_balance(setup_database, repository, mock_dock_account):
+    # Insert the DockAccount, cache it and post to it behind the cache (as another worker would)
+    DockAccount.create(**mock_dock_account.model_dump())
+    repository.get_by_id(_id=mock_dock_account.id)
+    DockAccount.update(balance=Decimal("250.0")).where(DockAccount.id == mock_dock_account.id).execute()
+
+    # Call the update_status method
+    repository.update_status(_id=mock_dock_account.id, status=AccountStatus.blocked)
+
+    # Validate only the status was written
+    dock_account = DockAccount.get_by_id(mock_dock_account.id)
+    assert dock_account.status == AccountStatus.blocked.value
+    assert dock_account.balance == Decimal("250.0")
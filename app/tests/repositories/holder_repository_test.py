@@ -1,9 +1,13 @@
+import asyncio
+
 import pytest
 from fastapi import HTTPException
-from app.repositories.holder_repository import HolderRepository
+from app.repositories.holder_repository import AsyncHolderRepository, HolderRepository
 from app.database.models.holder import Holder
 from app.interfaces.holder import HolderInterface
 
+pytestmark = pytest.mark.postgres
+
 @pytest.fixture
 def mock_holder():
     return HolderInterface(cpf="18046837016", name="Test Holder")
@@ -59,3 +63,47 @@ def test_get_by_id_not_found(setup_database, repository):
 
     # Validate the exception
     assert ex.value.status_code == 404
+
+def test_async_get_by_id_success(setup_database, mock_holder):
+    # Insert the holder to simulate an existing entry
+    Holder.create(**mock_holder.model_dump())
+
+    # Call the async get_by_id method
+    result = asyncio.run(AsyncHolderRepository().get_by_id(cpf=mock_holder.cpf))
+
+    # Validate the result
+    assert result.cpf == mock_holder.cpf
+
+def test_async_get_by_id_not_found(setup_database, mock_holder):
+    # Call the async get_by_id method and expect the HTTPException raised in the executor
+    with pytest.raises(HTTPException) as ex:
+        asyncio.run(AsyncHolderRepository().get_by_id(cpf=mock_holder.cpf))
+
+    # Validate the exception
+    assert ex.value.status_code == 404
+
+def test_deactivate_invalidates_cache(setup_database, repository, mock_holder):
+    # Insert the holder and read it once to fill the cache
+    repository.insert(mock_holder)
+    repository.get_by_id(cpf=mock_holder.cpf)
+
+    # Call the deactivate method
+    repository.deactivate(cpf=mock_holder.cpf)
+
+    # Validate the next read sees the holder deactivated
+    assert repository.get_by_id(cpf=mock_holder.cpf).status is False
+    with pytest.raises(HTTPException):
+        repository.get_by_id(cpf=mock_holder.cpf, status=True)
+
+def test_bulk_insert_skips_existing(setup_database, repository, mock_holder):
+    # Insert the holder to simulate an existing entry
+    Holder.create(**mock_holder.model_dump())
+    new_holder = HolderInterface(cpf="18761160130", name="Test Holder")
+
+    # Call the bulk_insert method with the existing holder and a new one
+    result = repository.bulk_insert([mock_holder, new_holder])
+
+    # Validate only the new holder was inserted
+    assert result == [new_holder.cpf]
+    assert Holder.get_by_id(new_holder.cpf).name == new_holder.name
+    Holder.delete().where(Holder.cpf == new_holder.cpf).execute()
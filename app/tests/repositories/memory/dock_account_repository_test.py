@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from peewee import IntegrityError
+
+from app.database.memory import memory_db
+from app.database.unit_of_work import UnitOfWork
+from app.interfaces.dock_account import DockAccountInterface
+from app.interfaces.enum import TransactionType
+from app.interfaces.holder import HolderInterface
+from app.repositories.memory.dock_account_repository import MemoryDockAccountRepository
+from app.repositories.memory.holder_repository import MemoryHolderRepository
+from app.utils.generator import format_account_number
+
+_holder = MemoryHolderRepository().insert(HolderInterface(cpf="71428793860", name="Test Holder"))
+
+@pytest.fixture
+def repository():
+    return MemoryDockAccountRepository()
+
+def _dock_account(repository, balance=Decimal(0)):
+    return repository.insert(DockAccountInterface(
+        holder=_holder.cpf,
+        number=format_account_number(repository.reserve_numbers(1)[0]),
+        agency="0001",
+        balance=balance
+    ))
+
+def test_insert_duplicated_number(repository):
+    # Create an account, then another one with the same agency and number
+    dock_account = _dock_account(repository)
+    with pytest.raises(IntegrityError):
+        repository.insert(DockAccountInterface(holder=_holder.cpf, number=dock_account.number, agency="0001"))
+
+    # Validate the unique index was enforced and the first account kept
+    assert repository.get_by_id(_id=dock_account.id).number == dock_account.number
+
+def test_make_transaction_insufficient_balance(repository):
+    # Create an account with a balance and withdraw more than it
+    dock_account = _dock_account(repository, balance=Decimal(50))
+    with pytest.raises(HTTPException) as exc:
+        repository.make_transaction(dock_account_id=dock_account.id, amount=Decimal(80),
+                                    transaction_type=TransactionType.withdrawal)
+
+    # Validate the withdrawal was rejected and the balance kept
+    assert exc.value.detail == "DockAccount has no sufficient balance"
+    assert repository.get_by_id(_id=dock_account.id).balance == Decimal(50)
+
+def test_rollback(repository):
+    # Deposit and create an account in a unit of work that fails
+    dock_account = _dock_account(repository, balance=Decimal(50))
+    with pytest.raises(HTTPException):
+        with UnitOfWork(memory_db):
+            repository.make_transaction(dock_account_id=dock_account.id, amount=Decimal(30),
+                                        transaction_type=TransactionType.deposit)
+            created = _dock_account(repository)
+            raise HTTPException(status_code=422, detail="Failed")
+
+    # Validate both changes were undone
+    assert repository.get_by_id(_id=dock_account.id).balance == Decimal(50)
+    with pytest.raises(HTTPException) as exc:
+        repository.get_by_id(_id=created.id)
+    assert exc.value.status_code == 404
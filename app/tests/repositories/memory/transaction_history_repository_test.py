@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from app.config.settings import get_settings
+from app.interfaces import BetweenDateFilter
+from app.interfaces.dock_account import DockAccountInterface
+from app.interfaces.enum import TransactionType
+from app.interfaces.holder import HolderInterface
+from app.interfaces.transaction_history import TransactionHistoryInterface, TransactionHistoryCursor
+from app.repositories.memory.dock_account_repository import MemoryDockAccountRepository
+from app.repositories.memory.holder_repository import MemoryHolderRepository
+from app.repositories.memory.transaction_history_repository import MemoryTransactionHistoryRepository
+from app.utils.generator import format_account_number
+
+_holder = MemoryHolderRepository().insert(HolderInterface(cpf="38426517005", name="Test Holder"))
+
+@pytest.fixture
+def repository():
+    return MemoryTransactionHistoryRepository()
+
+@pytest.fixture
+def dock_account():
+    repository = MemoryDockAccountRepository()
+    return repository.insert(DockAccountInterface(
+        holder=_holder.cpf,
+        number=format_account_number(repository.reserve_numbers(1)[0]),
+        agency="0001",
+        balance=Decimal(1000)
+    ))
+
+def test_get_in_order(repository, dock_account):
+    # Insert transactions out of order, one of them out of the period
+    now = datetime.now()
+    for days in (1, 3, 2, 10):
+        repository.insert(TransactionHistoryInterface(
+            dock_account=dock_account.id, type=TransactionType.deposit, amount=Decimal(days),
+            created_at=now - timedelta(days=days)
+        ))
+    between_filter = BetweenDateFilter(start_date=now - timedelta(days=5), end_date=now)
+
+    # Call the get method for two pages of the period
+    first_page = repository.get(dock_account_id=dock_account.id, between_filter=between_filter, limit=2)
+    last = first_page[-1]
+    second_page = repository.get(dock_account_id=dock_account.id, between_filter=between_filter, limit=2,
+                                 after=TransactionHistoryCursor(created_at=last.created_at, id=last.id))
+
+    # Validate the pages follow the created_at order and skip the old transaction
+    assert [x.amount for x in first_page + second_page] == [Decimal(3), Decimal(2), Decimal(1)]
+
+def test_get_not_found(repository, dock_account):
+    # Ensure an HTTP 404 error is raised for accounts without history
+    with pytest.raises(HTTPException) as exc:
+        repository.get(dock_account_id=dock_account.id)
+    assert exc.value.status_code == 404
+
+def test_insert_withdrawal_exceeds_limit(repository, dock_account, monkeypatch):
+    monkeypatch.setattr(get_settings(), "maximum_daily_limit", Decimal(100))
+    # Withdraw up to the daily limit, then over it
+    repository.insert(TransactionHistoryInterface(
+        dock_account=dock_account.id, type=TransactionType.withdrawal, amount=Decimal(100)
+    ))
+    with pytest.raises(HTTPException) as exc:
+        repository.insert(TransactionHistoryInterface(
+            dock_account=dock_account.id, type=TransactionType.withdrawal, amount=Decimal(1)
+        ))
+
+    # Validate the rejected withdrawal left the balance and the history untouched
+    assert exc.value.detail == "Daily withdrawal limit exceeded"
+    assert MemoryDockAccountRepository().get_by_id(_id=dock_account.id).balance == Decimal(900)
+    assert repository.daily_withdrawal_amount(dock_account_id=dock_account.id) == Decimal(100)
@@ -0,0 +1,78 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.database.models import db
+from app.database.models.dock_account import DockAccount
+from app.database.models.holder import Holder
+from app.database.models.transaction_history import TransactionHistory
+from app.interfaces.dock_account import DockAccountInterface
+from app.interfaces.enum import TransactionType
+from app.interfaces.holder import HolderInterface
+from app.interfaces.transaction_history import TransactionHistoryInterface
+from app.repositories.transaction_history_partition_repository import (
+    TransactionHistoryPartitionRepository, month_start
+)
+from app.utils.generator import account_number_allocator
+
+_holder_interface = HolderInterface(cpf="31746028580", name="Test Holder")
+_holder = Holder.create(**_holder_interface.model_dump())
+_dock_account_interface = DockAccountInterface(
+    holder=_holder.cpf,
+    number=account_number_allocator.allocate(),
+    agency="001"
+)
+_dock_account = DockAccount.create(**_dock_account_interface.model_dump())
+_partitions = ["transactionhistory_2000_01", "transactionhistory_2000_02",
+               "transactionhistory_2030_06", "transactionhistory_2030_07"]
+
+@pytest.fixture
+def repository():
+    return TransactionHistoryPartitionRepository()
+
+@pytest.fixture
+def setup_database():
+    # Drop the partitions created by the tests, attached or not, and their rows
+    yield  # Allow the test to run
+
+    TransactionHistory.delete().where(TransactionHistory.dock_account == _dock_account.id).execute()
+    for name in _partitions:
+        db.execute_sql(f'DROP TABLE IF EXISTS "{name}"')
+
+def test_month_start():
+    # Validate the month arithmetic across years
+    assert month_start(date(2024, 1, 31)) == date(2024, 1, 1)
+    assert month_start(date(2024, 1, 31), months=-1) == date(2023, 12, 1)
+    assert month_start(date(2024, 11, 15), months=3) == date(2025, 2, 1)
+
+def test_create_partitions_moves_default_rows(setup_database, repository):
+    # Insert a transaction of a month without partition, it lands in the default partition
+    transaction = TransactionHistoryInterface(
+        dock_account=_dock_account.id, type=TransactionType.deposit, amount=Decimal("10.0"),
+        created_at=datetime(2030, 6, 15)
+    )
+    TransactionHistory.create(**transaction.model_dump())
+
+    # Call the create_partitions method, twice to check existing partitions are skipped
+    created = repository.create_partitions(since=date(2030, 6, 1), until=date(2030, 7, 1))
+    created_again = repository.create_partitions(since=date(2030, 6, 1), until=date(2030, 7, 1))
+
+    # Validate the partitions were created and the row was moved to its month
+    assert created == ["transactionhistory_2030_06", "transactionhistory_2030_07"]
+    assert created_again == []
+    assert {date(2030, 6, 1), date(2030, 7, 1)} <= set(repository.get_partitions())
+    assert db.execute_sql('SELECT COUNT(*) FROM "transactionhistory_2030_06"').fetchone()[0] == 1
+    assert TransactionHistory.select().where(TransactionHistory.id == transaction.id).exists()
+
+def test_detach_partitions(setup_database, repository):
+    # Create two partitions older than any other one
+    repository.create_partitions(since=date(2000, 1, 1), until=date(2000, 2, 1))
+
+    # Call the detach_partitions method up to the end of the first one
+    detached = repository.detach_partitions(before=date(2000, 2, 1))
+
+    # Validate only the first partition was detached
+    assert detached == ["transactionhistory_2000_01"]
+    assert date(2000, 1, 1) not in repository.get_partitions()
+    assert date(2000, 2, 1) in repository.get_partitions()
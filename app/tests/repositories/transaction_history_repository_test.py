@@ -1,21 +1,28 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
 import pytest
 from fastapi import HTTPException
 
+from app.database.models import db
 from app.database.models.dock_account import DockAccount
 from app.database.models.holder import Holder
+from app.interfaces import BetweenDateFilter
 from app.interfaces.dock_account import DockAccountInterface
 from app.interfaces.holder import HolderInterface
+from app.repositories.transaction_history_partition_repository import month_start
 from app.repositories.transaction_history_repository import TransactionHistoryRepository
 from app.database.models.transaction_history import TransactionHistory
 from app.interfaces.transaction_history import TransactionHistoryInterface
 from app.interfaces.enum import TransactionType
+from app.utils.generator import account_number_allocator
 from decimal import Decimal
 
 _holder_interface = HolderInterface(cpf="43237036005", name="Test Holder")
 _holder = Holder.create(**_holder_interface.model_dump())
 _dock_account_interface = DockAccountInterface(
     holder=_holder.cpf,
-    number="123456789",
+    number=account_number_allocator.allocate(),
     agency="001",
     balance=Decimal("100.0")
 )
@@ -71,3 +78,89 @@ def test_get_by_id_not_found(setup_database, repository):
     # Validate the exception
     assert ex.value.status_code == 404
     assert ex.value.detail == "TransactionHistory not found"
+
+def test_insert_withdrawal_insufficient_balance(setup_database, repository, mock_transaction_history):
+    # Prepare a withdrawal bigger than the account balance
+    mock_transaction_history.type = TransactionType.withdrawal
+    mock_transaction_history.amount = DockAccount.get_by_id(_dock_account.id).balance + 1
+
+    # Call the insert method and expect an HTTPException
+    with pytest.raises(HTTPException) as ex:
+        repository.insert(mock_transaction_history)
+
+    # Validate the exception and that the history row was rolled back
+    assert ex.value.status_code == 422
+    assert ex.value.detail == "DockAccount has no sufficient balance"
+    assert not TransactionHistory.select().where(TransactionHistory.id == mock_transaction_history.id).exists()
+
+def captured_selects(call):
+    # Records the SELECT statements issued by a repository call
+    with patch.object(db, "execute_sql", wraps=db.execute_sql) as execute_sql:
+        call()
+    return [x.args for x in execute_sql.call_args_list if x.args[0].startswith("SELECT")]
+
+def explain(sql, params):
+    # Sequential scans are disabled so the tiny test table does not hide a missing index
+    db.execute_sql("ANALYZE transactionhistory")
+    with db.atomic():
+        db.execute_sql("SET LOCAL enable_seqscan = off")
+        plan = db.execute_sql(f"EXPLAIN {sql}", params).fetchall()
+    return "\n".join(x[0] for x in plan)
+
+def partition_indexes(index_name):
+    # Names of the per-partition indexes of a partitioned index
+    cursor = db.execute_sql("SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = %s::regclass",
+                            (index_name,))
+    return [x[0] for x in cursor.fetchall()]
+
+def test_get_uses_account_period_index(setup_database, repository, mock_transaction_history):
+    # Insert the transaction history to simulate an existing entry
+    TransactionHistory.create(**mock_transaction_history.model_dump())
+
+    # Capture the statement of a period filtered query
+    between_filter = BetweenDateFilter(start_date=datetime.now() - timedelta(days=1), end_date=datetime.now())
+    statements = captured_selects(
+        lambda: repository.get(dock_account_id=_dock_account.id, between_filter=between_filter)
+    )
+
+    # Validate the planner uses the (dock_account_id, created_at, id) index
+    plan = explain(*statements[0])
+    assert any(x in plan for x in partition_indexes("transactionhistory_dock_account_id_created_at_id"))
+
+def test_daily_withdrawal_amount_uses_withdrawal_index(setup_database, repository):
+    # Capture the statement of the daily withdrawal sum
+    statements = captured_selects(lambda: repository.daily_withdrawal_amount(dock_account_id=_dock_account.id))
+
+    # Validate the planner uses the partial withdrawal index
+    plan = explain(*statements[0])
+    assert any(x in plan for x in partition_indexes("transactionhistory_withdrawal_dock_account_id_created_at"))
+
+def test_get_prunes_partitions(setup_database, repository, mock_transaction_history):
+    # Insert the transaction history to simulate an existing entry
+    TransactionHistory.create(**mock_transaction_history.model_dump())
+
+    # Capture the statement of a query bounded to the current month
+    current_month = month_start(datetime.now().date())
+    between_filter = BetweenDateFilter(start_date=current_month, end_date=datetime.now())
+    statements = captured_selects(
+        lambda: repository.get(dock_account_id=_dock_account.id, between_filter=between_filter)
+    )
+
+    # Validate only the current month partition is scanned
+    plan = explain(*statements[0])
+    assert f"transactionhistory_{current_month:%Y_%m}" in plan
+    assert f"transactionhistory_{month_start(current_month, months=-1):%Y_%m}" not in plan
+    assert f"transactionhistory_{month_start(current_month, months=1):%Y_%m}" not in plan
+    assert "transactionhistory_default" not in plan
+
+def test_export_returns_the_connection_to_the_pool(setup_database, repository, mock_transaction_history):
+    # Insert the transaction history to simulate an existing entry
+    TransactionHistory.create(**mock_transaction_history.model_dump())
+    in_use = db.pool_stats()["in_use"]
+
+    # Call the export and read it to the end
+    rows = list(repository.export(dock_account_id=_dock_account.id))
+
+    # Validate the row is streamed and the pooled connection is given back
+    assert any(str(row[0]) == str(mock_transaction_history.id) for row in rows)
+    assert db.pool_stats()["in_use"] == in_use
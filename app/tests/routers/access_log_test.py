@@ -0,0 +1,36 @@
+import logging
+
+from fastapi.testclient import TestClient
+
+from app.config.settings import get_settings
+from app.http_server import app
+
+client = TestClient(app)
+
+def test_access_log_sampling(monkeypatch, caplog):
+    monkeypatch.setattr(get_settings(), "access_log_sample_rate", 0.0)
+
+    # Call a successful and a failed request with successful requests sampled out
+    with caplog.at_level(logging.INFO, logger="access"):
+        client.get("/metrics")
+        client.get("/holder/99999999999")
+
+    # Validate only the failed request was logged, with its route and error
+    records = [x for x in caplog.records if x.name == "access"]
+    assert len(records) == 1
+    assert records[0].fields["route"] == "/holder/{cpf}"
+    assert records[0].fields["status"] == 404
+    assert records[0].fields["error"] == "Holder not found"
+
+def test_access_log_invalid_consistency_token(caplog):
+    # Call a read with a malformed consistency token
+    with caplog.at_level(logging.INFO, logger="access"):
+        response = client.get("/metrics", headers={"X-Consistency-Token": "not-a-position"})
+
+    # Validate the rejection goes through the error handler and the access log
+    assert response.status_code == 422
+    assert response.json() == {"message": "Invalid consistency token"}
+    records = [x for x in caplog.records if x.name == "access"]
+    assert len(records) == 1
+    assert records[0].fields["status"] == 422
+    assert records[0].fields["error"] == "Invalid consistency token"
@@ -8,6 +8,7 @@ from decimal import Decimal
 
 from app.interfaces.enum import AccountStatus
 from app.interfaces.holder import HolderInterface
+from app.utils.generator import account_number_allocator
 
 client = TestClient(app)
 _holder_interface = HolderInterface(cpf="18038771036", name="Test Holder")
@@ -17,7 +18,7 @@ _holder = Holder.create(**_holder_interface.model_dump())
 def mock_dock_account():
     return DockAccountInterface(
         holder=_holder.id,
-        number="123456789",
+        number=account_number_allocator.allocate(),
         agency="001",
         balance=Decimal("100.0"),
     )
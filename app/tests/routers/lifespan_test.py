@@ -0,0 +1,14 @@
+from fastapi.testclient import TestClient
+
+from app.http_server import create_app
+from app.utils.metrics import worker_startup_time
+
+
+def test_lifespan_reports_startup_time():
+    # Start a new app, which runs its lifespan before serving
+    with TestClient(create_app()) as client:
+        response = client.get("/metrics")
+
+    # Validate the startup time was measured and exposed
+    assert worker_startup_time.value() > 0
+    assert "worker_startup_seconds " in response.text
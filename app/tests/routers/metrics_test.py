@@ -0,0 +1,19 @@
+from fastapi.testclient import TestClient
+
+from app.http_server import app
+from app.utils.metrics import http_requests
+
+client = TestClient(app)
+
+def test_metrics_by_route_template():
+    requests = http_requests.value(method="GET", route="/holder/{cpf}", status=404)
+
+    # Call an endpoint with a path parameter
+    client.get("/holder/99999999999")
+
+    # Validate the request was counted under its route template, not its raw path
+    assert http_requests.value(method="GET", route="/holder/{cpf}", status=404) == requests + 1
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'http_requests_total{method="GET",route="/holder/{cpf}",status="404"}' in response.text
+    assert "99999999999" not in response.text
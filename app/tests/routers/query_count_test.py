@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database.models.dock_account import DockAccount
+from app.database.models.holder import Holder
+from app.database.models.transaction_history import TransactionHistory
+from app.http_server import app
+from app.interfaces.dock_account import DockAccountInterface
+from app.interfaces.enum import TransactionType
+from app.interfaces.holder import HolderInterface
+from app.interfaces.transaction_history import TransactionHistoryInterface
+from app.tests.query_counter import assert_query_count
+from app.utils.generator import account_number_allocator
+
+# Statements run by each endpoint, with the caches empty. Listing rows must not add queries per row.
+
+client = TestClient(app)
+_holder_interface = HolderInterface(cpf="86288366757", name="Test Holder")
+_holder = Holder.create(**_holder_interface.model_dump())
+_dock_accounts = [
+    DockAccount.create(**DockAccountInterface(holder=_holder.cpf, number=account_number_allocator.allocate(),
+                                              agency="001", balance=Decimal("100.0")).model_dump())
+    for _ in range(3)
+]
+_dock_account = _dock_accounts[0]
+
+@pytest.fixture
+def setup_database():
+    # Give the account a few transactions and delete them after each test
+    for _ in range(5):
+        TransactionHistory.create(**TransactionHistoryInterface(
+            dock_account=_dock_account.id, type=TransactionType.deposit, amount=Decimal("1.0")
+        ).model_dump())
+
+    yield  # Allow the test to run
+
+    TransactionHistory.delete().where(TransactionHistory.dock_account == _dock_account.id).execute()
+
+def test_get_holder_query_count():
+    # Validate the holder is read with one query
+    with assert_query_count(1):
+        assert client.get(f"/holder/{_holder.cpf}").status_code == 200
+
+def test_db_queries_header():
+    # Validate the statements and their time are reported in the response
+    response = client.get(f"/holder/{_holder.cpf}")
+    assert response.headers["X-DB-Queries"] == "1"
+    assert float(response.headers["X-DB-Time"]) > 0
+
+def test_get_dock_accounts_query_count():
+    # Validate the holder accounts are read with one query, whatever their number
+    with assert_query_count(1):
+        response = client.get(f"/dock_account/{_holder.cpf}")
+    assert len(response.json()) == len(_dock_accounts)
+
+def test_get_dock_account_by_id_query_count():
+    # Validate the account is read with one query
+    with assert_query_count(1):
+        assert client.get(f"/dock_account/{_holder.cpf}/{_dock_account.id}").status_code == 200
+
+def test_get_transaction_history_query_count(setup_database):
+    # Validate the history is read with one query, whatever its size
+    with assert_query_count(1):
+        response = client.get(f"/transaction/{_dock_account.id}")
+    assert len(response.json()) == 5
+
+def test_create_transaction_history_query_count():
+    transaction = TransactionHistoryInterface(
+        dock_account=_dock_account.id, type=TransactionType.deposit, amount=Decimal("1.0")
+    )
+
+    # Validate a deposit reads the account, claims the transaction id, posts the balance and inserts the history row
+    with assert_query_count(4):
+        assert client.post("/transaction", json=transaction.model_dump(mode="json")).status_code == 201
+
+    TransactionHistory.delete().where(TransactionHistory.id == transaction.id).execute()
@@ -1,4 +1,5 @@
 import pytest
+from fastapi.encoders import jsonable_encoder
 from fastapi.testclient import TestClient
 
 from app.database.models.dock_account import DockAccount
@@ -9,6 +10,7 @@ from app.interfaces.dock_account import DockAccountInterface
 from app.interfaces.enum import TransactionType
 from app.interfaces.holder import HolderInterface
 from app.interfaces.transaction_history import TransactionHistoryInterface
+from app.utils.generator import account_number_allocator
 from decimal import Decimal
 
 client = TestClient(app)
@@ -16,7 +18,7 @@ _holder_interface = HolderInterface(cpf="98056698078", name="Test Holder")
 _holder = Holder.create(**_holder_interface.model_dump())
 _dock_account_interface = DockAccountInterface(
     holder=_holder.cpf,
-    number="123456789",
+    number=account_number_allocator.allocate(),
     agency="001",
     balance=Decimal("100.0")
 )
@@ -92,3 +94,13 @@ def test_create_transaction_history_invalid():
 
     # Validate the response
     assert response.status_code == 422
+
+def test_create_transaction_batch_success(setup_database, mock_transaction_history):
+    # Call the POST /transaction/batch endpoint
+    response = client.post("/transaction/batch", json=[jsonable_encoder(mock_transaction_history)])
+
+    # Validate the response
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["id"] == str(mock_transaction_history.id)
+    assert data[0]["status"] == "ACCEPTED"
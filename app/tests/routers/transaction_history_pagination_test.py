@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.http_server import app
+from app.interfaces.dock_account import DockAccountInterface
+from app.interfaces.enum import TransactionType
+from app.interfaces.holder import HolderInterface
+from app.interfaces.transaction_history import TransactionHistoryInterface
+from app.repositories import backend
+from app.utils.generator import account_number_allocator
+
+client = TestClient(app)
+
+@pytest.fixture(scope="module")
+def dock_account():
+    # An account with two transactions, a minute apart
+    holder = backend.holder_repository().insert(HolderInterface(cpf="73640281707", name="Test Holder"))
+    dock_account = backend.dock_account_repository().insert(DockAccountInterface(
+        holder=holder.cpf,
+        number=account_number_allocator.allocate(),
+        agency="001"
+    ))
+    created_at = datetime.now() - timedelta(minutes=2)
+    for amount in (Decimal("10.0"), Decimal("20.0")):
+        backend.transaction_history_repository().insert(TransactionHistoryInterface(
+            dock_account=dock_account.id, type=TransactionType.deposit, amount=amount, created_at=created_at
+        ))
+        created_at += timedelta(minutes=1)
+    return dock_account
+
+def test_get_transaction_history_paginated_success(dock_account):
+    # Call the GET /transaction/{dock_account_id} endpoint one transaction at a time
+    first_page = client.get(f"/transaction/{dock_account.id}", params={"limit": 1})
+
+    # Validate the first page holds the oldest transaction and points to the next one
+    assert first_page.status_code == 200
+    assert [Decimal(x["amount"]) for x in first_page.json()] == [Decimal("10.0")]
+    assert "X-Next-Cursor" in first_page.headers
+
+    # Call the endpoint again with the cursor
+    second_page = client.get(f"/transaction/{dock_account.id}",
+                             params={"limit": 1, "cursor": first_page.headers["X-Next-Cursor"]})
+
+    # Validate the second page holds the other transaction and is the last one
+    assert second_page.status_code == 200
+    assert [Decimal(x["amount"]) for x in second_page.json()] == [Decimal("20.0")]
+    assert second_page.json()[0]["id"] != first_page.json()[0]["id"]
+    assert "X-Next-Cursor" not in second_page.headers
+
+def test_get_transaction_history_invalid_cursor(dock_account):
+    # Call the GET /transaction/{dock_account_id} endpoint with a cursor the API did not issue
+    response = client.get(f"/transaction/{dock_account.id}", params={"cursor": "invalid"})
+
+    # Validate the response
+    assert response.status_code == 422
+    assert response.json()["message"] == "Invalid cursor"
@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+from app.config.settings import get_settings
+from app.database.executor import database_executor
+from app.database.models import db
+from app.services.database import DatabaseService
+
+pytestmark = pytest.mark.postgres
+
+@pytest.fixture
+def service():
+    return DatabaseService()
+
+def test_get_pool_stats(service):
+    # Run a query so the pool has at least one checkout
+    asyncio.run(database_executor.run(db.execute_sql, "SELECT 1"))
+
+    # Retrieve the pool statistics
+    stats = service.get_pool_stats()
+
+    # Validate the pool usage is reported
+    assert stats["max_connections"] == get_settings().database_max_connections
+    assert stats["checkouts"] >= 1
+    assert stats["in_use"] <= stats["max_connections"]
+    assert stats["timeouts"] == 0
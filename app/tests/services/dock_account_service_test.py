@@ -1,13 +1,17 @@
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
 import pytest
 from fastapi import HTTPException
 
 from app.services.dock_account import DockAccountService
-from app.repositories.dock_account_repository import DockAccountRepository
-from app.repositories.holder_repository import HolderRepository
+from app.repositories import backend
 from app.interfaces.dock_account import DockAccountInterface, UpdateDockAccountRequest
 from app.interfaces.holder import HolderInterface
-from app.interfaces.enum import AccountStatus
-from app.utils.generator import generate_random_account_number, generate_random_agency_number
+from app.interfaces.enum import AccountStatus, TransactionType
+from app.interfaces.transaction_history import TransactionHistoryInterface
+from app.utils.generator import account_number_allocator, generate_random_agency_number
 
 
 @pytest.fixture
@@ -16,21 +20,21 @@ def service():
 
 @pytest.fixture
 def dock_account_repository():
-    return DockAccountRepository()
+    return backend.dock_account_repository()
 
 @pytest.fixture
 def holder_repository():
-    return HolderRepository()
+    return backend.holder_repository()
 
 def test_get_dock_account(service, holder_repository):
     # Create a holder for testing
     holder = holder_repository.insert(HolderInterface(cpf="57057797044", name="Test Holder"))
 
     # Create accounts associated with the test Holder
-    service.create(cpf=holder.cpf)
-    service.create(cpf=holder.cpf)
+    asyncio.run(service.create(cpf=holder.cpf))
+    asyncio.run(service.create(cpf=holder.cpf))
     # Retrieve accounts associated with the provided CPF
-    accounts = service.get_dock_account(holder.cpf)
+    accounts = asyncio.run(service.get_dock_account(holder.cpf))
 
     # Verify accounts are returned and have the correct CPF
     assert accounts is not None
@@ -41,10 +45,10 @@ def test_get_dock_account_by_id(service, holder_repository):
     holder = holder_repository.insert(HolderInterface(cpf="40799678023", name="Test Holder"))
 
     # Create accounts associated with the test Holder
-    created_account = service.create(cpf=holder.cpf)
+    created_account = asyncio.run(service.create(cpf=holder.cpf))
 
     # Retrieve the account by ID
-    account = service.get_dock_account_by_id(holder.cpf, created_account.id)
+    account = asyncio.run(service.get_dock_account_by_id(holder.cpf, created_account.id))
 
     # Ensure the returned account matches the expected ID and CPF
     assert account is not None
@@ -56,7 +60,7 @@ def test_create_dock_account(service, holder_repository):
     holder = holder_repository.insert(HolderInterface(cpf="87561081090", name="Test Holder"))
 
     # Create a new account for the holder
-    account = service.create(holder.cpf)
+    account = asyncio.run(service.create(holder.cpf))
 
     # Verify the account was created with the correct details
     assert account is not None
@@ -69,13 +73,13 @@ def test_close_account(service, holder_repository):
     holder = holder_repository.insert(HolderInterface(cpf="18826761060", name="Test Holder"))
 
     # Create a new account for the holder
-    account = service.create(holder.cpf)
+    account = asyncio.run(service.create(holder.cpf))
 
     # Close the account
-    service.close(request=UpdateDockAccountRequest(id=str(account.id), cpf=holder.cpf))
+    asyncio.run(service.close(request=UpdateDockAccountRequest(id=str(account.id), cpf=holder.cpf)))
 
     # Verify the account status is updated to CLOSED
-    account = service.get_dock_account_by_id(holder.cpf, account.id)
+    account = asyncio.run(service.get_dock_account_by_id(holder.cpf, account.id))
     assert account.status == AccountStatus.closed
 
 def test_close_account_already_closed(service, dock_account_repository, holder_repository):
@@ -85,7 +89,7 @@ def test_close_account_already_closed(service, dock_account_repository, holder_r
     # Create a new account for the holder
     dock_account = DockAccountInterface(
             holder=holder.cpf,
-            number=generate_random_account_number(),
+            number=account_number_allocator.allocate(),
             agency=generate_random_agency_number(),
             status=AccountStatus.closed
     )
@@ -93,7 +97,7 @@ def test_close_account_already_closed(service, dock_account_repository, holder_r
 
     # Ensure an HTTP 422 error is raised for already closed accounts
     with pytest.raises(HTTPException) as exc:
-        service.close(request=UpdateDockAccountRequest(id=str(dock_account.id), cpf=holder.cpf))
+        asyncio.run(service.close(request=UpdateDockAccountRequest(id=str(dock_account.id), cpf=holder.cpf)))
     assert exc.value.status_code == 422
     assert "DockAccount is already closed" in exc.value.detail
 
@@ -102,10 +106,10 @@ def test_block_account(service, dock_account_repository, holder_repository):
     holder = holder_repository.insert(HolderInterface(cpf="99529026030", name="Test Holder"))
 
     # Create a new account for the holder
-    account = service.create(holder.cpf)
+    account = asyncio.run(service.create(holder.cpf))
 
     # Block the account
-    service.block(request=UpdateDockAccountRequest(id=str(account.id), cpf=holder.cpf))
+    asyncio.run(service.block(request=UpdateDockAccountRequest(id=str(account.id), cpf=holder.cpf)))
 
     # Verify the account status is updated to BLOCKED
     account = dock_account_repository.get_by_id(_id=account.id, holder=holder.cpf)
@@ -118,7 +122,7 @@ def test_block_account_already_blocked(service, dock_account_repository, holder_
     # Create a new account for the holder
     dock_account = DockAccountInterface(
             holder=holder.cpf,
-            number=generate_random_account_number(),
+            number=account_number_allocator.allocate(),
             agency=generate_random_agency_number(),
             status=AccountStatus.blocked
     )
@@ -126,7 +130,7 @@ def test_block_account_already_blocked(service, dock_account_repository, holder_
 
     # Ensure an HTTP 422 error is raised for already blocked accounts
     with pytest.raises(HTTPException) as exc:
-        service.block(request=UpdateDockAccountRequest(id=str(dock_account.id), cpf=holder.cpf))
+        asyncio.run(service.block(request=UpdateDockAccountRequest(id=str(dock_account.id), cpf=holder.cpf)))
     assert exc.value.status_code == 422
     assert "DockAccount is already blocked" in exc.value.detail
 
@@ -137,14 +141,14 @@ def test_unblock_account(service, dock_account_repository, holder_repository):
     # Create a new account for the holder
     dock_account = DockAccountInterface(
             holder=holder.cpf,
-            number=generate_random_account_number(),
+            number=account_number_allocator.allocate(),
             agency=generate_random_agency_number(),
             status=AccountStatus.blocked
     )
     dock_account_repository.insert(dock_account=dock_account)
 
     # Unblock the account
-    service.unblock(request=UpdateDockAccountRequest(id=str(dock_account.id), cpf=holder.cpf))
+    asyncio.run(service.unblock(request=UpdateDockAccountRequest(id=str(dock_account.id), cpf=holder.cpf)))
 
     # Verify the account status is updated to ACTIVE
     account = dock_account_repository.get_by_id(_id=dock_account.id, holder=holder.cpf)
@@ -157,7 +161,7 @@ def test_unblock_account_not_blocked(service, dock_account_repository, holder_re
     # Create a new account for the holder
     dock_account = DockAccountInterface(
             holder=holder.cpf,
-            number=generate_random_account_number(),
+            number=account_number_allocator.allocate(),
             agency=generate_random_agency_number(),
             status=AccountStatus.active
     )
@@ -165,7 +169,7 @@ def test_unblock_account_not_blocked(service, dock_account_repository, holder_re
 
     # Ensure an HTTP 422 error is raised for non-blocked accounts
     with pytest.raises(HTTPException) as exc:
-        service.unblock(request=UpdateDockAccountRequest(id=str(dock_account.id), cpf=holder.cpf))
+        asyncio.run(service.unblock(request=UpdateDockAccountRequest(id=str(dock_account.id), cpf=holder.cpf)))
     assert exc.value.status_code == 422
     assert "DockAccount is already unblocked" in exc.value.detail
 
@@ -175,6 +179,32 @@ def test_create_invalid_cpf(service):
 
     # Ensure an HTTP 404 error is raised for not found Holder
     with pytest.raises(HTTPException) as exc:
-        service.create(cpf)
+        asyncio.run(service.create(cpf))
     assert exc.value.status_code == 404
     assert "Holder not found" in exc.value.detail
+
+@pytest.mark.postgres
+def test_get_balance_at(service, holder_repository):
+    # Create a holder and an account with a deposit
+    holder = holder_repository.insert(HolderInterface(cpf="52998224725", name="Test Holder"))
+    dock_account = asyncio.run(service.create(cpf=holder.cpf))
+    before_deposit = datetime.now() - timedelta(seconds=1)
+    backend.transaction_history_repository().insert(TransactionHistoryInterface(
+        dock_account=dock_account.id, type=TransactionType.deposit, amount=Decimal("100.0")
+    ))
+
+    # Retrieve the balance before the deposit, after it and the current one
+    before = asyncio.run(service.get_balance(cpf=holder.cpf, _id=dock_account.id, at=before_deposit))
+    after = asyncio.run(service.get_balance(cpf=holder.cpf, _id=dock_account.id, at=datetime.now()))
+    current = asyncio.run(service.get_balance(cpf=holder.cpf, _id=dock_account.id))
+
+    # Ensure the balances are replayed from the history
+    assert before.balance == Decimal(0)
+    assert after.balance == Decimal("100.0")
+    assert current.balance == Decimal("100.0")
+
+def test_get_balance_not_found(service):
+    # Ensure an HTTP 404 error is raised for not found accounts
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(service.get_balance(cpf="52998224725", _id="00000000-0000-4000-8000-000000000000"))
+    assert exc.value.status_code == 404
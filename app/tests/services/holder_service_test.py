@@ -1,8 +1,13 @@
+import asyncio
+import io
+
 import pytest
 from fastapi import HTTPException
+from app.config.settings import get_settings
 from app.services.holder import HolderService
+from app.interfaces.enum import ImportFormat, ImportStatus
 from app.interfaces.holder import HolderInterface
-from app.repositories.holder_repository import HolderRepository
+from app.repositories import backend
 
 
 @pytest.fixture(scope="module")
@@ -11,14 +16,14 @@ def holder_service():
 
 @pytest.fixture(scope="module")
 def holder_repository():
-    return HolderRepository()
+    return backend.holder_repository()
 
 def test_get_holder_success(holder_service, holder_repository):
     # Prepare data in the database
     holder_repository.insert(HolderInterface(cpf="38233752029", name="Test User"))
 
     # Call the service method
-    result = holder_service.get_holder(cpf="38233752029")
+    result = asyncio.run(holder_service.get_holder(cpf="38233752029"))
 
     # Assert the result
     assert result.cpf == "38233752029"
@@ -28,7 +33,7 @@ def test_get_holder_not_found(holder_service):
     # Call the service method and assert the exception
     with pytest.raises(HTTPException) as exc_info:
         # Call the service method with a non-existing CPF
-        holder_service.get_holder(cpf="00000000000")
+        asyncio.run(holder_service.get_holder(cpf="00000000000"))
 
     assert exc_info.value.status_code == 404
     assert exc_info.value.detail == "Holder not found"
@@ -38,7 +43,7 @@ def test_create_holder_success(holder_service, holder_repository):
     holder = HolderInterface(cpf="802.337.610-12", name="Test User")
 
     # Call the service method
-    result = holder_service.create(holder=holder)
+    result = asyncio.run(holder_service.create(holder=holder))
 
     # Assert the result
     assert result.cpf == "80233761012"
@@ -50,7 +55,7 @@ def test_create_holder_invalid_cpf(holder_service):
 
     # Call the service method and assert the exception
     with pytest.raises(HTTPException) as exc_info:
-        holder_service.create(holder=holder)
+        asyncio.run(holder_service.create(holder=holder))
 
     assert exc_info.value.status_code == 422
     assert exc_info.value.detail == "Invalid CPF"
@@ -60,8 +65,47 @@ def test_deactivate_holder(holder_service, holder_repository):
     holder_repository.insert(HolderInterface(cpf="41762501007", name="Test User"))
 
     # Call the service method
-    holder_service.deactivate(cpf="41762501007")
+    asyncio.run(holder_service.deactivate(cpf="41762501007"))
 
-    holder = holder_service.get_holder(cpf="41762501007")
+    holder = asyncio.run(holder_service.get_holder(cpf="41762501007"))
     # Assert the result
-    assert holder.status == False
\ No newline at end of file
+    assert holder.status == False
+def test_import_holders(holder_service, holder_repository):
+    # Insert a holder that already exists and prepare a CSV upload
+    holder_repository.insert(HolderInterface(cpf="15409931327", name="Test User"))
+    upload = io.BytesIO(
+        "cpf,name,status\n"
+        "081.836.584-66,Test User,\n"
+        "11111111111,Test User,\n"
+        "08183658466,Test User,\n"
+        "15409931327,Test User,true\n"
+        "92941465456,,\n"
+        "92941465456,Test User,false\n".encode()
+    )
+
+    # Call the service method
+    results = asyncio.run(holder_service.import_holders(file=upload, import_format=ImportFormat.csv))
+
+    # Assert each row was reported and only the new valid holders were created
+    assert [(x.row, x.status, x.detail) for x in results] == [
+        (1, ImportStatus.accepted, None),
+        (2, ImportStatus.rejected, "Invalid CPF"),
+        (3, ImportStatus.rejected, "Duplicate CPF"),
+        (4, ImportStatus.rejected, "Holder already exists"),
+        (5, ImportStatus.rejected, "Invalid row"),
+        (6, ImportStatus.accepted, None),
+    ]
+    assert asyncio.run(holder_service.get_holder(cpf="08183658466")).name == "Test User"
+    assert asyncio.run(holder_service.get_holder(cpf="92941465456")).status == False
+
+def test_import_holders_size_exceeded(holder_service, monkeypatch):
+    monkeypatch.setattr(get_settings(), "maximum_import_size", 1)
+    # Prepare an NDJSON upload with more rows than allowed
+    upload = io.BytesIO(b'{"cpf": "18761160130", "name": "Test User"}\n{"cpf": "96674982636", "name": "Test User"}\n')
+
+    # Call the service method and assert the exception
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(holder_service.import_holders(file=upload, import_format=ImportFormat.ndjson))
+
+    assert exc_info.value.status_code == 422
+    assert exc_info.value.detail == "Import size exceeded"
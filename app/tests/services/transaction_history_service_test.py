@@ -1,3 +1,6 @@
+import asyncio
+import csv
+import json
 from datetime import datetime, timedelta
 from decimal import Decimal
 
@@ -5,16 +8,18 @@ import pytest
 from fastapi import HTTPException
 
 from app.config.settings import get_settings
+from app.database.models.balance_snapshot import BalanceSnapshot
+from app.database.models.dock_account import DockAccount
 from app.interfaces.holder import HolderInterface
-from app.repositories.holder_repository import HolderRepository
+from app.repositories import backend
 from app.services.transaction_history import TransactionHistoryService
-from app.repositories.transaction_history_repository import TransactionHistoryRepository
-from app.repositories.dock_account_repository import DockAccountRepository
 from app.interfaces.transaction_history import TransactionHistoryInterface
 from app.interfaces.dock_account import DockAccountInterface
-from app.interfaces.enum import TransactionType, AccountStatus
+from app.repositories.balance_snapshot_repository import BalanceSnapshotRepository
+from app.interfaces.enum import TransactionType, AccountStatus, TransactionStatus, ExportFormat
+from app.utils.generator import account_number_allocator
 
-holder_repository = HolderRepository()
+holder_repository = backend.holder_repository()
 _holder = holder_repository.insert(HolderInterface(cpf="80627244092", name="Test Holder"))
 
 @pytest.fixture
@@ -31,18 +36,18 @@ def service():
 
 @pytest.fixture
 def transaction_history_repository():
-    return TransactionHistoryRepository()
+    return backend.transaction_history_repository()
 
 @pytest.fixture
 def dock_account_repository():
-    return DockAccountRepository()
+    return backend.dock_account_repository()
 
 def test_get_transaction_history_by_account(service, transaction_history_repository, dock_account_repository, holder):
     # Create an account and transactions history entries
     dock_account = dock_account_repository.insert(DockAccountInterface(
         holder=holder.cpf,
         agency="0001",
-        number="123456",
+        number=account_number_allocator.allocate(),
         status=AccountStatus.active
     ))
     transaction_history_repository.insert(TransactionHistoryInterface(
@@ -57,19 +62,19 @@ def test_get_transaction_history_by_account(service, transaction_history_reposit
     ))
 
     # Retrieve transaction history for the account
-    history = service.get_transaction_history(dock_account_id=dock_account.id)
+    history = asyncio.run(service.get_transaction_history(dock_account_id=dock_account.id))
 
     # Verify the history contains the transactions
     assert history is not None
-    assert len(history) == 2
-    assert history[0].dock_account == dock_account.id
+    assert len(history.items) == 2
+    assert history.items[0].dock_account == dock_account.id
 
 def test_get_transaction_history_with_filters(service, transaction_history_repository, dock_account_repository, holder):
     # Create an account and transactions history entries
     dock_account = dock_account_repository.insert(DockAccountInterface(
         holder=holder.cpf,
         agency="0001",
-        number="123456",
+        number=account_number_allocator.allocate(),
         status=AccountStatus.active
     ))
     transaction_history_repository.insert(TransactionHistoryInterface(
@@ -85,23 +90,86 @@ def test_get_transaction_history_with_filters(service, transaction_history_repos
     ))
 
     # Retrieve transaction history for the account
-    history = service.get_transaction_history(
+    history = asyncio.run(service.get_transaction_history(
         dock_account_id=dock_account.id,
         start_date=datetime.now() - timedelta(days=1),
         end_date=datetime.now()
-    )
+    ))
 
     # Verify the history contains the transactions
     assert history is not None
-    assert len(history) == 1
-    assert history[0].dock_account == dock_account.id
+    assert len(history.items) == 1
+    assert history.items[0].dock_account == dock_account.id
+
+def test_get_transaction_history_paginated(service, transaction_history_repository, dock_account_repository, holder):
+    # Create an account and five transactions history entries
+    dock_account = dock_account_repository.insert(DockAccountInterface(
+        holder=holder.cpf,
+        agency="0001",
+        number=account_number_allocator.allocate(),
+        status=AccountStatus.active
+    ))
+    for amount in range(1, 6):
+        transaction_history_repository.insert(TransactionHistoryInterface(
+            dock_account=dock_account.id,
+            type=TransactionType.deposit,
+            amount=Decimal(amount),
+        ))
+
+    # Retrieve the history two transactions at a time
+    pages = [asyncio.run(service.get_transaction_history(dock_account_id=dock_account.id, limit=2))]
+    while pages[-1].next_cursor:
+        pages.append(asyncio.run(service.get_transaction_history(
+            dock_account_id=dock_account.id, limit=2, cursor=pages[-1].next_cursor
+        )))
+
+    # Verify every transaction is returned once, in order
+    assert [len(page.items) for page in pages] == [2, 2, 1]
+    assert [x.amount for page in pages for x in page.items] == [Decimal(x) for x in range(1, 6)]
+
+def test_get_transaction_history_invalid_cursor(service):
+    # Ensure an HTTP 422 error is raised for a cursor that was not issued by the API
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(service.get_transaction_history(
+            dock_account_id="acd3a4fe-d1db-4ae9-87cc-0cb7f2e3147a", cursor="invalid"
+        ))
+    assert exc.value.status_code == 422
+    assert "Invalid cursor" in exc.value.detail
+
+def test_export_transaction_history(service, transaction_history_repository, dock_account_repository, holder):
+    # Create an account and transactions history entries
+    dock_account = dock_account_repository.insert(DockAccountInterface(
+        holder=holder.cpf,
+        agency="0001",
+        number=account_number_allocator.allocate(),
+        status=AccountStatus.active
+    ))
+    for amount in (Decimal(100), Decimal(50)):
+        transaction_history_repository.insert(TransactionHistoryInterface(
+            dock_account=dock_account.id,
+            type=TransactionType.deposit,
+            amount=amount,
+        ))
+
+    # Export the history in both formats
+    ndjson = "".join(asyncio.run(service.export_transaction_history(
+        dock_account_id=dock_account.id, export_format=ExportFormat.ndjson
+    )))
+    csv_rows = list(csv.DictReader("".join(asyncio.run(service.export_transaction_history(
+        dock_account_id=dock_account.id, export_format=ExportFormat.csv
+    ))).splitlines()))
+
+    # Verify every transaction is exported in order
+    assert [Decimal(json.loads(x)["amount"]) for x in ndjson.splitlines()] == [Decimal(100), Decimal(50)]
+    assert [Decimal(x["amount"]) for x in csv_rows] == [Decimal(100), Decimal(50)]
+    assert all(x["dock_account"] == str(dock_account.id) for x in csv_rows)
 
 def test_create_transaction_deposit(service, transaction_history_repository, dock_account_repository, holder):
     # Create an account and prepare a valid deposit transaction
     dock_account = dock_account_repository.insert(DockAccountInterface(
         holder=holder.cpf,
         agency="0001",
-        number="123456",
+        number=account_number_allocator.allocate(),
         status=AccountStatus.active
     ))
     transaction = TransactionHistoryInterface(
@@ -111,7 +179,7 @@ def test_create_transaction_deposit(service, transaction_history_repository, doc
     )
 
     # Create the deposit transaction
-    created_transaction = service.create(transaction)
+    created_transaction = asyncio.run(service.create(transaction))
 
     # Verify the deposit transaction was created correctly
     assert created_transaction is not None
@@ -119,12 +187,38 @@ def test_create_transaction_deposit(service, transaction_history_repository, doc
     assert created_transaction.type == transaction.type
     assert created_transaction.amount == transaction.amount
 
+def test_create_transaction_duplicated_id(service, dock_account_repository, holder):
+    # Create an account and post a deposit
+    dock_account = dock_account_repository.insert(DockAccountInterface(
+        holder=holder.cpf,
+        agency="0001",
+        number=account_number_allocator.allocate(),
+        status=AccountStatus.active
+    ))
+    transaction = TransactionHistoryInterface(
+        dock_account=dock_account.id,
+        type=TransactionType.deposit,
+        amount=Decimal(200.0),
+    )
+    asyncio.run(service.create(transaction))
+
+    # Ensure an HTTP 422 error is raised for a retry of the same id, even with another created_at
+    retry = transaction.model_copy(update={"created_at": transaction.created_at + timedelta(seconds=1)})
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(service.create(retry))
+    assert exc.value.status_code == 422
+    assert "TransactionHistory already exists" in exc.value.detail
+
+    # Verify the deposit was posted once
+    assert dock_account_repository.get_by_id(_id=dock_account.id).balance == Decimal(200)
+    assert len(asyncio.run(service.get_transaction_history(dock_account_id=dock_account.id)).items) == 1
+
 def test_create_transaction_withdrawal(service, transaction_history_repository, dock_account_repository, holder):
     # Create an account with sufficient balance and prepare a withdrawal transaction
     dock_account = dock_account_repository.insert(DockAccountInterface(
         holder=holder.cpf,
         agency="0001",
-        number="123456",
+        number=account_number_allocator.allocate(),
         balance=Decimal(100.0),
         status=AccountStatus.active
     ))
@@ -135,7 +229,7 @@ def test_create_transaction_withdrawal(service, transaction_history_repository,
     )
 
     # Create the withdrawal transaction
-    created_transaction = service.create(transaction)
+    created_transaction = asyncio.run(service.create(transaction))
 
     # Verify the withdrawal transaction was created correctly
     assert created_transaction is not None
@@ -150,7 +244,7 @@ def test_create_transaction_withdrawal_insufficient_balance(
     dock_account = dock_account_repository.insert(DockAccountInterface(
         holder=holder.cpf,
         agency="0001",
-        number="123456",
+        number=account_number_allocator.allocate(),
         balance=Decimal(100.0),
         status=AccountStatus.active
     ))
@@ -162,7 +256,7 @@ def test_create_transaction_withdrawal_insufficient_balance(
 
     # Ensure an HTTP 422 error is raised for insufficient balance
     with pytest.raises(HTTPException) as exc:
-        service.create(transaction)
+        asyncio.run(service.create(transaction))
     assert exc.value.status_code == 422
     assert "DockAccount has no sufficient balance" in exc.value.detail
 
@@ -171,7 +265,7 @@ def test_create_transaction_withdrawal_negative_amount(service, dock_account_rep
     dock_account = dock_account_repository.insert(DockAccountInterface(
         holder=holder.cpf,
         agency="0001",
-        number="123456",
+        number=account_number_allocator.allocate(),
         balance=Decimal(100.0),
         status=AccountStatus.active
     ))
@@ -183,16 +277,39 @@ def test_create_transaction_withdrawal_negative_amount(service, dock_account_rep
 
     # Ensure an HTTP 422 error is raised for a negative amount
     with pytest.raises(HTTPException) as exc:
-        service.create(transaction)
+        asyncio.run(service.create(transaction))
     assert exc.value.status_code == 422
     assert "Invalid withdrawal amount" in exc.value.detail
 
+def test_create_transaction_deposit_invalid_amount(service, dock_account_repository, settings, holder, monkeypatch):
+    monkeypatch.setattr(settings, "write_behind_deposits", True)
+    # Create an account with a balance
+    dock_account = dock_account_repository.insert(DockAccountInterface(
+        holder=holder.cpf,
+        agency="0001",
+        number=account_number_allocator.allocate(),
+        balance=Decimal(100.0),
+        status=AccountStatus.active
+    ))
+
+    # Ensure an HTTP 422 error is raised for a zero and a negative deposit, written behind or not
+    for amount in (Decimal(0), Decimal(-150)):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(service.create(TransactionHistoryInterface(
+                dock_account=dock_account.id,
+                type=TransactionType.deposit,
+                amount=amount,
+            )))
+        assert exc.value.status_code == 422
+        assert exc.value.detail == "Invalid deposit amount"
+    assert dock_account_repository.get_by_id(_id=dock_account.id).balance == Decimal(100)
+
 def test_create_transaction_withdrawal_exceeds_limit(service, dock_account_repository, settings, holder):
     # Create an account and prepare a withdrawal transaction exceeding daily limit
     dock_account = dock_account_repository.insert(DockAccountInterface(
         holder=holder.cpf,
         agency="0001",
-        number="123456",
+        number=account_number_allocator.allocate(),
         balance=Decimal(10000.0),
         status=AccountStatus.active
     ))
@@ -204,6 +321,193 @@ def test_create_transaction_withdrawal_exceeds_limit(service, dock_account_repos
 
     # Ensure an HTTP 422 error is raised for exceeding daily limit
     with pytest.raises(HTTPException) as exc:
-        service.create(transaction)
+        asyncio.run(service.create(transaction))
     assert exc.value.status_code == 422
     assert "Daily withdrawal limit exceeded" in exc.value.detail
+
+def test_create_transaction_batch(service, dock_account_repository, holder):
+    # Create an account and prepare a batch with accepted and rejected transactions
+    dock_account = dock_account_repository.insert(DockAccountInterface(
+        holder=holder.cpf,
+        agency="0001",
+        number=account_number_allocator.allocate(),
+        balance=Decimal(100.0),
+        status=AccountStatus.active
+    ))
+    transactions = [
+        TransactionHistoryInterface(dock_account=dock_account.id, type=TransactionType.deposit, amount=Decimal(50)),
+        TransactionHistoryInterface(dock_account=dock_account.id, type=TransactionType.withdrawal, amount=Decimal(500)),
+        TransactionHistoryInterface(dock_account=dock_account.id, type=TransactionType.withdrawal, amount=Decimal(120)),
+    ]
+
+    # Create the batch
+    results = asyncio.run(service.create_batch(transactions))
+
+    # Verify each transaction has its own result and the balance was aggregated
+    assert [x.status for x in results] == [TransactionStatus.accepted, TransactionStatus.rejected,
+                                           TransactionStatus.accepted]
+    assert results[1].detail == "DockAccount has no sufficient balance"
+    assert dock_account_repository.get_by_id(_id=dock_account.id).balance == Decimal(30)
+    assert len(asyncio.run(service.get_transaction_history(dock_account_id=dock_account.id)).items) == 2
+
+def test_create_transaction_batch_backdated_withdrawal(service, dock_account_repository, settings, holder):
+    # Create an account and a batch using up today's limit, then withdrawing on the day before
+    dock_account = dock_account_repository.insert(DockAccountInterface(
+        holder=holder.cpf,
+        agency="0001",
+        number=account_number_allocator.allocate(),
+        balance=Decimal(10000.0),
+        status=AccountStatus.active
+    ))
+    yesterday = datetime.now() - timedelta(days=1)
+    transactions = [
+        TransactionHistoryInterface(dock_account=dock_account.id, type=TransactionType.withdrawal,
+                                    amount=settings.maximum_daily_limit),
+        TransactionHistoryInterface(dock_account=dock_account.id, type=TransactionType.withdrawal,
+                                    amount=Decimal(100), created_at=yesterday),
+    ]
+
+    # Create the batch
+    results = asyncio.run(service.create_batch(transactions))
+
+    # Verify the backdated withdrawal is checked against and counted in its own day
+    assert [x.status for x in results] == [TransactionStatus.accepted, TransactionStatus.accepted]
+    daily_withdrawal_repository = backend.daily_withdrawal_repository()
+    assert daily_withdrawal_repository.get_amount(dock_account_id=dock_account.id) == settings.maximum_daily_limit
+    assert daily_withdrawal_repository.get_amount(dock_account_id=dock_account.id, day=yesterday.date()) == 100
+
+def test_create_transaction_batch_stored_id(service, dock_account_repository, holder):
+    # Create an account with a deposit already posted, and a batch retrying it next to a new deposit
+    dock_account = dock_account_repository.insert(DockAccountInterface(
+        holder=holder.cpf,
+        agency="0001",
+        number=account_number_allocator.allocate(),
+        status=AccountStatus.active
+    ))
+    posted = TransactionHistoryInterface(dock_account=dock_account.id, type=TransactionType.deposit, amount=Decimal(50))
+    asyncio.run(service.create(posted))
+    transactions = [
+        posted.model_copy(update={"created_at": posted.created_at + timedelta(seconds=1)}),
+        TransactionHistoryInterface(dock_account=dock_account.id, type=TransactionType.deposit, amount=Decimal(20)),
+    ]
+
+    # Create the batch
+    results = asyncio.run(service.create_batch(transactions))
+
+    # Verify only the stored transaction is rejected and it is not posted again
+    assert [x.status for x in results] == [TransactionStatus.rejected, TransactionStatus.accepted]
+    assert results[0].detail == "TransactionHistory already exists"
+    assert dock_account_repository.get_by_id(_id=dock_account.id).balance == Decimal(70)
+
+def test_create_transaction_batch_invalid_amount(service, dock_account_repository, holder):
+    # Create an account and a batch with a negative deposit next to valid transactions
+    dock_account = dock_account_repository.insert(DockAccountInterface(
+        holder=holder.cpf,
+        agency="0001",
+        number=account_number_allocator.allocate(),
+        balance=Decimal(100.0),
+        status=AccountStatus.active
+    ))
+    transactions = [
+        TransactionHistoryInterface(dock_account=dock_account.id, type=TransactionType.deposit, amount=Decimal(-50)),
+        TransactionHistoryInterface(dock_account=dock_account.id, type=TransactionType.deposit, amount=Decimal(0)),
+        TransactionHistoryInterface(dock_account=dock_account.id, type=TransactionType.withdrawal, amount=Decimal(30)),
+    ]
+
+    # Create the batch
+    results = asyncio.run(service.create_batch(transactions))
+
+    # Verify the invalid deposits are rejected one by one and the rest of the batch is posted
+    assert [x.status for x in results] == [TransactionStatus.rejected, TransactionStatus.rejected,
+                                           TransactionStatus.accepted]
+    assert results[0].detail == results[1].detail == "Invalid deposit amount"
+    assert dock_account_repository.get_by_id(_id=dock_account.id).balance == Decimal(70)
+
+def test_create_transaction_write_behind_deposit(service, dock_account_repository, settings, holder, monkeypatch):
+    monkeypatch.setattr(settings, "write_behind_deposits", True)
+    # Create an account and deposit into it with write-behind posting
+    dock_account = dock_account_repository.insert(DockAccountInterface(
+        holder=holder.cpf,
+        agency="0001",
+        number=account_number_allocator.allocate(),
+        status=AccountStatus.active
+    ))
+    asyncio.run(service.create(TransactionHistoryInterface(
+        dock_account=dock_account.id,
+        type=TransactionType.deposit,
+        amount=Decimal(80),
+    )))
+
+    # Withdraw the whole deposit, whether the posting queue applied it yet or not
+    created_transaction = asyncio.run(service.create(TransactionHistoryInterface(
+        dock_account=dock_account.id,
+        type=TransactionType.withdrawal,
+        amount=Decimal(80),
+    )))
+
+    # Verify the withdrawal took the pending deposit into account
+    assert created_transaction.type == TransactionType.withdrawal
+    assert dock_account_repository.get_by_id(_id=dock_account.id).balance == Decimal(0)
+
+@pytest.mark.postgres
+def test_create_transaction_write_behind_deposit_blocked_account(
+        service, dock_account_repository, settings, holder, monkeypatch
+):
+    monkeypatch.setattr(settings, "write_behind_deposits", True)
+    # Create an account, cache it as active and block it behind the cache (as another worker would)
+    dock_account = dock_account_repository.insert(DockAccountInterface(
+        holder=holder.cpf,
+        agency="0001",
+        number=account_number_allocator.allocate(),
+        status=AccountStatus.active
+    ))
+    dock_account_repository.get_by_id(_id=dock_account.id)
+    DockAccount.update(status=AccountStatus.blocked.value).where(DockAccount.id == dock_account.id).execute()
+
+    # Ensure the deposit is rejected with an HTTP 422 error
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(service.create(TransactionHistoryInterface(
+            dock_account=dock_account.id,
+            type=TransactionType.deposit,
+            amount=Decimal(80),
+        )))
+    assert exc.value.status_code == 422
+    assert exc.value.detail == "DockAccount cannot make transactions"
+
+@pytest.mark.postgres
+def test_create_transaction_before_balance_snapshot(service, transaction_history_repository, dock_account_repository,
+                                                     holder):
+    # Create an account with a deposit yesterday and build the snapshots of yesterday
+    dock_account = dock_account_repository.insert(DockAccountInterface(
+        holder=holder.cpf,
+        agency="0001",
+        number=account_number_allocator.allocate(),
+        status=AccountStatus.active
+    ))
+    yesterday = datetime.now() - timedelta(days=1)
+    transaction_history_repository.insert(TransactionHistoryInterface(
+        dock_account=dock_account.id, type=TransactionType.deposit, amount=Decimal(100), created_at=yesterday
+    ))
+    BalanceSnapshotRepository().build(since=yesterday.date(), until=yesterday.date())
+    try:
+        # Ensure a deposit and a batch item dated on the snapshotted day are rejected
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(service.create(TransactionHistoryInterface(
+                dock_account=dock_account.id, type=TransactionType.deposit, amount=Decimal(50), created_at=yesterday
+            )))
+        assert exc.value.status_code == 422
+        assert exc.value.detail == "Transaction date is already closed"
+        results = asyncio.run(service.create_batch([
+            TransactionHistoryInterface(dock_account=dock_account.id, type=TransactionType.deposit,
+                                        amount=Decimal(50), created_at=yesterday),
+            TransactionHistoryInterface(dock_account=dock_account.id, type=TransactionType.deposit,
+                                        amount=Decimal(20)),
+        ]))
+        assert [x.status for x in results] == [TransactionStatus.rejected, TransactionStatus.accepted]
+        assert results[0].detail == "Transaction date is already closed"
+
+        # Verify yesterday's snapshot still matches the history
+        assert BalanceSnapshot.get(dock_account=dock_account.id, day=yesterday.date()).balance == Decimal(100)
+        assert dock_account_repository.get_by_id(_id=dock_account.id).balance == Decimal(120)
+    finally:
+        BalanceSnapshot.delete().where(BalanceSnapshot.day == yesterday.date()).execute()
@@ -0,0 +1,51 @@
+import time
+
+from app.utils.cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # Read "a" so "b" becomes the least recently used, then go over the size
+    cache.get("a")
+    cache.set("c", 3)
+
+    # Validate "b" was evicted
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_expires_entries():
+    cache = LRUCache(max_size=2, ttl=0.05)
+    cache.set("a", 1)
+
+    # Wait past the entry age
+    time.sleep(0.1)
+
+    # Validate the entry is gone and counted as a miss
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_invalidate_where():
+    cache = LRUCache(max_size=10, ttl=60)
+    cache.set("a", {"holder": "1"})
+    cache.set("b", {"holder": "2"})
+
+    # Call the invalidate_where method
+    cache.invalidate_where(lambda x: x["holder"] == "1")
+
+    # Validate only the matching entry was dropped
+    assert cache.get("a") is None
+    assert cache.get("b") == {"holder": "2"}
+
+def test_disabled_cache():
+    cache = LRUCache(max_size=10, ttl=60, enabled=False)
+
+    # Validate nothing is stored
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
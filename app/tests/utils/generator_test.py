@@ -0,0 +1,57 @@
+import pytest
+
+from app.utils.generator import (
+    AccountNumberAllocator, account_number_allocator, format_account_number, generate_cpf
+)
+from app.utils.validator import validate_cpfs
+
+
+def test_format_account_number():
+    # Validate the layout and the check digits of a formatted number
+    assert format_account_number(1) == "00-0000000001-01"
+    assert format_account_number(123456789012) == "12-3456789012-" + f"{123456789012 % 97:0>2d}"
+
+    # Validate values outside the 12 digits are refused
+    with pytest.raises(ValueError):
+        format_account_number(10 ** 12)
+
+def test_generate_cpf():
+    # Generate CPFs from a known one and a range of bases
+    cpfs = [generate_cpf(x) for x in range(123456000, 123457000)]
+
+    # Validate the check digits are the ones validate_cpf expects
+    assert generate_cpf(529982247) == "52998224725"
+    assert all(validate_cpfs(cpfs))
+
+def test_allocator_reserves_blocks():
+    reserved = []
+    def reserve(count):
+        start = len(reserved) * count + 1
+        reserved.append(count)
+        return list(range(start, start + count))
+
+    # Allocate more numbers than a block holds
+    allocator = AccountNumberAllocator(block_size=3, reserve=reserve)
+    numbers = [allocator.allocate() for _ in range(7)]
+
+    # Validate the numbers are distinct and only one reservation was made per block
+    assert len(set(numbers)) == 7
+    assert reserved == [3, 3, 3]
+
+def test_allocator_after_fork(monkeypatch):
+    allocator = AccountNumberAllocator(block_size=10, reserve=lambda count: list(range(1, count + 1)))
+    allocator.allocate()
+
+    # Simulate a forked worker, which must reserve its own block
+    monkeypatch.setattr("os.getpid", lambda: -1)
+    reserve_calls = []
+    monkeypatch.setattr(allocator, "_reserve", lambda count: reserve_calls.append(count) or [50])
+
+    # Validate the number comes from a new block
+    assert allocator.allocate() == format_account_number(50)
+    assert reserve_calls == [10]
+
+def test_account_number_allocator():
+    # Validate the numbers taken from the database sequence are distinct
+    numbers = [account_number_allocator.allocate() for _ in range(5)]
+    assert len(set(numbers)) == 5
@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from app.utils.metrics import MetricsRegistry
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+def test_counter_sums_threads(registry):
+    counter = registry.counter("jobs", "Jobs", ("kind",))
+
+    # Increment the counter from several threads
+    threads = [threading.Thread(target=lambda: [counter.inc(kind="a") for _ in range(1000)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Validate every increment was kept
+    assert counter.value(kind="a") == 4000
+    assert 'jobs_total{kind="a"} 4000' in registry.render()
+
+def test_histogram_render(registry):
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+
+    # Observe a value per bucket
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, route="/a/{id}")
+
+    # Validate the buckets are cumulative and upper bound inclusive
+    output = registry.render()
+    assert 'latency_seconds_bucket{route="/a/{id}",le="0.1"} 2' in output
+    assert 'latency_seconds_bucket{route="/a/{id}",le="1.0"} 3' in output
+    assert 'latency_seconds_bucket{route="/a/{id}",le="+Inf"} 4' in output
+    assert 'latency_seconds_sum{route="/a/{id}"} 2.65' in output
+    assert 'latency_seconds_count{route="/a/{id}"} 4' in output
+
+def test_wrong_labels(registry):
+    counter = registry.counter("jobs", "Jobs", ("kind",))
+
+    # Validate labels not declared are refused
+    with pytest.raises(ValueError):
+        counter.inc(other="a")
+
+def test_gauge_render(registry):
+    gauge = registry.gauge("startup_seconds", "Startup time")
+
+    # Set the gauge twice
+    gauge.set(2.5)
+    gauge.set(1.5)
+
+    # Validate only the last value is kept
+    assert gauge.value() == 1.5
+    assert "# TYPE startup_seconds gauge\nstartup_seconds 1.5" in registry.render()
@@ -0,0 +1,30 @@
+import json
+import logging
+import queue
+
+from app.utils.structured_logging import DeferredQueueHandler, JsonFormatter
+
+
+def test_json_formatter():
+    record = logging.LogRecord("access", logging.INFO, __file__, 1, "Request %s", ("finished",), None)
+    record.fields = {"status": 200}
+
+    # Call the format method
+    entry = json.loads(JsonFormatter().format(record))
+
+    # Validate the message and the fields are in the entry
+    assert entry["message"] == "Request finished"
+    assert entry["status"] == 200
+    assert entry["level"] == "INFO"
+
+def test_deferred_queue_handler_does_not_format():
+    log_queue = queue.SimpleQueue()
+    record = logging.LogRecord("access", logging.INFO, __file__, 1, "Request %s", ("finished",), None)
+
+    # Call the handler
+    DeferredQueueHandler(log_queue).handle(record)
+
+    # Validate the record was queued with its message still unformatted
+    queued = log_queue.get_nowait()
+    assert queued.msg == "Request %s"
+    assert queued.args == ("finished",)
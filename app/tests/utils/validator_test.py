@@ -0,0 +1,17 @@
+from app.utils.validator import validate_cpf, validate_cpfs
+
+
+def test_validate_cpfs():
+    cpfs = ["862.883.667-57", "86288366758", "11111111111", "123", "", "invalid_cpf", "80627244092"]
+
+    # Call validate_cpfs
+    result = validate_cpfs(cpfs)
+
+    # Validate the valid CPFs come back as digits, in order, and match the single CPF validation
+    assert result == ["86288366757", False, False, False, False, False, "80627244092"]
+    assert result == [validate_cpf(x) for x in cpfs]
+
+def test_validate_cpfs_empty():
+    # Validate an empty list and a list without candidates
+    assert validate_cpfs([]) == []
+    assert validate_cpfs(["00000000000"]) == [False]
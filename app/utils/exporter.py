@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+from itertools import islice
+from typing import Iterable, Iterator, Sequence
+
+
+def _chunks(rows: Iterable[tuple], chunk_size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+def _to_text(value) -> str:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+def to_ndjson(rows: Iterable[tuple], columns: Sequence[str], chunk_size: int = 1000) -> Iterator[str]:
+    """
+    Serializes rows as newline delimited JSON, one object per row.
+
+    Rows are written in chunks so a streaming response sends a few large writes instead of one per row.
+
+    :param rows: row tuples, in the order of `columns`
+    :param columns: name of each column, used as the object keys
+    :param chunk_size: number of rows per yielded chunk
+    :return: Iterator[str]: chunks of NDJSON lines
+    """
+    for chunk in _chunks(rows, chunk_size):
+        yield "".join(json.dumps(dict(zip(columns, map(_to_text, row)))) + "\n" for row in chunk)
+
+def to_csv(rows: Iterable[tuple], columns: Sequence[str], chunk_size: int = 1000) -> Iterator[str]:
+    """
+    Serializes rows as CSV with a header line.
+
+    :param rows: row tuples, in the order of `columns`
+    :param columns: name of each column, used as the header
+    :param chunk_size: number of rows per yielded chunk
+    :return: Iterator[str]: chunks of CSV lines
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for chunk in _chunks(rows, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([map(_to_text, row) for row in chunk])
+        yield buffer.getvalue()
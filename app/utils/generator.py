@@ -1,20 +1,72 @@
+import os
 import random
+import threading
+from collections import deque
+from typing import Callable, List, Optional
 
-def generate_random_account_number():
+from app.config.settings import get_settings
+from app.repositories.backend import dock_account_repository
+
+
+def format_account_number(value: int) -> str:
     """
-    Generates a random bank account number in the format `XX-YYYYYYYYYY-ZZ`.
+    Formats a sequence value as a bank account number in the format `XX-YYYYYYYYYY-ZZ`.
 
-    The generated account number follows this format:
-    - `XX`: A prefix consisting of two random digits.
-    - `YYYYYYYYYY`: The main part of the number, consisting of 10 random digits.
+    - `XX`: A prefix, the first two of the 12 digits of the value.
+    - `YYYYYYYYYY`: The main part of the number, the last 10 digits of the value.
     - `ZZ`: A check digit calculated as the modulo 97 of the concatenation of the prefix and the main part.
 
+    :param value: a number from 1 to 999999999999
     :return: str: The bank account number in the format `XX-YYYYYYYYYY-ZZ`.
     """
-    prefix = random.randint(10, 99)
-    number = random.randint(1000, 9999)
-    check = int((prefix * 1000) + number) % 97
-    return f"{prefix:0>2d}-{number:0>10d}-{check:0>2d}"
+    if not 0 < value < 10 ** 12:
+        raise ValueError(f"Account numbers have 12 digits, got {value}")
+    prefix, number = divmod(value, 10 ** 10)
+    return f"{prefix:0>2d}-{number:0>10d}-{value % 97:0>2d}"
+
+class AccountNumberAllocator:
+    """
+    Hands out account numbers from blocks reserved in the `dockaccount_number_seq` sequence (hi/lo style).
+
+    Each process reserves `block_size` sequence values in one round trip and serves the next numbers from
+    memory, so numbers are unique by construction without checking the table, and only one account in
+    `block_size` pays for a query. Values of a block left unused when the process stops are skipped.
+    """
+    def __init__(self, block_size: int, reserve: Optional[Callable[[int], List[int]]] = None):
+        """
+        :param block_size: sequence values reserved at a time
+        :param reserve: takes that many values from the sequence, the account repository by default
+        """
+        self._block_size = block_size
+        self._reserve = reserve or dock_account_repository().reserve_numbers
+        self._lock = threading.Lock()
+        self._numbers = deque()
+        self._pid = os.getpid()
+
+    def allocate(self) -> str:
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker must not serve the block of its parent
+                self._numbers.clear()
+                self._pid = os.getpid()
+            if not self._numbers:
+                self._numbers.extend(self._reserve(self._block_size))
+            return format_account_number(self._numbers.popleft())
+
+def generate_cpf(base: int) -> str:
+    """
+    Completes the first nine digits of a CPF with its check digits, as computed by `validate_cpf`.
+
+    :param base: the first nine digits, from 0 to 999999999 (sequences of a single repeated digit are
+        never valid CPFs)
+    :return: str: the 11 digits of the CPF
+    """
+    if not 0 <= base < 10 ** 9:
+        raise ValueError(f"CPFs have 9 digits before the check digits, got {base}")
+    digits = [int(x) for x in f"{base:0>9d}"]
+    d1 = sum(x * w for x, w in zip(digits, range(1, 10))) % 11 % 10
+    d2 = sum(x * w for x, w in zip(digits, range(9, 0, -1))) % 11 % 10
+    return f"{base:0>9d}{d1}{d2}"
 
 def generate_random_agency_number():
     """
@@ -26,3 +78,5 @@ def generate_random_agency_number():
     """
     return "{:0>4}".format(random.randint(0, 9999))
 
+
+account_number_allocator = AccountNumberAllocator(block_size=get_settings().account_number_block_size)
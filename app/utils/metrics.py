@@ -0,0 +1,193 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    """
+    Base of the metrics below. Each thread updates its own shard without locking, the shards are only
+    summed when the metrics are rendered. The lock is taken once per thread, when its shard is created.
+    """
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[dict] = []
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[x]) for x in self.labelnames)
+
+    def _snapshots(self) -> List[dict]:
+        with self._lock:
+            shards = list(self._shards)
+        return [x.copy() for x in shards]
+
+    def _labels(self, key: Tuple[str, ...], **extra) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.family} {self.documentation}"
+        yield f"# TYPE {self.family} {self.type}"
+
+    @property
+    def family(self) -> str:
+        return self.name
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    @property
+    def family(self) -> str:
+        # The text format names a counter after its sample
+        return f"{self.name}_total"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        shard = self._shard()
+        shard[key] = shard.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        return sum(x.get(key, 0) for x in self._snapshots())
+
+    def render(self) -> Iterator[str]:
+        yield from super().render()
+        totals = {}
+        for shard in self._snapshots():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0) + value
+        for key in sorted(totals):
+            yield f"{self.name}_total{self._labels(key)} {totals[key]}"
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        shard = self._shard()
+        # One count per bucket, one for +Inf, then the sum of the observed values
+        counts = shard.get(key)
+        if counts is None:
+            counts = shard[key] = [0] * (len(self._buckets) + 1) + [0.0]
+        counts[bisect_left(self._buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self) -> Iterator[str]:
+        yield from super().render()
+        totals = {}
+        for shard in self._snapshots():
+            for key, counts in shard.items():
+                total = totals.setdefault(key, [0] * len(counts))
+                for i, count in enumerate(counts):
+                    total[i] += count
+        for key in sorted(totals):
+            counts = totals[key]
+            cumulative = 0
+            for bound, count in zip(self._buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else str(bound)
+                yield f"{self.name}_bucket{self._labels(key, le=le)} {cumulative}"
+            yield f"{self.name}_sum{self._labels(key)} {counts[-1]}"
+            yield f"{self.name}_count{self._labels(key)} {cumulative}"
+
+
+class Gauge(_Metric):
+    """
+    A value that is set rather than added to. Sets are rare, the values are kept in one dictionary
+    under the lock instead of in shards.
+    """
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self) -> Iterator[str]:
+        yield from super().render()
+        with self._lock:
+            values = dict(self._values)
+        for key in sorted(values):
+            yield f"{self.name}{self._labels(key)} {values[key]}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        :return: every metric in the Prometheus text exposition format
+        """
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "http_requests", "HTTP requests by route template and status code", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+transactions_posted = registry.counter("transactions_posted", "Transactions posted by type", ("type",))
+withdrawals_rejected = registry.counter("withdrawals_rejected", "Withdrawals rejected by reason", ("reason",))
+dock_account_status_changes = registry.counter(
+    "dock_account_status_changes", "Accounts blocked or closed", ("status",)
+)
+worker_startup_time = registry.gauge(
+    "worker_startup_seconds", "Time from the import of the app to the worker being ready to serve requests"
+)
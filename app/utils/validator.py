@@ -1,11 +1,20 @@
 import re
+from datetime import date
 from decimal import Decimal
+from itertools import repeat
+from operator import add, and_, eq, mod, mul
+from typing import Iterable, List, Optional, Sequence
 
 from fastapi import HTTPException
 
 from app.config.settings import get_settings
 from app.interfaces.dock_account import DockAccountInterface
-from app.repositories.transaction_history_repository import TransactionHistoryRepository
+from app.repositories.backend import daily_withdrawal_repository
+from app.utils.metrics import withdrawals_rejected
+
+_NON_DIGITS = re.compile("[^0-9]")
+# Maps the ASCII digits to their values
+_DIGIT_VALUES = bytes.maketrans(b"0123456789", bytes(range(10)))
 
 
 def validate_cpf(cpf: str) -> bool | str:
@@ -13,31 +22,59 @@ def validate_cpf(cpf: str) -> bool | str:
     Validates if a CPF is valid or not.
 
     :param cpf: CPF in string format (with or without punctuation)
-    :return: True if the CPF is valid, False otherwise
+    :return: the CPF digits if the CPF is valid, False otherwise
+    """
+    return validate_cpfs([cpf])[0]
+
+def validate_cpfs(cpfs: Sequence[str]) -> List[bool | str]:
     """
-    # Remove non-numeric characters
-    cpf = re.sub("[^0-9]","", cpf)
+    Validates many CPFs at once. The check digits are computed column by column (one column per digit
+    position, holding that digit of every CPF) with `map` over the columns, so the arithmetic runs in C
+    instead of once per character of each CPF.
 
-    # Check if the CPF has 11 digits or is a repeated sequence
-    if len(cpf) != 11 or cpf == cpf[0] * 11:
-        return False
+    :param cpfs: CPFs in string format (with or without punctuation)
+    :return: for each CPF, in order, its digits if it is valid, False otherwise
+    """
+    # Remove non-numeric characters, then keep the CPFs with 11 digits that are not a repeated sequence
+    cleaned = [_NON_DIGITS.sub("", x) for x in cpfs]
+    candidates = [i for i, x in enumerate(cleaned) if len(x) == 11 and x.count(x[0]) != 11]
+    results: List[bool | str] = [False] * len(cpfs)
+    if not candidates:
+        return results
+
+    # One column of digit values per position
+    columns = list(zip(*(cleaned[i].encode().translate(_DIGIT_VALUES) for i in candidates)))
 
-    # Calculate the CPF digits
-    calc = [i for i in range(1, 10)]
-    d1 = (sum([int(a) * b for a, b in zip(cpf[:-2], calc)]) % 11) % 10
-    d2 = (sum([int(a) * b for a, b in zip(reversed(cpf[:-2]), calc)]) % 11) % 10
+    # Calculate the CPF digits, the second one weights the first nine digits in reverse
+    d1 = _check_digits(columns[:9], weights=range(1, 10))
+    d2 = _check_digits(columns[:9], weights=range(9, 0, -1))
 
     # Check if the calculated digits match the given ones
-    if str(d1) == cpf[-2] and str(d2) == cpf[-1]:
-        return cpf
-    return False
+    for i, valid in zip(candidates, map(and_, map(eq, d1, columns[9]), map(eq, d2, columns[10]))):
+        if valid:
+            results[i] = cleaned[i]
+    return results
+
+def _check_digits(columns: Sequence[Sequence[int]], weights: Iterable[int]) -> List[int]:
+    sums = [0] * len(columns[0])
+    for column, weight in zip(columns, weights):
+        sums = list(map(add, sums, map(mul, column, repeat(weight))))
+    return list(map(mod, map(mod, sums, repeat(11)), repeat(10)))
 
-def withdrawal_validation(dock_account: DockAccountInterface, amount: Decimal):
+def withdrawal_validation(
+        dock_account: DockAccountInterface,
+        amount: Decimal,
+        daily_withdrawal_amount: Optional[Decimal] = None,
+        day: Optional[date] = None
+):
     """
     Validates if a withdrawal can be done to a particular account.
 
     :param dock_account: Dock digital account info
     :param amount: amount to withdraw from the account
+    :param daily_withdrawal_amount: amount already withdrawn on the day of the withdrawal, looked up when not
+        informed
+    :param day: day of the withdrawal, today when not informed
     """
     def validate_amount():
         """
@@ -56,15 +93,20 @@ def withdrawal_validation(dock_account: DockAccountInterface, amount: Decimal):
         Validates if the daily withdrawal limit has been exceeded.
         """
         _settings = get_settings()
-        _repository = TransactionHistoryRepository()
-        daily_withdrawal_amount = _repository.daily_withdrawal_amount(dock_account_id=dock_account.id)
-        return _settings.maximum_daily_limit >= (daily_withdrawal_amount + amount)
+        withdrawn_today = daily_withdrawal_amount
+        if withdrawn_today is None:
+            _repository = daily_withdrawal_repository()
+            withdrawn_today = _repository.get_amount(dock_account_id=dock_account.id, day=day)
+        return _settings.maximum_daily_limit >= (withdrawn_today + amount)
 
     if not validate_amount():
+        withdrawals_rejected.inc(reason="amount")
         raise HTTPException(status_code=422, detail="Invalid withdrawal amount")
 
     if not validate_balance():
+        withdrawals_rejected.inc(reason="balance")
         raise HTTPException(status_code=422, detail="DockAccount has no sufficient balance")
 
     if not validate_daily_limit():
+        withdrawals_rejected.inc(reason="daily_limit")
         raise HTTPException(status_code=422, detail="Daily withdrawal limit exceeded")
@@ -0,0 +1,68 @@
+# auto-generated snapshot
+from peewee import *
+import datetime
+import peewee
+
+
+snapshot = Snapshot()
+
+
+@snapshot.append
+class Holder(peewee.Model):
+    cpf = CharField(max_length=255, primary_key=True, unique=True)
+    name = CharField(max_length=255)
+    status = BooleanField(default=True)
+    class Meta:
+        table_name = "holder"
+
+
+@snapshot.append
+class DockAccount(peewee.Model):
+    id = UUIDField(primary_key=True, unique=True)
+    holder = snapshot.ForeignKeyField(backref='accounts', index=True, model='holder')
+    number = CharField(max_length=255)
+    agency = CharField(max_length=255)
+    balance = DecimalField(auto_round=False, constraints=[SQL('CHECK (balance >= 0)')], decimal_places=5, max_digits=10, rounding='ROUND_HALF_EVEN')
+    created_at = DateTimeField(default=datetime.datetime.now)
+    updated_at = DateTimeField(null=True)
+    status = CharField(default='ACTIVE', max_length=255)
+    class Meta:
+        table_name = "dockaccount"
+
+
+@snapshot.append
+class BalanceSnapshot(peewee.Model):
+    dock_account = snapshot.ForeignKeyField(backref='balance_snapshots', index=True, model='dockaccount')
+    day = DateField()
+    balance = DecimalField(auto_round=False, decimal_places=5, max_digits=10, rounding='ROUND_HALF_EVEN')
+    class Meta:
+        table_name = "balancesnapshot"
+        primary_key = peewee.CompositeKey('dock_account', 'day')
+
+
+@snapshot.append
+class DailyWithdrawal(peewee.Model):
+    dock_account = snapshot.ForeignKeyField(backref='daily_withdrawals', index=True, model='dockaccount')
+    day = DateField()
+    amount = DecimalField(auto_round=False, decimal_places=5, default=0, max_digits=10, rounding='ROUND_HALF_EVEN')
+    class Meta:
+        table_name = "dailywithdrawal"
+        primary_key = peewee.CompositeKey('dock_account', 'day')
+
+
+@snapshot.append
+class TransactionHistory(peewee.Model):
+    id = UUIDField(primary_key=True, unique=True)
+    dock_account = snapshot.ForeignKeyField(backref='transactions', index=True, model='dockaccount')
+    type = CharField(max_length=255)
+    amount = DecimalField(auto_round=False, decimal_places=5, max_digits=10, rounding='ROUND_HALF_EVEN')
+    created_at = DateTimeField(default=datetime.datetime.now)
+    class Meta:
+        table_name = "transactionhistory"
+        indexes = (
+            peewee.Index(name='transactionhistory_dock_account_id_created_at_id', table=peewee.Table(name='transactionhistory'), expressions=[peewee.Column(peewee.Table(name='transactionhistory'), 'dock_account_id'), peewee.Column(peewee.Table(name='transactionhistory'), 'created_at'), peewee.Column(peewee.Table(name='transactionhistory'), 'id')], safe=True),
+            peewee.Index(name='transactionhistory_withdrawal_dock_account_id_created_at', table=peewee.Table(name='transactionhistory'), expressions=[peewee.Column(peewee.Table(name='transactionhistory'), 'dock_account_id'), peewee.Column(peewee.Table(name='transactionhistory'), 'created_at'), peewee.Column(peewee.Table(name='transactionhistory'), 'amount')], safe=True, where=peewee.Expression(peewee.Column(peewee.Table(name='transactionhistory'), 'type'), '=', 'WITHDRAWAL')),
+            )
+
+
+
@@ -0,0 +1,156 @@
+# auto-generated snapshot
+from peewee import *
+import datetime
+import peewee
+
+
+snapshot = Snapshot()
+
+
+@snapshot.append
+class Holder(peewee.Model):
+    cpf = CharField(max_length=255, primary_key=True, unique=True)
+    name = CharField(max_length=255)
+    status = BooleanField(default=True)
+    class Meta:
+        table_name = "holder"
+
+
+@snapshot.append
+class DockAccount(peewee.Model):
+    id = UUIDField(primary_key=True, unique=True)
+    holder = snapshot.ForeignKeyField(backref='accounts', index=True, model='holder')
+    number = CharField(max_length=255)
+    agency = CharField(max_length=255)
+    balance = DecimalField(auto_round=False, constraints=[SQL('CHECK (balance >= 0)')], decimal_places=5, max_digits=10, rounding='ROUND_HALF_EVEN')
+    created_at = DateTimeField(default=datetime.datetime.now)
+    updated_at = DateTimeField(null=True)
+    status = CharField(default='ACTIVE', max_length=255)
+    class Meta:
+        table_name = "dockaccount"
+
+
+@snapshot.append
+class BalanceSnapshot(peewee.Model):
+    dock_account = snapshot.ForeignKeyField(backref='balance_snapshots', index=True, model='dockaccount')
+    day = DateField()
+    balance = DecimalField(auto_round=False, decimal_places=5, max_digits=10, rounding='ROUND_HALF_EVEN')
+    class Meta:
+        table_name = "balancesnapshot"
+        primary_key = peewee.CompositeKey('dock_account', 'day')
+
+
+@snapshot.append
+class DailyWithdrawal(peewee.Model):
+    dock_account = snapshot.ForeignKeyField(backref='daily_withdrawals', index=True, model='dockaccount')
+    day = DateField()
+    amount = DecimalField(auto_round=False, decimal_places=5, default=0, max_digits=10, rounding='ROUND_HALF_EVEN')
+    class Meta:
+        table_name = "dailywithdrawal"
+        primary_key = peewee.CompositeKey('dock_account', 'day')
+
+
+@snapshot.append
+class TransactionHistory(peewee.Model):
+    id = UUIDField()
+    dock_account = snapshot.ForeignKeyField(backref='transactions', index=True, model='dockaccount')
+    type = CharField(max_length=255)
+    amount = DecimalField(auto_round=False, decimal_places=5, max_digits=10, rounding='ROUND_HALF_EVEN')
+    created_at = DateTimeField(default=datetime.datetime.now)
+    class Meta:
+        table_name = "transactionhistory"
+        indexes = (
+            peewee.Index(name='transactionhistory_dock_account_id_created_at_id', table=peewee.Table(name='transactionhistory'), expressions=[peewee.Column(peewee.Table(name='transactionhistory'), 'dock_account_id'), peewee.Column(peewee.Table(name='transactionhistory'), 'created_at'), peewee.Column(peewee.Table(name='transactionhistory'), 'id')], safe=True),
+            peewee.Index(name='transactionhistory_withdrawal_dock_account_id_created_at', table=peewee.Table(name='transactionhistory'), expressions=[peewee.Column(peewee.Table(name='transactionhistory'), 'dock_account_id'), peewee.Column(peewee.Table(name='transactionhistory'), 'created_at'), peewee.Column(peewee.Table(name='transactionhistory'), 'amount')], safe=True, where=peewee.Expression(peewee.Column(peewee.Table(name='transactionhistory'), 'type'), '=', 'WITHDRAWAL')),
+            )
+        primary_key = peewee.CompositeKey('id', 'created_at')
+
+
+
+
+
+def migrate_forward(op, old_orm, new_orm):
+    # Converts transactionhistory into a table range partitioned by month on created_at. The DO block
+    # runs as a single statement, so the conversion is atomic even with `pem migrate --autocommit`.
+    # Monthly partitions are created from the oldest row up to 3 months ahead, afterwards they are kept
+    # by the maintain_transaction_history_partitions job.
+    op.sql("""
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    ALTER TABLE "transactionhistory" RENAME TO "transactionhistory_unpartitioned";
+    ALTER TABLE "transactionhistory_unpartitioned"
+        RENAME CONSTRAINT "transactionhistory_pkey" TO "transactionhistory_unpartitioned_pkey";
+
+    CREATE TABLE "transactionhistory" (
+        "id" UUID NOT NULL,
+        "dock_account_id" UUID NOT NULL,
+        "type" VARCHAR(255) NOT NULL,
+        "amount" NUMERIC(10, 5) NOT NULL,
+        "created_at" TIMESTAMP NOT NULL,
+        PRIMARY KEY ("id", "created_at"),
+        FOREIGN KEY ("dock_account_id") REFERENCES "dockaccount" ("id")
+    ) PARTITION BY RANGE ("created_at");
+    CREATE TABLE "transactionhistory_default" PARTITION OF "transactionhistory" DEFAULT;
+
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE((SELECT MIN("created_at") FROM "transactionhistory_unpartitioned"),
+                                         LOCALTIMESTAMP)),
+            date_trunc('month', LOCALTIMESTAMP) + INTERVAL '3 months',
+            INTERVAL '1 month'
+        )::date
+    LOOP
+        EXECUTE 'CREATE TABLE ' || quote_ident('transactionhistory_' || to_char(month, 'YYYY_MM'))
+             || ' PARTITION OF "transactionhistory" FOR VALUES FROM (' || quote_literal(month)
+             || ') TO (' || quote_literal((month + INTERVAL '1 month')::date) || ')';
+    END LOOP;
+
+    INSERT INTO "transactionhistory" ("id", "dock_account_id", "type", "amount", "created_at")
+    SELECT "id", "dock_account_id", "type", "amount", "created_at" FROM "transactionhistory_unpartitioned";
+    DROP TABLE "transactionhistory_unpartitioned";
+
+    CREATE INDEX "transactionhistory_dock_account_id" ON "transactionhistory" ("dock_account_id");
+    CREATE INDEX "transactionhistory_dock_account_id_created_at_id"
+        ON "transactionhistory" ("dock_account_id", "created_at", "id");
+    CREATE INDEX "transactionhistory_withdrawal_dock_account_id_created_at"
+        ON "transactionhistory" ("dock_account_id", "created_at", "amount") WHERE ("type" = 'WITHDRAWAL');
+END
+$$
+""")
+
+
+def migrate_backward(op, old_orm, new_orm):
+    # Moves the rows of every attached partition back into a single table
+    op.sql("""
+DO $$
+BEGIN
+    ALTER TABLE "transactionhistory" RENAME TO "transactionhistory_partitioned";
+    ALTER INDEX "transactionhistory_pkey" RENAME TO "transactionhistory_partitioned_pkey";
+    ALTER INDEX "transactionhistory_dock_account_id" RENAME TO "transactionhistory_partitioned_dock_account_id";
+    ALTER INDEX "transactionhistory_dock_account_id_created_at_id"
+        RENAME TO "transactionhistory_partitioned_dock_account_id_created_at_id";
+    ALTER INDEX "transactionhistory_withdrawal_dock_account_id_created_at"
+        RENAME TO "transactionhistory_partitioned_withdrawal_dock_account_id_created_at";
+
+    CREATE TABLE "transactionhistory" (
+        "id" UUID NOT NULL PRIMARY KEY,
+        "dock_account_id" UUID NOT NULL,
+        "type" VARCHAR(255) NOT NULL,
+        "amount" NUMERIC(10, 5) NOT NULL,
+        "created_at" TIMESTAMP NOT NULL,
+        FOREIGN KEY ("dock_account_id") REFERENCES "dockaccount" ("id")
+    );
+    INSERT INTO "transactionhistory" ("id", "dock_account_id", "type", "amount", "created_at")
+    SELECT "id", "dock_account_id", "type", "amount", "created_at" FROM "transactionhistory_partitioned";
+    DROP TABLE "transactionhistory_partitioned";
+
+    CREATE INDEX "transactionhistory_dock_account_id" ON "transactionhistory" ("dock_account_id");
+    CREATE INDEX "transactionhistory_dock_account_id_created_at_id"
+        ON "transactionhistory" ("dock_account_id", "created_at", "id");
+    CREATE INDEX "transactionhistory_withdrawal_dock_account_id_created_at"
+        ON "transactionhistory" ("dock_account_id", "created_at", "amount") WHERE ("type" = 'WITHDRAWAL');
+END
+$$
+""")
@@ -0,0 +1,112 @@
+# auto-generated snapshot
+from peewee import *
+import datetime
+import peewee
+
+
+snapshot = Snapshot()
+
+
+@snapshot.append
+class Holder(peewee.Model):
+    cpf = CharField(max_length=255, primary_key=True, unique=True)
+    name = CharField(max_length=255)
+    status = BooleanField(default=True)
+    class Meta:
+        table_name = "holder"
+
+
+@snapshot.append
+class DockAccount(peewee.Model):
+    id = UUIDField(primary_key=True, unique=True)
+    holder = snapshot.ForeignKeyField(backref='accounts', index=True, model='holder')
+    number = CharField(max_length=255)
+    agency = CharField(max_length=255)
+    balance = DecimalField(auto_round=False, constraints=[SQL('CHECK (balance >= 0)')], decimal_places=5, max_digits=10, rounding='ROUND_HALF_EVEN')
+    created_at = DateTimeField(default=datetime.datetime.now)
+    updated_at = DateTimeField(null=True)
+    status = CharField(default='ACTIVE', max_length=255)
+    class Meta:
+        table_name = "dockaccount"
+        indexes = (
+            (('agency', 'number'), True),
+            )
+
+
+@snapshot.append
+class BalanceSnapshot(peewee.Model):
+    dock_account = snapshot.ForeignKeyField(backref='balance_snapshots', index=True, model='dockaccount')
+    day = DateField()
+    balance = DecimalField(auto_round=False, decimal_places=5, max_digits=10, rounding='ROUND_HALF_EVEN')
+    class Meta:
+        table_name = "balancesnapshot"
+        primary_key = peewee.CompositeKey('dock_account', 'day')
+
+
+@snapshot.append
+class DailyWithdrawal(peewee.Model):
+    dock_account = snapshot.ForeignKeyField(backref='daily_withdrawals', index=True, model='dockaccount')
+    day = DateField()
+    amount = DecimalField(auto_round=False, decimal_places=5, default=0, max_digits=10, rounding='ROUND_HALF_EVEN')
+    class Meta:
+        table_name = "dailywithdrawal"
+        primary_key = peewee.CompositeKey('dock_account', 'day')
+
+
+@snapshot.append
+class PendingBalanceDelta(peewee.Model):
+    id = UUIDField(primary_key=True)
+    dock_account = snapshot.ForeignKeyField(backref='pending_balance_deltas', index=True, model='dockaccount')
+    amount = DecimalField(auto_round=False, decimal_places=5, max_digits=10, rounding='ROUND_HALF_EVEN')
+    created_at = DateTimeField(default=datetime.datetime.now)
+    class Meta:
+        table_name = "pendingbalancedelta"
+
+
+@snapshot.append
+class TransactionHistory(peewee.Model):
+    id = UUIDField()
+    dock_account = snapshot.ForeignKeyField(backref='transactions', index=True, model='dockaccount')
+    type = CharField(max_length=255)
+    amount = DecimalField(auto_round=False, decimal_places=5, max_digits=10, rounding='ROUND_HALF_EVEN')
+    created_at = DateTimeField(default=datetime.datetime.now)
+    class Meta:
+        table_name = "transactionhistory"
+        indexes = (
+            peewee.Index(name='transactionhistory_dock_account_id_created_at_id', table=peewee.Table(name='transactionhistory'), expressions=[peewee.Column(peewee.Table(name='transactionhistory'), 'dock_account_id'), peewee.Column(peewee.Table(name='transactionhistory'), 'created_at'), peewee.Column(peewee.Table(name='transactionhistory'), 'id')], safe=True),
+            peewee.Index(name='transactionhistory_withdrawal_dock_account_id_created_at', table=peewee.Table(name='transactionhistory'), expressions=[peewee.Column(peewee.Table(name='transactionhistory'), 'dock_account_id'), peewee.Column(peewee.Table(name='transactionhistory'), 'created_at'), peewee.Column(peewee.Table(name='transactionhistory'), 'amount')], safe=True, where=peewee.Expression(peewee.Column(peewee.Table(name='transactionhistory'), 'type'), '=', 'WITHDRAWAL')),
+            )
+        primary_key = peewee.CompositeKey('id', 'created_at')
+
+
+def migrate_forward(op, old_orm, new_orm):
+    # Sequence of the account numbers (see AccountNumberAllocator). Existing numbers have a prefix from 10 to 99
+    # and at most 4 digits in the main part, sequence values stay below them for the next 10^11 accounts.
+    # Accounts sharing an (agency, number) pair keep the oldest one on it, the others get a number from the
+    # sequence so the unique index can be created. No `%` in the SQL, the driver takes it for a parameter.
+    op.sql("""
+CREATE SEQUENCE IF NOT EXISTS "dockaccount_number_seq";
+
+WITH "duplicate" AS (
+    SELECT "id", nextval('"dockaccount_number_seq"') AS "value"
+    FROM (
+        SELECT "id", row_number() OVER (PARTITION BY "agency", "number" ORDER BY "created_at", "id") AS "position"
+        FROM "dockaccount"
+    ) AS "numbered"
+    WHERE "position" > 1
+)
+UPDATE "dockaccount" SET "number" = lpad(("duplicate"."value" / 10000000000)::text, 2, '0') || '-'
+                                 || lpad(mod("duplicate"."value", 10000000000)::text, 10, '0') || '-'
+                                 || lpad(mod("duplicate"."value", 97)::text, 2, '0')
+FROM "duplicate"
+WHERE "dockaccount"."id" = "duplicate"."id";
+
+CREATE UNIQUE INDEX "dockaccount_agency_number" ON "dockaccount" ("agency", "number");
+""")
+
+
+def migrate_backward(op, old_orm, new_orm):
+    op.sql("""
+DROP INDEX IF EXISTS "dockaccount_agency_number";
+DROP SEQUENCE IF EXISTS "dockaccount_number_seq";
+""")